@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+import tifffile
+
+from napari_towbintools_annotator.project import (
+    ClassificationProject,
+    PanopticProject,
+)
+
+
+def _write_panoptic_files(tmp_path, files):
+    rows = []
+    for name, labels in files.items():
+        # One 3x3 object per label, down the diagonal.
+        segmentation = np.zeros((10, 10), dtype=np.uint16)
+        for i, label in enumerate(labels):
+            segmentation[2 + 4 * i : 5 + 4 * i, 2 + 4 * i : 5 + 4 * i] = label
+        ref_path = tmp_path / f"{name}.tif"
+        seg_path = tmp_path / f"{name}_seg.tif"
+        ref_path.parent.mkdir(parents=True, exist_ok=True)
+        tifffile.imwrite(str(ref_path), np.zeros((10, 10), dtype=np.uint8))
+        tifffile.imwrite(str(seg_path), segmentation)
+        rows.append(
+            {
+                "Reference": str(ref_path),
+                "Segmentation": str(seg_path),
+                "Annotation": "",
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def _write_classification_files(tmp_path, files):
+    paths = []
+    for i, name in enumerate(files):
+        path = tmp_path / f"{name}.tif"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tifffile.imwrite(str(path), np.full((4, 4), i, dtype=np.uint8))
+        paths.append(str(path))
+    return pd.DataFrame({"ImagePath": paths, "Class": list(files.values())})
+
+
+@pytest.fixture
+def make_project(tmp_path):
+    """Factory saving a small project of one of the two types.
+
+    ``files`` maps image names, relative to ``tmp_path`` and without
+    extension, to the label IDs of their segmentation (``"panoptic"``) or
+    to their class (``"classification"``). Extra annotation table columns
+    can be given as ``columns``. Returns the saved project.
+    """
+
+    def make(project_type, files, columns=None, classes=("a", "b")):
+        project_dir = tmp_path / "proj"
+        annotations_dir = project_dir / "annotations"
+        annotations_dir.mkdir(parents=True)
+        if project_type == "panoptic":
+            df = _write_panoptic_files(tmp_path, files)
+        else:
+            df = _write_classification_files(tmp_path, files)
+        for column, values in (columns or {}).items():
+            df[column] = values
+        df.to_csv(annotations_dir / "annotations.csv", index=False)
+
+        data_directories = list(
+            dict.fromkeys(str((tmp_path / name).parent) for name in files)
+        )
+        kwargs = {
+            "name": "p",
+            "annotation_directories": ["annotations"],
+            "annotation_df_path": "annotations/annotations.csv",
+            "data_directories": data_directories,
+            "classes": list(classes),
+            "project_dir": str(project_dir),
+        }
+        if project_type == "panoptic":
+            project = PanopticProject(
+                image_type="multichannel",
+                mask_directories=data_directories,
+                **kwargs,
+            )
+        else:
+            project = ClassificationProject(image_type="2D", **kwargs)
+        project.save()
+        return project
+
+    return make
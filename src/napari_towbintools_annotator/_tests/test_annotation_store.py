@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from napari_towbintools_annotator.annotation_store import AnnotationStore
+
+
+def test_annotation_store_imports_without_qt():
+    code = (
+        "import sys\n"
+        "import napari_towbintools_annotator.annotation_store\n"
+        "loaded = [m for m in sys.modules\n"
+        "          if m.split('.')[0] in ('qtpy', 'napari', 'PyQt5')]\n"
+        "assert not loaded, loaded\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_annotation_store_round_trip(make_project):
+    project = make_project("panoptic", {"img0": [5], "img1": [7]})
+    project_dir = Path(project.project_dir)
+    with AnnotationStore.open(str(project_dir)) as store:
+        assert len(store) == 2
+        assert store.annotation_file(0) is None
+        assert store.read_annotations(0).empty
+
+        color_b = store.class_id_to_color[1]
+        annotations = store.annotations_from_points(
+            1, [[3, 3], [0, 0]], [color_b, color_b]
+        )
+        assert annotations[["Label", "ClassID", "Class"]].values.tolist() == [
+            [7, 1, "b"]
+        ]
+        csv_path = store.write_annotations(1, annotations)
+        [(point, color)] = store.points(1)
+        assert np.allclose(point, [3, 3]) and color == color_b
+
+    # Closing compacted the journal into the master table.
+    master = pd.read_csv(project_dir / "annotations" / "annotations.csv")
+    assert master.loc[1, "Annotation"] == csv_path
+    assert not list((project_dir / "annotations").glob("*.journal.*"))
+
+    store = AnnotationStore.open(str(project_dir))
+    combined = store.concat_annotations()
+    assert combined["Reference"].tolist() == [master.loc[1, "Reference"]]
+    assert combined["Label"].tolist() == [7]
+    store.close()
+
+
+def test_annotation_files_of_same_basename_do_not_collide(make_project):
+    project = make_project("panoptic", {"a/img": [5], "b/img": [7]})
+    with AnnotationStore(project) as store:
+        rows = {
+            row: store.annotations_from_points(row, [[3, 3]], [color])
+            for row, color in enumerate(store.class_id_to_color.values())
+        }
+        first = store.write_annotations(0, rows[0])
+        second = store.write_annotations(1, rows[1])
+        assert os.path.basename(first) == "img.csv"
+        assert first != second
+        # Re-saving keeps each file's name.
+        assert store.write_annotations(1, rows[1]) == second
+        assert store.read_annotations(0)["Label"].tolist() == [5]
+        assert store.read_annotations(1)["Label"].tolist() == [7]
@@ -0,0 +1,79 @@
+import numpy as np
+import tifffile
+
+from napari_towbintools_annotator.cache import ArrayCache
+from napari_towbintools_annotator.image_io import (
+    image_cache,
+    load_image,
+    load_labels,
+)
+
+
+def test_array_cache_evicts_least_recently_used_by_bytes():
+    cache = ArrayCache(max_bytes=250)
+    a = np.zeros(100, dtype=np.uint8)
+    b = np.zeros(100, dtype=np.uint8)
+    c = np.zeros(100, dtype=np.uint8)
+    cache.put("a", a)
+    cache.put("b", b)
+    assert cache.get("a") is a  # "b" is now least recently used
+    cache.put("c", c)
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.nbytes == 200
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1
+
+
+def test_array_cache_never_exceeds_budget():
+    cache = ArrayCache(max_bytes=1000)
+    for i in range(20):
+        cache.put(i, np.zeros(90 + i * 7, dtype=np.uint8))
+        assert cache.nbytes <= 1000
+    assert cache.nbytes == sum(
+        cache.get(k).nbytes for k in range(20) if k in cache
+    )
+
+
+def test_array_cache_skips_arrays_larger_than_budget():
+    cache = ArrayCache(max_bytes=10)
+    cache.put("big", np.zeros(11, dtype=np.uint8))
+    assert len(cache) == 0
+    assert cache.get("big") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_array_cache_shrinking_budget_evicts():
+    cache = ArrayCache(max_bytes=300)
+    for key in "abc":
+        cache.put(key, np.zeros(100, dtype=np.uint8))
+    cache.max_bytes = 150
+    assert len(cache) == 1
+    assert "c" in cache
+
+
+def test_load_image_hits_shared_cache(tmp_path):
+    path = tmp_path / "img.tif"
+    tifffile.imwrite(str(path), np.arange(16, dtype=np.uint16).reshape(4, 4))
+    image_cache.clear()
+    first = load_image(str(path))
+    hits = image_cache.hits
+    second = load_image(str(path))
+    assert second is first
+    assert image_cache.hits == hits + 1
+    assert not second.flags.writeable
+
+
+def test_load_labels_returns_a_writable_copy(tmp_path):
+    path = tmp_path / "labels.tif"
+    tifffile.imwrite(str(path), np.ones((4, 4), dtype=np.uint16))
+    image_cache.clear()
+    first = load_labels(str(path))
+    first[0, 0] = 7
+    second = load_labels(str(path))
+    assert second.flags.writeable
+    assert second[0, 0] == 1
+    lazy = load_labels(str(path), lazy=True)
+    lazy[0, 0] = 7
+    assert tifffile.imread(str(path))[0, 0] == 1
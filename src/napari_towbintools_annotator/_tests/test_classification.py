@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+import pytest
+import tifffile
+
+from napari_towbintools_annotator.classification_annotator import (
+    ClassificationAnnotatorWidget,
+)
+from napari_towbintools_annotator.project import (
+    ClassificationProject,
+    Project,
+)
+from napari_towbintools_annotator.status import IGNORED, UNANNOTATED
+
+
+@pytest.fixture
+def project(tmp_path):
+    project_dir = tmp_path / "proj"
+    annotations_dir = project_dir / "annotations"
+    annotations_dir.mkdir(parents=True)
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    paths = []
+    for i in range(4):
+        path = data_dir / f"img{i}.tif"
+        tifffile.imwrite(str(path), np.full((8, 8), i, dtype=np.uint8))
+        paths.append(str(path))
+    pd.DataFrame({"ImagePath": paths, "Class": np.nan}).to_csv(
+        annotations_dir / "annotations.csv", index=False
+    )
+    project = ClassificationProject(
+        name="p",
+        image_type="2D",
+        annotation_directories=["annotations"],
+        annotation_df_path="annotations/annotations.csv",
+        project_dir=str(project_dir),
+        classes=["a", "b"],
+        data_directories=[str(data_dir)],
+    )
+    project.save()
+    return project
+
+
+def _master(project):
+    return pd.read_csv(f"{project.project_dir}/annotations/annotations.csv")
+
+
+def test_ignore_is_a_tombstone_until_save(project):
+    import napari
+
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = ClassificationAnnotatorWidget(viewer, project)
+        widget.ignore_file()
+        assert widget.current_file_idx == 1
+        assert widget.progress_label.text() == (
+            "0/3 annotated (a: 0, b: 0), 1 ignored"
+        )
+        # Nothing is renumbered or rewritten yet.
+        assert widget.file_list_widget.count() == 4
+        assert len(widget.annotation_df) == 4
+        assert len(_master(project)) == 4
+
+        widget.current_file_idx = 3
+        widget.ignore_file()
+        assert widget.current_file_idx == 1  # wraps past ignored row 0
+
+        widget.save()
+        assert widget.file_list_widget.count() == 2
+        assert widget.data_files == _master(project)["ImagePath"].tolist()
+        assert widget.current_file_idx == 0
+        assert "Ignored" not in _master(project).columns
+        widget.close()
+    finally:
+        viewer.close()
+
+    ignored = Project.load(project.project_dir).ignored_images
+    assert [p.rsplit("/", 1)[1] for p in ignored] == ["img0.tif", "img3.tif"]
+
+
+def test_close_drops_ignored_rows_without_reloading(project, monkeypatch):
+    import napari
+
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = ClassificationAnnotatorWidget(viewer, project)
+        widget.ignore_file()
+
+        def fail():
+            raise AssertionError("file reloaded while closing")
+
+        monkeypatch.setattr(widget, "_load_file", fail)
+        widget.close()
+    finally:
+        viewer.close()
+
+    assert len(_master(project)) == 3
+    ignored = Project.load(project.project_dir).ignored_images
+    assert [p.rsplit("/", 1)[1] for p in ignored] == ["img0.tif"]
+
+
+def test_ignore_survives_a_crash(project):
+    import napari
+
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = ClassificationAnnotatorWidget(viewer, project)
+        widget.ignore_file()
+        # Simulate a crash: the journal is left behind, nothing is saved.
+        widget._journal.close()
+
+        reopened = ClassificationAnnotatorWidget(viewer, project)
+        assert reopened._status.state.tolist() == [IGNORED, 0, 0, 0]
+        assert reopened.current_file_idx == 1
+        reopened.close()
+    finally:
+        viewer.close()
+
+    assert len(_master(project)) == 3
+
+
+def test_navigation_modes(project):
+    import napari
+
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = ClassificationAnnotatorWidget(viewer, project)
+        button_a, button_b = widget.class_buttons.buttons()
+        widget.assign_class(button_a)  # row 0
+        widget.current_file_idx = 2
+        widget.assign_class(button_b)  # row 2
+        assert widget.current_file_idx == 3
+
+        widget.next_unannotated()
+        assert widget.current_file_idx == 1
+        widget.next_of_class("b")
+        assert widget.current_file_idx == 2
+        widget.next_of_class("a")
+        assert widget.current_file_idx == 0
+        widget.previous_file()
+        assert widget.current_file_idx == 0
+
+        widget.toggle_flag()
+        widget.current_file_idx = 3
+        widget.toggle_flag()
+        widget.next_flagged()
+        assert widget.current_file_idx == 0
+        assert widget.progress_label.text().endswith("2 flagged")
+        widget.toggle_flag()
+        widget.next_flagged()
+        assert widget.current_file_idx == 3
+        widget.save()
+        widget.close()
+    finally:
+        viewer.close()
+
+    assert _master(project)["Flagged"].tolist() == [False, False, False, True]
+
+    viewer = napari.Viewer(show=False)
+    try:
+        reopened = ClassificationAnnotatorWidget(viewer, project)
+        assert reopened._status.next_flagged(0) == 3
+        assert reopened._status.first(UNANNOTATED) == 1
+        reopened.close()
+    finally:
+        viewer.close()
+
+
+def test_grid_assigns_a_class_to_the_selection(project, qtbot):
+    import napari
+    from qtpy.QtCore import QItemSelectionModel, Qt
+
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = ClassificationAnnotatorWidget(viewer, project)
+        widget.GRID_PAGE_SIZE = 3
+        widget.grid_model.page_size = 3
+        widget.set_grid_mode(True)
+        assert widget.grid_model.rowCount() == 3
+        atlas = widget.thumbnails._atlas
+        qtbot.waitUntil(
+            lambda: all(atlas.get(row) is not None for row in range(4)),
+            timeout=60000,
+        )
+        index = widget.grid_model.index(0)
+        assert widget.grid_model.data(index, Qt.DecorationRole) is not None
+
+        widget.next_page_button.click()
+        assert widget.grid_model.page_paths() == widget.data_files[3:]
+        widget.previous_page_button.click()
+        selection = widget.grid_view.selectionModel()
+        for row in (0, 2):
+            selection.select(
+                widget.grid_model.index(row), QItemSelectionModel.Select
+            )
+        widget.grid_view.number_pressed.emit(2)
+
+        assert widget._status.class_counts.tolist() == [0, 2]
+        assert _master(project)["Class"].tolist()[:3] == ["b", np.nan, "b"]
+        assert widget._journal.pending == 0
+
+        widget.set_grid_mode(False)
+        assert not widget.grid_button.isChecked()
+        widget.thumbnails_checkbox.setChecked(True)
+        icon = widget.file_list_model.data(
+            widget.file_list_model.index(1), Qt.DecorationRole
+        )
+        assert icon.width() == 8
+        widget.close()
+    finally:
+        viewer.close()
+
+
+def test_mask_layer_can_be_painted(project):
+    import napari
+
+    df = _master(project)
+    df["MaskPath"] = df["ImagePath"]
+    df.to_csv(
+        f"{project.project_dir}/annotations/annotations.csv", index=False
+    )
+    project.display_mode = "both"
+    project.mask_directories = project.data_directories
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = ClassificationAnnotatorWidget(viewer, project)
+        widget._mask_layer.paint((3, 3), 9)
+        assert widget._mask_layer.data[3, 3] == 9
+        widget.next_file()
+        widget._mask_layer.paint((3, 3), 9)
+        widget.previous_file()
+        assert widget._mask_layer.data[3, 3] == 0
+        widget.close()
+    finally:
+        viewer.close()
+
+
+def test_float_image_contrast_can_widen_past_its_limits(project):
+    import napari
+
+    df = _master(project)
+    for i, path in enumerate(df["ImagePath"]):
+        tifffile.imwrite(
+            path, np.linspace(0, i + 1, 1000, dtype=np.float32).reshape(40, 25)
+        )
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = ClassificationAnnotatorWidget(viewer, project)
+        for _ in range(2):
+            layer = widget._image_layer
+            low, high = layer.contrast_limits
+            assert layer.contrast_limits_range[0] < low
+            assert layer.contrast_limits_range[1] > high
+            widget.next_file()
+        widget.close()
+    finally:
+        viewer.close()
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+from napari_towbintools_annotator.copying import (
+    copy_file,
+    copy_trees,
+    format_bytes,
+    is_copied,
+)
+from napari_towbintools_annotator.project_creator import ProjectCreatorWidget
+
+
+def _make_tree(root):
+    (root / "sub").mkdir(parents=True)
+    (root / "a.tif").write_bytes(b"a" * 1000)
+    (root / "sub" / "b.tif").write_bytes(b"b" * 500)
+
+
+def test_copy_trees_copies_and_reports_bytes(tmp_path):
+    src = tmp_path / "src"
+    _make_tree(src)
+    calls = []
+
+    result = copy_trees(
+        [(str(src), str(tmp_path / "dst"))],
+        workers=2,
+        progress=lambda *args: calls.append(args),
+    )
+
+    assert result == {"copied": 2, "skipped": 0, "bytes": 1500}
+    assert (tmp_path / "dst" / "a.tif").read_bytes() == b"a" * 1000
+    assert (tmp_path / "dst" / "sub" / "b.tif").read_bytes() == b"b" * 500
+    assert calls[-1] == (1500, 1500, 2, 2)
+    assert not list((tmp_path / "dst").rglob("*.partial"))
+
+
+def test_copy_trees_resumes_interrupted_copy(tmp_path):
+    src = tmp_path / "src"
+    dst = tmp_path / "dst"
+    _make_tree(src)
+    copy_trees([(str(src), str(dst))])
+
+    # Simulate an interrupted run: one file truncated, one missing, and a
+    # leftover temporary file.
+    (dst / "a.tif").write_bytes(b"a" * 10)
+    os.remove(dst / "sub" / "b.tif")
+    (dst / "sub" / "b.tif.partial").write_bytes(b"b")
+
+    result = copy_trees([(str(src), str(dst))])
+
+    assert result["copied"] == 2
+    assert (dst / "a.tif").read_bytes() == b"a" * 1000
+    assert (dst / "sub" / "b.tif").read_bytes() == b"b" * 500
+
+    assert copy_trees([(str(src), str(dst))])["skipped"] == 2
+
+
+def test_is_copied_checksum_detects_same_size_changes(tmp_path):
+    src = tmp_path / "a"
+    dst = tmp_path / "b"
+    src.write_bytes(b"1234")
+    copy_file(str(src), str(dst))
+    assert is_copied(str(src), str(dst))
+
+    dst.write_bytes(b"4321")
+    stat = os.stat(src)
+    os.utime(dst, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert is_copied(str(src), str(dst))
+    assert not is_copied(str(src), str(dst), checksum=True)
+
+
+@pytest.mark.parametrize("link_mode", ["hardlink", "reflink"])
+def test_copy_file_link_modes(tmp_path, link_mode):
+    src = tmp_path / "a"
+    dst = tmp_path / "b"
+    src.write_bytes(b"data")
+    written = []
+    copy_file(str(src), str(dst), link_mode=link_mode, on_bytes=written.append)
+    assert dst.read_bytes() == b"data"
+    assert sum(written) == 4
+    if link_mode == "hardlink":
+        assert os.path.samefile(src, dst)
+
+
+def test_format_bytes():
+    assert format_bytes(12) == "12 B"
+    assert format_bytes(1536) == "1.5 KB"
+    assert format_bytes(3 * 1024**4) == "3.0 TB"
+
+
+def test_copy_data_directories_completes_existing_destination(tmp_path):
+    src = tmp_path / "raw"
+    _make_tree(src)
+    local = tmp_path / "proj" / "data"
+    local.mkdir(parents=True)
+
+    class _Status:
+        def emit(self, message):
+            pass
+
+    first = ProjectCreatorWidget._copy_data_directories_static(
+        [str(src)], str(local), _Status()
+    )
+    (local / os.path.basename(first[0]) / "a.tif").unlink()
+    ProjectCreatorWidget._copy_data_directories_static(
+        [str(src)], str(local), _Status(), {"checksum": True}
+    )
+    assert (local / os.path.basename(first[0]) / "a.tif").exists()
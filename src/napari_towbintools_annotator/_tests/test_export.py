@@ -0,0 +1,187 @@
+import io
+import json
+import os
+import tarfile
+
+import numpy as np
+import pandas as pd
+import tifffile
+
+from napari_towbintools_annotator.annotation_store import AnnotationStore
+from napari_towbintools_annotator.export import (
+    SHARD_MANIFEST,
+    class_mask,
+    export_classification,
+    export_panoptic,
+    main,
+)
+from napari_towbintools_annotator.storage import sidecar_name
+
+
+def test_class_mask_maps_labels_through_the_lut():
+    labels = np.array([[0, 1, 1], [2, 3, 9]], dtype=np.uint16)
+    annotations = pd.DataFrame(
+        {"Label": [1, 3, 12], "ClassID": [0, 2, 1], "Class": ["a", "c", "b"]}
+    )
+    mask = class_mask(labels, annotations)
+    assert mask.dtype == np.uint8
+    assert mask.tolist() == [[0, 1, 1], [0, 3, 0]]
+
+
+def test_class_mask_looks_labels_up_per_plane():
+    labels = np.ones((3, 2, 2), dtype=np.uint16)
+    annotations = pd.DataFrame(
+        {"Z": [0, 2, 5], "Label": [1, 1, 1], "ClassID": [0, 1, 0]}
+    )
+    mask = class_mask(labels, annotations, plane_axis="Z")
+    assert mask[:, 0, 0].tolist() == [1, 0, 2]
+
+
+def _make_store(make_project, files=None):
+    files = files or {f"img{i}": [4, 8] for i in range(3)}
+    store = AnnotationStore(make_project("panoptic", files))
+    # Every file but the middle one is annotated.
+    for row in range(len(files)):
+        if row == 1:
+            continue
+        class_id = min(row, 1)
+        store.write_annotations(
+            row,
+            pd.DataFrame(
+                {
+                    "Label": [4],
+                    "ClassID": [class_id],
+                    "Class": [store.classes[class_id]],
+                }
+            ),
+        )
+    store.save()
+    return store
+
+
+def test_export_panoptic_writes_masks_and_instances(tmp_path, make_project):
+    store = _make_store(make_project)
+    out = tmp_path / "export"
+    exported, failed = export_panoptic(
+        store, str(out), instances="instances.csv", workers=2
+    )
+    assert (exported, failed) == (2, [])
+
+    def mask_path(row):
+        name = sidecar_name(store.table.at[row, "Reference"])
+        return out / "masks" / f"{name}.tif"
+
+    mask = tifffile.imread(str(mask_path(2)))
+    assert mask[3, 3] == 2 and mask[7, 7] == 0 and mask[0, 0] == 0
+    assert not mask_path(1).exists()
+
+    instances = pd.read_csv(out / "instances.csv")
+    assert instances["Reference"].tolist() == [
+        store.table.at[0, "Reference"],
+        store.table.at[2, "Reference"],
+    ]
+    assert instances["Area"].tolist() == [9, 9]
+    assert instances["CentroidY"].tolist() == [3.0, 3.0]
+
+    # Up-to-date files are skipped; a newer annotation is re-exported.
+    assert export_panoptic(store, str(out), instances="instances.csv") == (
+        0,
+        [],
+    )
+    csv_path = store.annotation_file(2)
+    later = os.stat(mask_path(2)).st_mtime_ns + 10**9
+    os.utime(csv_path, ns=(later, later))
+    assert export_panoptic(
+        store, str(out), instances="instances.csv", workers=1
+    ) == (1, [])
+    assert len(pd.read_csv(out / "instances.csv")) == 2
+
+
+def test_export_command(tmp_path, make_project):
+    store = _make_store(make_project)
+    out = tmp_path / "export"
+    project_dir = store.project.project_dir
+    assert main([project_dir, str(out), "--no-masks", "--workers", "1"]) == 0
+    assert not (out / "masks").exists()
+    # The training table keeps plain path columns.
+    instances = pd.read_parquet(out / "instances.parquet")
+    assert instances["Reference"].tolist() == [
+        store.table.at[0, "Reference"],
+        store.table.at[2, "Reference"],
+    ]
+
+
+def test_export_panoptic_keeps_files_with_the_same_basename(
+    tmp_path, make_project
+):
+    store = _make_store(
+        make_project, {"a/img": [4], "b/img": [4, 8], "c/img": [4]}
+    )
+    out = tmp_path / "export"
+    assert export_panoptic(store, str(out), workers=1) == (2, [])
+    assert len(list((out / "masks").iterdir())) == 2
+    instances = pd.read_parquet(out / "instances.parquet")
+    assert instances["Reference"].tolist() == [
+        store.table.at[0, "Reference"],
+        store.table.at[2, "Reference"],
+    ]
+    assert instances["Class"].tolist() == ["a", "b"]
+
+
+def _make_classification_store(make_project):
+    project = make_project(
+        "classification",
+        {"img0": "a", "img1": np.nan, "img2": "b", "img3": "b", "img4": "a"},
+        columns={"Ignored": [False, False, False, False, True]},
+    )
+    return AnnotationStore(project)
+
+
+def _read_shard(path):
+    samples = {}
+    with tarfile.open(path) as tar:
+        for member in tar.getmembers():
+            key, kind = member.name.split(".", 1)
+            samples.setdefault(key, {})[kind] = tar.extractfile(member).read()
+    return samples
+
+
+def test_export_classification_writes_ordered_shards(tmp_path, make_project):
+    store = _make_classification_store(make_project)
+    out = tmp_path / "shards"
+    assert export_classification(store, str(out), shard_size=2) == (3, [])
+
+    manifest = json.loads((out / SHARD_MANIFEST).read_text())
+    assert [shard["count"] for shard in manifest["shards"]] == [2, 1]
+    first = _read_shard(out / "shard-000000.tar")
+    second = _read_shard(out / "shard-000001.tar")
+    assert list(first) == ["00000000", "00000002"]
+    assert list(second) == ["00000003"]
+    sample = first["00000002"]
+    image = np.load(io.BytesIO(sample["image.npy"]))
+    assert image.tolist() == np.full((4, 4), 2).tolist()
+    assert sample["cls"] == b"1"
+    assert json.loads(sample["json"])["class"] == "b"
+
+    # Unchanged shards are kept; a relabelled row rewrites its shard.
+    assert export_classification(store, str(out), shard_size=2) == (0, [])
+    store.table.at[3, "Class"] = "a"
+    assert export_classification(store, str(out), shard_size=2) == (1, [])
+    assert _read_shard(out / "shard-000001.tar")["00000003"]["cls"] == b"0"
+
+    # Fewer shards than before: the extra ones are removed.
+    store.table["Class"] = ["a", np.nan, np.nan, np.nan, "a"]
+    export_classification(store, str(out), shard_size=2)
+    assert not (out / "shard-000001.tar").exists()
+
+
+def test_export_command_shards_classification_projects(tmp_path, make_project):
+    store = _make_classification_store(make_project)
+    out = tmp_path / "shards"
+    project_dir = store.project.project_dir
+    assert main([project_dir, str(out), "--shard-size", "10"]) == 0
+    assert list(_read_shard(out / "shard-000000.tar")) == [
+        "00000000",
+        "00000002",
+        "00000003",
+    ]
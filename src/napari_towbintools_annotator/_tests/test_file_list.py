@@ -0,0 +1,53 @@
+from qtpy.QtCore import Qt
+from qtpy.QtGui import QColor
+
+from napari_towbintools_annotator.file_list import (
+    FileListModel,
+    FileListView,
+    text_color_for,
+)
+
+
+def test_model_computes_rows_on_demand():
+    paths = ["/data/a.tif", "/data/b.tif"]
+    annotated = {1}
+    colors = (QColor("#55A868"), QColor("white"))
+    model = FileListModel(
+        paths, colors=lambda row: colors if row in annotated else None
+    )
+
+    assert model.rowCount() == 2
+    assert model.data(model.index(0), Qt.DisplayRole) == "a.tif"
+    assert model.data(model.index(0), Qt.ToolTipRole) == "/data/a.tif"
+    assert model.data(model.index(1), Qt.BackgroundRole) == colors[0]
+    assert model.data(model.index(0), Qt.BackgroundRole).alpha() == 0
+
+
+def test_model_edits_share_the_path_list():
+    paths = ["/data/a.tif"]
+    model = FileListModel(paths)
+    changed = []
+    model.dataChanged.connect(lambda first, last, roles: changed.append(first))
+
+    model.append(["/data/b.tif", "/data/c.tif"])
+    assert paths == ["/data/a.tif", "/data/b.tif", "/data/c.tif"]
+    model.remove(0)
+    assert paths == ["/data/b.tif", "/data/c.tif"]
+    assert model.rowCount() == 2
+
+    model.row_changed(1)
+    assert [index.row() for index in changed] == [1]
+
+
+def test_view_row_helpers(qtbot):
+    model = FileListModel([f"/data/{i}.tif" for i in range(1000)])
+    view = FileListView(model)
+    qtbot.addWidget(view)
+    assert view.count() == 1000
+    view.setCurrentRow(500)
+    assert view.currentRow() == 500
+
+
+def test_text_color_for():
+    assert text_color_for(QColor("#ffffff")) == QColor("black")
+    assert text_color_for(QColor("#000000")) == QColor("white")
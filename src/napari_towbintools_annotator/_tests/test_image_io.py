@@ -0,0 +1,40 @@
+import dask.array as da
+import numpy as np
+import tifffile
+
+from napari_towbintools_annotator.image_io import load_image, open_lazy
+
+
+def _stack():
+    return np.arange(2 * 3 * 8 * 9, dtype=np.uint16).reshape(2, 3, 8, 9)
+
+
+def test_open_lazy_memory_maps_uncompressed_tiff(tmp_path):
+    path = tmp_path / "stack.tif"
+    tifffile.imwrite(str(path), _stack(), imagej=True)
+    array = open_lazy(str(path))
+    assert isinstance(array, np.memmap)
+    np.testing.assert_array_equal(array, _stack())
+
+
+def test_open_lazy_compressed_tiff_is_chunked_per_page(tmp_path):
+    path = tmp_path / "stack.tif"
+    tifffile.imwrite(str(path), _stack(), imagej=True, compression="zlib")
+    array = open_lazy(str(path))
+    assert isinstance(array, da.Array)
+    assert array.chunksize == (1, 1, 8, 9)
+    np.testing.assert_array_equal(array[1, 2].compute(), _stack()[1, 2])
+    # Axis swaps stay lazy and index the right pages.
+    np.testing.assert_array_equal(
+        np.asarray(array.swapaxes(0, 1)[2, 1]), _stack()[1, 2]
+    )
+
+
+def test_load_image_lazy_falls_back_for_non_tiff(tmp_path):
+    import imageio
+
+    path = tmp_path / "img.png"
+    imageio.imwrite(str(path), np.zeros((4, 4), dtype=np.uint8))
+    assert open_lazy(str(path)) is None
+    array = load_image(str(path), lazy=True)
+    assert array.shape == (4, 4)
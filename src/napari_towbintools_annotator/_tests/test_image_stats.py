@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import tifffile
+
+from napari_towbintools_annotator import image_stats
+from napari_towbintools_annotator.image_stats import (
+    PERCENTILES,
+    contrast_limits,
+    contrast_range,
+    image_percentiles,
+    load_image_stats,
+    read_image_stats,
+    stats_path,
+    strided_sample,
+)
+
+
+def test_strided_sample_keeps_channel_axis():
+    data = np.arange(2 * 100 * 100).reshape(2, 100, 100)
+    sample = strided_sample(data, 2000, channel_axis=0)
+    assert sample.shape[0] == 2
+    assert sample.size <= 2 * 2000
+    assert strided_sample(data, 0).shape == data.shape
+
+
+def test_image_percentiles_per_channel():
+    data = np.stack([np.arange(101), np.arange(101) * 2]).astype(np.uint16)
+    values = image_percentiles(data, channel_axis=0, max_samples=0)
+    assert values.shape == (2, len(PERCENTILES))
+    assert values[:, 0].tolist() == [0, 0]
+    assert values[:, -1].tolist() == [100, 200]
+    assert contrast_limits(values, low=0.0, high=100.0) == [0.0, 200.0]
+
+
+def test_contrast_limits_of_flat_image_increase():
+    values = image_percentiles(np.full((4, 4), 7, dtype=np.uint8))
+    assert contrast_limits(values) == [7.0, 8.0]
+    assert contrast_range(np.uint8, values, [7.0, 8.0]) == [0.0, 255.0]
+
+
+def test_float_contrast_range_spans_the_data():
+    data = np.linspace(-1.0, 3.0, 1001, dtype=np.float32)
+    values = image_percentiles(data, max_samples=0)
+    limits = contrast_limits(values)
+    assert contrast_range(np.float32, values, limits) == [-1.0, 3.0]
+    # Limits kept from another file widen the range.
+    assert contrast_range(np.float32, values, [0.0, 5.0]) == [-1.0, 5.0]
+    assert contrast_range(np.float32, None, [0.5, 2.0]) == [0.5, 2.0]
+
+
+def test_stats_sidecar_is_reused_until_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "img.tif"
+    tifffile.imwrite(
+        str(path), np.arange(100, dtype=np.uint16).reshape(10, 10)
+    )
+    stats_dir = str(tmp_path / "annotations")
+
+    data = tifffile.imread(str(path))
+    built = load_image_stats(str(path), stats_dir, data)
+    assert os.path.isfile(stats_path(str(path), stats_dir))
+    assert read_image_stats(str(path), stats_dir, channel_axis=0) is None
+
+    def fail(*args, **kwargs):
+        raise AssertionError("stats should come from the sidecar")
+
+    monkeypatch.setattr(image_stats, "image_percentiles", fail)
+    assert np.array_equal(load_image_stats(str(path), stats_dir, data), built)
+    monkeypatch.undo()
+
+    tifffile.imwrite(str(path), np.full((10, 10), 3, dtype=np.uint16))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert read_image_stats(str(path), stats_dir) is None
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import tifffile
+
+from napari_towbintools_annotator import label_index
+from napari_towbintools_annotator.label_index import (
+    label_geometry,
+    label_index_path,
+    load_label_index,
+    read_label_index,
+)
+
+
+def _write_segmentation(path, value=5):
+    segmentation = np.zeros((2, 10, 10), dtype=np.uint16)
+    segmentation[1, 2:4, 3:6] = value
+    tifffile.imwrite(str(path), segmentation)
+    return segmentation
+
+
+def test_label_geometry_bbox_is_exclusive():
+    label_data = np.zeros((10, 10), dtype=int)
+    label_data[2:4, 3:6] = 1
+    row = label_geometry(label_data).iloc[0]
+    assert (row["MinY"], row["MinX"], row["MaxY"], row["MaxX"]) == (2, 3, 4, 6)
+    assert row["Area"] == 6
+
+
+def test_load_label_index_builds_then_reads_sidecar(tmp_path, monkeypatch):
+    seg_path = tmp_path / "seg.tif"
+    segmentation = _write_segmentation(seg_path)
+    index_dir = tmp_path / "annotations"
+
+    built = load_label_index(
+        str(seg_path), str(index_dir), "Z", label_data=segmentation
+    )
+    assert os.path.isfile(label_index_path(str(seg_path), str(index_dir)))
+    assert built[["Z", "Label", "Area"]].values.tolist() == [[1, 5, 6]]
+
+    def fail(path):
+        raise AssertionError("label index should not re-read the array")
+
+    monkeypatch.setattr(label_index, "load_labels", fail)
+    reread = load_label_index(str(seg_path), str(index_dir), "Z")
+    assert reread.equals(built)
+
+
+def test_label_index_is_invalidated_by_segmentation_change(tmp_path):
+    seg_path = tmp_path / "seg.tif"
+    _write_segmentation(seg_path)
+    index_dir = str(tmp_path / "annotations")
+    load_label_index(str(seg_path), index_dir, "Z")
+    assert read_label_index(str(seg_path), index_dir, "Z") is not None
+    # Different plane axis setting does not match either.
+    assert read_label_index(str(seg_path), index_dir, None) is None
+
+    _write_segmentation(seg_path, value=9)
+    stat = os.stat(seg_path)
+    os.utime(seg_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert read_label_index(str(seg_path), index_dir, "Z") is None
+    rebuilt = load_label_index(str(seg_path), index_dir, "Z")
+    assert rebuilt["Label"].tolist() == [9]
+
+
+def test_label_index_paths_do_not_collide(tmp_path):
+    a = label_index_path(str(tmp_path / "a" / "seg.tif"), str(tmp_path))
+    b = label_index_path(str(tmp_path / "b" / "seg.tif"), str(tmp_path))
+    assert a != b
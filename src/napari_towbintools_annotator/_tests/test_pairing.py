@@ -0,0 +1,187 @@
+import os
+
+import pandas as pd
+import pytest
+
+from napari_towbintools_annotator.pairing import (
+    pair_files,
+    pair_or_raise,
+    pairing_key,
+)
+from napari_towbintools_annotator.project_creator import (
+    ProjectCreatorWidget,
+    scan_panoptic_files,
+)
+
+
+def test_pairing_key_normalises_stem():
+    assert pairing_key("/a/Img_T001.ome.tif") == pairing_key("/b/img_t1.png")
+    assert pairing_key("/a/img_t1.tif") != pairing_key("/a/img_t2.tif")
+
+
+def test_pairing_key_drops_segmentation_suffixes():
+    for name in ("img0_seg.tif", "img0-mask.png", "IMG0_Labels.tif"):
+        assert pairing_key(f"/s/{name}") == pairing_key("/r/img0.tif")
+    assert pairing_key("/r/img0_segment.tif") != pairing_key("/r/img0.tif")
+
+
+def test_pairing_key_pattern_uses_groups():
+    pattern = r"([A-H]\d+)_.*t(\d+)"
+    assert pairing_key("/ref/B03_raw_t004.tif", pattern) == ("b3", "4")
+    assert pairing_key("/seg/b3_seg_t04.tif", pattern) == ("b3", "4")
+    assert pairing_key("/seg/notes.tif", pattern) is None
+
+
+def test_pair_files_survives_extra_file():
+    refs = ["/r/img1.tif", "/r/img2.tif", "/r/img3.tif"]
+    segs = ["/s/img3.tif", "/s/img1.tif", "/s/img1b.tif", "/s/img2.tif"]
+    paired_refs, paired_segs, unmatched_refs, unmatched_segs = pair_files(
+        refs, segs
+    )
+    assert paired_refs == refs
+    assert paired_segs == ["/s/img1.tif", "/s/img2.tif", "/s/img3.tif"]
+    assert unmatched_refs == []
+    assert unmatched_segs == ["/s/img1b.tif"]
+
+
+def test_pair_files_reports_ambiguous_keys():
+    refs = ["/r1/a.tif", "/r2/a.tif", "/r1/b.tif"]
+    segs = ["/s/a.tif", "/s/b.tif"]
+    paired_refs, _, unmatched_refs, unmatched_segs = pair_files(refs, segs)
+    assert paired_refs == ["/r1/b.tif"]
+    assert unmatched_refs == ["/r1/a.tif", "/r2/a.tif"]
+    assert unmatched_segs == ["/s/a.tif"]
+
+
+def test_pair_or_raise_skips_when_allowed():
+    messages = []
+    refs, segs = pair_or_raise(
+        ["/r/a.tif", "/r/b.tif"],
+        ["/s/a.tif"],
+        allow_unmatched=True,
+        report=messages.append,
+    )
+    assert (refs, segs) == (["/r/a.tif"], ["/s/a.tif"])
+    assert "1 unmatched reference files (b.tif)" in messages[0]
+
+
+def test_scan_panoptic_files_pairs_by_name(tmp_path):
+    ref = tmp_path / "ref"
+    seg = tmp_path / "seg"
+    ref.mkdir()
+    seg.mkdir()
+    for name in ("a.tif", "c.tif"):
+        (ref / name).write_text("x")
+    for name in ("a.tif", "b.tif", "c.tif"):
+        (seg / name).write_text("x")
+    refs, segs = scan_panoptic_files(
+        [str(ref)], [str(seg)], allow_unmatched=True
+    )
+    assert segs == [str(seg / "a.tif"), str(seg / "c.tif")]
+    assert refs == [str(ref / "a.tif"), str(ref / "c.tif")]
+
+
+def test_scan_panoptic_files_pairs_suffixed_segmentations(tmp_path):
+    ref = tmp_path / "ref"
+    seg = tmp_path / "seg"
+    ref.mkdir()
+    seg.mkdir()
+    for i in range(2):
+        (ref / f"img{i}.tif").write_text("x")
+        (seg / f"img{i}_seg.tif").write_text("x")
+    refs, segs = scan_panoptic_files([str(ref)], [str(seg)])
+    assert refs == [str(ref / "img0.tif"), str(ref / "img1.tif")]
+    assert segs == [str(seg / "img0_seg.tif"), str(seg / "img1_seg.tif")]
+
+
+def test_pair_files_within_corresponding_directories():
+    refs = ["/r/t2/img.tif", "/r/t1/img.tif", "/r/t1/other.tif"]
+    segs = ["/s/t1/img.tif", "/s/t2/img.tif", "/s/t2/other.tif"]
+    directories = (["/r/t2", "/r/t1"], ["/s/t1/", "/s/t2"])
+    paired_refs, paired_segs, unmatched_refs, unmatched_segs = pair_files(
+        refs, segs, directories=directories
+    )
+    assert paired_refs == ["/r/t1/img.tif", "/r/t2/img.tif"]
+    assert paired_segs == ["/s/t1/img.tif", "/s/t2/img.tif"]
+    assert unmatched_refs == ["/r/t1/other.tif"]
+    assert unmatched_segs == ["/s/t2/other.tif"]
+
+    # Without as many directories per side, names must be unique.
+    directories = (["/r/t1", "/r/t2"], ["/s/t1"])
+    paired_refs, _, unmatched_refs, _ = pair_files(
+        refs, segs, directories=directories
+    )
+    assert paired_refs == ["/r/t1/other.tif"]
+    assert unmatched_refs == ["/r/t1/img.tif", "/r/t2/img.tif"]
+
+
+def test_scan_panoptic_files_pairs_repeated_names_per_directory(tmp_path):
+    refs, segs = [], []
+    for position in ("pos1", "pos2"):
+        for side, paths in (("ref", refs), ("seg", segs)):
+            directory = tmp_path / side / position
+            directory.mkdir(parents=True)
+            for time in range(2):
+                (directory / f"t{time}.tif").write_text("x")
+            paths.append(str(directory))
+    references, segmentations = scan_panoptic_files(refs, segs)
+    assert len(references) == 4
+    for reference, segmentation in zip(references, segmentations, strict=True):
+        assert os.path.relpath(reference, tmp_path / "ref") == (
+            os.path.relpath(segmentation, tmp_path / "seg")
+        )
+
+
+def test_classification_both_mode_pairs_images_and_masks(tmp_path):
+    images = tmp_path / "images"
+    masks = tmp_path / "masks"
+    images.mkdir()
+    masks.mkdir()
+    for name in ("w1_t1.tif", "w1_t2.tif"):
+        (images / name).write_text("x")
+    for name in ("w1_t2_mask.tif", "w1_t1_mask.tif", "w1_t0_mask.tif"):
+        (masks / name).write_text("x")
+    project_dir = tmp_path / "proj"
+
+    class _Status:
+        def emit(self, message):
+            pass
+
+    widget = ProjectCreatorWidget.__new__(ProjectCreatorWidget)
+    with pytest.raises(ValueError, match="unmatched mask"):
+        ProjectCreatorWidget._run_classification_creation(
+            widget,
+            "proj",
+            "2D",
+            "both",
+            str(project_dir),
+            [str(images)],
+            [str(masks)],
+            ["a"],
+            False,
+            _Status(),
+            pairing={"pattern": r"(w\d+)_t(\d+)"},
+        )
+
+    ProjectCreatorWidget._run_classification_creation(
+        widget,
+        "proj",
+        "2D",
+        "both",
+        str(project_dir),
+        [str(images)],
+        [str(masks)],
+        ["a"],
+        False,
+        _Status(),
+        pairing={"pattern": r"(w\d+)_t(\d+)", "allow_unmatched": True},
+    )
+    master = pd.read_csv(project_dir / "annotations" / "annotations.csv")
+    assert master["ImagePath"].tolist() == [
+        str(images / "w1_t1.tif"),
+        str(images / "w1_t2.tif"),
+    ]
+    assert master["MaskPath"].tolist() == [
+        str(masks / "w1_t1_mask.tif"),
+        str(masks / "w1_t2_mask.tif"),
+    ]
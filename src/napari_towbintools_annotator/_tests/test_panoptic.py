@@ -10,12 +10,16 @@ from napari_towbintools_annotator.colors import (
 )
 from napari_towbintools_annotator.panoptic_annotator import (
     PanopticAnnotatorWidget,
+    class_color_table,
+    label_geometry,
     nearest_class_id,
+    nearest_class_ids,
     points_to_rows,
     rows_to_points,
 )
 from napari_towbintools_annotator.project import PanopticProject, Project
 from napari_towbintools_annotator.project_creator import scan_panoptic_files
+from napari_towbintools_annotator.storage import AnnotationJournal
 
 
 def test_hex_to_rgba_float_white():
@@ -59,6 +63,21 @@ def test_panoptic_project_save_load_roundtrip(tmp_path):
     assert loaded.mask_directories == [str(tmp_path / "seg")]
     assert loaded.data_directories == [str(tmp_path / "ref")]
     assert loaded.annotation_df_path == "annotations/annotations.csv"
+    assert loaded.prefetch_ahead == 2
+    assert loaded.prefetch_behind == 1
+    assert loaded.prefetch_workers == 2
+
+
+def test_panoptic_project_prefetch_settings_roundtrip(tmp_path):
+    proj = _make_panoptic_project(tmp_path)
+    proj.prefetch_ahead = 5
+    proj.prefetch_behind = 0
+    proj.prefetch_workers = 4
+    proj.save()
+    loaded = Project.load(str(tmp_path))
+    assert loaded.prefetch_ahead == 5
+    assert loaded.prefetch_behind == 0
+    assert loaded.prefetch_workers == 4
 
 
 def test_panoptic_project_requires_classes(tmp_path):
@@ -95,6 +114,27 @@ def test_nearest_class_id_handles_float_noise():
     assert nearest_class_id((0.0, 0.02, 0.97, 1.0), id_to_color) == 1
 
 
+def test_nearest_class_ids_matches_reference_implementation():
+    id_to_color = {
+        i: hex_to_rgba_float(color) for i, color in enumerate(CLASS_PALETTE)
+    }
+    rng = np.random.default_rng(0)
+    colors = np.concatenate(
+        [rng.random((200, 3)), np.ones((200, 1))], axis=1
+    )
+    expected = [nearest_class_id(c, id_to_color) for c in colors]
+    got = nearest_class_ids(colors, class_color_table(id_to_color))
+    assert got.tolist() == expected
+
+
+def test_nearest_class_ids_empty_inputs():
+    table = class_color_table({0: (1, 0, 0, 1)})
+    assert nearest_class_ids(np.zeros((0, 4)), table).tolist() == []
+    assert nearest_class_ids(
+        np.ones((2, 4)), class_color_table({})
+    ).tolist() == [-1, -1]
+
+
 def test_points_to_rows_2d():
     label_data = np.zeros((10, 10), dtype=int)
     label_data[2:4, 2:4] = 5
@@ -164,6 +204,52 @@ def test_rows_to_points_skips_missing_label():
     assert rows_to_points(df, label_data, {0: (1, 0, 0, 1)}) == []
 
 
+def test_label_geometry_matches_regionprops():
+    from skimage.measure import regionprops
+
+    rng = np.random.default_rng(1)
+    label_data = rng.integers(0, 6, size=(3, 20, 30))
+    geometry = label_geometry(label_data, plane_axis="Z")
+    for plane in range(3):
+        props = regionprops(label_data[plane])
+        table = geometry[geometry["Z"] == plane].set_index("Label")
+        assert sorted(table.index) == [p.label for p in props]
+        for p in props:
+            assert table.loc[p.label, "Area"] == p.area
+            np.testing.assert_allclose(
+                table.loc[p.label, ["CentroidY", "CentroidX"]], p.centroid
+            )
+
+
+def test_label_geometry_handles_sparse_label_ids():
+    label_data = np.zeros((4, 4), dtype=np.int64)
+    label_data[0, 0] = 10**9
+    label_data[3, 3] = 7
+    geometry = label_geometry(label_data).set_index("Label")
+    assert sorted(geometry.index) == [7, 10**9]
+    assert geometry.loc[10**9, "CentroidY"] == 0
+    assert geometry.loc[7, "CentroidX"] == 3
+
+
+def test_rows_to_points_3d_skips_unknown_class_and_plane():
+    label_data = np.zeros((2, 10, 10), dtype=int)
+    label_data[0, 2:4, 2:4] = 1
+    label_data[1, 6:8, 6:8] = 1
+    df = pd.DataFrame(
+        [
+            {"Z": 0, "Label": 1, "ClassID": 0, "Class": "a"},
+            {"Z": 1, "Label": 1, "ClassID": 5, "Class": "?"},
+            {"Z": 9, "Label": 1, "ClassID": 0, "Class": "a"},
+            {"Z": 1, "Label": 1, "ClassID": 0, "Class": "a"},
+        ]
+    )
+    placements = rows_to_points(
+        df, label_data, {0: (1, 0, 0, 1)}, plane_axis="Z"
+    )
+    points = [point.tolist() for point, _ in placements]
+    assert points == [[0, 2.5, 2.5], [1, 6.5, 6.5]]
+
+
 def test_points_to_rows_skips_background_label():
     label_data = np.zeros((10, 10), dtype=int)
     label_data[2:4, 2:4] = 5
@@ -241,6 +327,46 @@ def test_run_panoptic_creation_copies_segmentations(tmp_path):
     assert str(project_dir) in ref_path
 
 
+def test_run_panoptic_creation_parquet_storage(tmp_path):
+    pytest.importorskip("pyarrow")
+    from napari_towbintools_annotator.project_creator import (
+        ProjectCreatorWidget,
+    )
+    from napari_towbintools_annotator.storage import read_table
+
+    src_ref = tmp_path / "src_ref"
+    src_seg = tmp_path / "src_seg"
+    src_ref.mkdir()
+    src_seg.mkdir()
+    (src_ref / "a.tif").write_text("x")
+    (src_seg / "a.tif").write_text("x")
+    project_dir = tmp_path / "proj"
+
+    class _Status:
+        def emit(self, *args, **kwargs):
+            pass
+
+    widget = ProjectCreatorWidget.__new__(ProjectCreatorWidget)
+    ProjectCreatorWidget._run_panoptic_creation(
+        widget,
+        "proj",
+        "multichannel",
+        str(project_dir),
+        [str(src_ref)],
+        [str(src_seg)],
+        ["a"],
+        False,
+        _Status(),
+        storage_format="parquet",
+    )
+
+    project = Project.load(str(project_dir))
+    assert project.storage_format == "parquet"
+    assert project.annotation_df_path.endswith(".parquet")
+    master = read_table(str(project_dir / project.annotation_df_path))
+    assert master["Reference"].tolist() == [str(src_ref / "a.tif")]
+
+
 def test_panoptic_widget_load_and_save(tmp_path):
     import napari
 
@@ -507,3 +633,220 @@ def test_panoptic_widget_save_empty_then_reload(tmp_path):
         assert len(widget._annotation_layer.data) == 0
     finally:
         viewer.close()
+
+
+def test_panoptic_widget_recovers_journaled_edits(tmp_path):
+    import napari
+
+    project_dir = tmp_path / "proj"
+    annotations_dir = project_dir / "annotations"
+    annotations_dir.mkdir(parents=True)
+
+    ref_path = tmp_path / "img.tif"
+    seg_path = tmp_path / "img_seg.tif"
+    tifffile.imwrite(str(ref_path), np.zeros((10, 10), dtype=np.uint8))
+    tifffile.imwrite(str(seg_path), np.zeros((10, 10), dtype=np.uint16))
+    master_path = annotations_dir / "annotations.csv"
+    pd.DataFrame(
+        {
+            "Reference": [str(ref_path)],
+            "Segmentation": [str(seg_path)],
+            "Annotation": [""],
+        }
+    ).to_csv(master_path, index=False)
+
+    # Simulate a crash after an edit was journaled but not compacted.
+    out_csv = annotations_dir / "img.csv"
+    pd.DataFrame(columns=["Label", "ClassID", "Class"]).to_csv(
+        out_csv, index=False
+    )
+    journal = AnnotationJournal(str(master_path))
+    journal.append(0, "Annotation", str(out_csv))
+    journal.close()
+
+    project = PanopticProject(
+        name="p",
+        image_type="multichannel",
+        annotation_directories=["annotations"],
+        annotation_df_path="annotations/annotations.csv",
+        data_directories=[str(tmp_path)],
+        mask_directories=[str(tmp_path)],
+        classes=["a", "b"],
+        project_dir=str(project_dir),
+    )
+
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = PanopticAnnotatorWidget(viewer, project)
+        assert widget.annotation_df.loc[0, "Annotation"] == str(out_csv)
+    finally:
+        viewer.close()
+
+    master = pd.read_csv(master_path)
+    assert str(master.loc[0, "Annotation"]) == str(out_csv)
+    assert AnnotationJournal(str(master_path)).segments() == []
+
+
+def test_panoptic_widget_refresh_appends_new_pairs(tmp_path):
+    import napari
+
+    project_dir = tmp_path / "proj"
+    annotations_dir = project_dir / "annotations"
+    annotations_dir.mkdir(parents=True)
+    ref_dir = tmp_path / "ref"
+    seg_dir = tmp_path / "seg"
+    ref_dir.mkdir()
+    seg_dir.mkdir()
+
+    def write_pair(name):
+        tifffile.imwrite(str(ref_dir / name), np.zeros((8, 8), np.uint8))
+        tifffile.imwrite(str(seg_dir / name), np.ones((8, 8), np.uint16))
+
+    write_pair("t1.tif")
+    pd.DataFrame(
+        {
+            "Reference": [str(ref_dir / "t1.tif")],
+            "Segmentation": [str(seg_dir / "t1.tif")],
+            "Annotation": [str(annotations_dir / "t1.csv")],
+        }
+    ).to_csv(annotations_dir / "annotations.csv", index=False)
+    project = PanopticProject(
+        name="p",
+        image_type="multichannel",
+        annotation_directories=["annotations"],
+        annotation_df_path="annotations/annotations.csv",
+        data_directories=[str(ref_dir)],
+        mask_directories=[str(seg_dir)],
+        classes=["a"],
+        project_dir=str(project_dir),
+    )
+    project.save()
+
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = PanopticAnnotatorWidget(viewer, project)
+        write_pair("t2.tif")
+        assert widget.refresh_files() == 1
+        assert widget.file_list_widget.count() == 2
+        assert widget.reference_files[-1] == str(ref_dir / "t2.tif")
+        assert widget.refresh_files() == 0
+        widget.close()
+    finally:
+        viewer.close()
+
+    master = pd.read_csv(annotations_dir / "annotations.csv")
+    assert master["Annotation"].tolist()[0] == str(annotations_dir / "t1.csv")
+    assert master["Segmentation"].tolist()[1] == str(seg_dir / "t2.tif")
+    assert Project.load(str(project_dir)).directory_snapshot
+
+
+def test_panoptic_reuses_layers_across_files(tmp_path):
+    import napari
+
+    project_dir = tmp_path / "proj"
+    annotations_dir = project_dir / "annotations"
+    annotations_dir.mkdir(parents=True)
+    shapes = [(10, 10), (12, 12), (5, 10, 10)]
+    references, segmentations = [], []
+    for i, shape in enumerate(shapes):
+        ref_path = tmp_path / f"img{i}.tif"
+        seg_path = tmp_path / f"img{i}_seg.tif"
+        tifffile.imwrite(
+            str(ref_path), np.full(shape, 10 * (i + 1), dtype=np.uint16)
+        )
+        segmentation = np.zeros(shape, dtype=np.uint16)
+        segmentation[..., 2:4, 2:4] = 5
+        tifffile.imwrite(str(seg_path), segmentation)
+        references.append(str(ref_path))
+        segmentations.append(str(seg_path))
+    pd.DataFrame(
+        {
+            "Reference": references,
+            "Segmentation": segmentations,
+            "Annotation": [""] * 3,
+        }
+    ).to_csv(annotations_dir / "annotations.csv", index=False)
+    project = _make_panoptic_project(tmp_path)
+    project.project_dir = str(project_dir)
+
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = PanopticAnnotatorWidget(viewer, project)
+        layers = list(viewer.layers)
+        assert widget._reference_layer.contrast_limits_range == [0, 65535]
+        widget._reference_layer.contrast_limits = (0, 5)
+        widget.keep_contrast_checkbox.setChecked(True)
+        widget.next_file()
+
+        assert list(viewer.layers) == layers
+        assert widget._reference_layer.name == "img1.tif"
+        assert widget._reference_layer.data.shape == (12, 12)
+        assert widget._reference_layer.contrast_limits == [0, 5]
+        assert len(widget._annotation_layer.data) == 0
+
+        widget.previous_file()
+        widget.keep_contrast_checkbox.setChecked(False)
+        widget.next_file()
+        assert widget._reference_layer.contrast_limits != [0, 5]
+
+        # A change of dimensionality rebuilds the layers.
+        widget.next_file()
+        assert widget._segmentation_layer not in layers
+        assert widget._segmentation_layer.data.ndim == 3
+        assert len(viewer.layers) == 3
+        widget.close()
+    finally:
+        viewer.close()
+
+
+def test_panoptic_undo_does_not_cross_files(make_project):
+    import napari
+
+    project = make_project("panoptic", {"img0": [5], "img1": [7]})
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = PanopticAnnotatorWidget(viewer, project)
+        layer = widget._segmentation_layer
+        layer.paint((3, 3), 9)
+        assert layer.data[3, 3] == 9
+        widget.next_file()
+        assert widget._segmentation_layer is layer
+
+        # Undo must not write the first file's old values into the second.
+        layer.undo()
+        assert np.asarray(layer.data)[2:5, 2:5].tolist() == [[7] * 3] * 3
+        widget.close()
+    finally:
+        viewer.close()
+
+
+def test_panoptic_prefetch_stays_within_the_widget_cache(make_project):
+    import napari
+
+    from napari_towbintools_annotator.image_io import image_cache
+
+    project = make_project(
+        "panoptic", {"img0": [5], "img1": [7], "img2": [9]}
+    )
+    project.image_cache_mb = 1
+    budget = image_cache.max_bytes
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = PanopticAnnotatorWidget(viewer, project)
+        assert widget._image_cache.max_bytes == 1024**2
+        assert image_cache.max_bytes == budget
+
+        # Prefetched pairs hold only their sidecars; arrays stay in the
+        # cache, which is free to evict them.
+        row = widget.annotation_df.iloc[2]
+        geometry, _ = widget._prefetcher.take(
+            (row["Reference"], row["Segmentation"])
+        )
+        assert geometry["Label"].tolist() == [9]
+        widget._image_cache.max_bytes = 0
+        widget.next_file()
+        assert np.asarray(widget._segmentation_layer.data).max() == 7
+        assert widget._image_cache.nbytes == 0
+        widget.close()
+    finally:
+        viewer.close()
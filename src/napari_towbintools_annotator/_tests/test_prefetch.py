@@ -0,0 +1,45 @@
+import threading
+
+from napari_towbintools_annotator.prefetch import Prefetcher
+
+
+def test_prefetcher_take_returns_loaded_value():
+    prefetcher = Prefetcher(lambda key: key * 2, workers=2)
+    try:
+        prefetcher.schedule([1, 2])
+        assert prefetcher.take(2) == 4
+        assert prefetcher.take(1) == 2
+        # Taken keys are released.
+        assert prefetcher.take(1) is None
+    finally:
+        prefetcher.shutdown()
+
+
+def test_prefetcher_drops_keys_outside_window():
+    release = threading.Event()
+
+    def loader(key):
+        release.wait(timeout=5)
+        return key
+
+    prefetcher = Prefetcher(loader, workers=1)
+    try:
+        prefetcher.schedule(["a", "b"])
+        prefetcher.schedule(["b"])
+        release.set()
+        assert prefetcher.take("a") is None
+        assert prefetcher.take("b") == "b"
+    finally:
+        prefetcher.shutdown()
+
+
+def test_prefetcher_failed_load_returns_none():
+    def loader(key):
+        raise OSError("unreadable")
+
+    prefetcher = Prefetcher(loader)
+    try:
+        prefetcher.schedule(["x"])
+        assert prefetcher.take("x") is None
+    finally:
+        prefetcher.shutdown()
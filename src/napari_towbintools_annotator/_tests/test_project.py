@@ -1,4 +1,15 @@
-from napari_towbintools_annotator.project import Project
+import os
+
+import pandas as pd
+import pytest
+
+from napari_towbintools_annotator import refresh
+from napari_towbintools_annotator.image_io import default_cache_bytes
+from napari_towbintools_annotator.project import (
+    ClassificationProject,
+    PanopticProject,
+    Project,
+)
 
 
 def test_create_project():
@@ -10,3 +21,127 @@ def test_create_project():
         data_directories="./test_images",
         project_dir="./test_project",
     )
+
+
+def test_lazy_loading_follows_image_type():
+    def make(image_type, lazy_loading=None):
+        return Project(
+            name="test_project",
+            image_type=image_type,
+            project_type="classification",
+            annotation_directories=[],
+            data_directories=[],
+            project_dir="./test_project",
+            lazy_loading=lazy_loading,
+        )
+
+    assert not make("multichannel").uses_lazy_loading()
+    assert make("zstack").uses_lazy_loading()
+    assert make("time_series").uses_lazy_loading()
+    assert not make("zstack", lazy_loading=False).uses_lazy_loading()
+    assert make("multichannel", lazy_loading=True).uses_lazy_loading()
+
+
+def test_image_cache_budget_is_a_project_setting(tmp_path):
+    project = _classification_project(tmp_path, tmp_path)
+    assert project.cache_bytes() == default_cache_bytes() > 0
+
+    project.image_cache_mb = 512
+    project.save()
+    loaded = Project.load(project.project_dir)
+    assert loaded.image_cache_mb == 512
+    assert loaded.cache_bytes() == 512 * 1024**2
+
+    with pytest.raises(ValueError, match="image_cache_mb"):
+        _classification_project(tmp_path, tmp_path, image_cache_mb=0)
+
+
+def _classification_project(tmp_path, data_dir, **kwargs):
+    project_dir = tmp_path / "proj"
+    project_dir.mkdir(exist_ok=True)
+    return ClassificationProject(
+        name="p",
+        image_type="2D",
+        annotation_directories=["annotations"],
+        annotation_df_path="annotations/annotations.csv",
+        project_dir=str(project_dir),
+        classes=["a"],
+        data_directories=[str(data_dir)],
+        **kwargs,
+    )
+
+
+def test_refresh_appends_only_new_files(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name in ("img1.tif", "img2.tif", "notes.txt"):
+        (data_dir / name).write_text("x")
+    project = _classification_project(
+        tmp_path, data_dir, file_extensions=[".tif"]
+    )
+    df = pd.DataFrame(
+        {"ImagePath": [str(data_dir / "img1.tif")], "Class": ["a"]}
+    )
+
+    new_rows = project.refresh(df)
+    assert new_rows["ImagePath"].tolist() == [str(data_dir / "img2.tif")]
+    assert new_rows["Class"].isna().all()
+
+    # An unchanged directory is not listed again.
+    listed = []
+    original = refresh.iter_scan
+
+    def counting_iter_scan(directories, **kwargs):
+        listed.extend(directories)
+        return original(directories, **kwargs)
+
+    monkeypatch.setattr(refresh, "iter_scan", counting_iter_scan)
+    df = pd.concat([df, new_rows], ignore_index=True)
+    assert project.refresh(df).empty
+    assert listed == []
+
+    (data_dir / "img3.tif").write_text("x")
+    os.utime(data_dir, ns=(0, os.stat(data_dir).st_mtime_ns + 1))
+    project.ignored_images = [str(data_dir / "img2.tif")]
+    new_rows = project.refresh(df.iloc[:1])
+    assert new_rows["ImagePath"].tolist() == [str(data_dir / "img3.tif")]
+    assert listed == [str(data_dir)]
+
+
+def test_refresh_pairs_late_segmentations(tmp_path):
+    ref_dir = tmp_path / "ref"
+    seg_dir = tmp_path / "seg"
+    ref_dir.mkdir()
+    seg_dir.mkdir()
+    (ref_dir / "a.tif").write_text("x")
+    (ref_dir / "b.tif").write_text("x")
+    (seg_dir / "a.tif").write_text("x")
+    project_dir = tmp_path / "proj"
+    project_dir.mkdir()
+    project = PanopticProject(
+        name="p",
+        image_type="2D",
+        annotation_directories=["annotations"],
+        annotation_df_path="annotations/annotations.csv",
+        project_dir=str(project_dir),
+        classes=["a"],
+        data_directories=[str(ref_dir)],
+        mask_directories=[str(seg_dir)],
+    )
+    df = pd.DataFrame(columns=["Reference", "Segmentation", "Annotation"])
+
+    new_rows = project.refresh(df)
+    assert new_rows["Reference"].tolist() == [str(ref_dir / "a.tif")]
+    assert new_rows["Annotation"].tolist() == [""]
+    df = pd.concat([df, new_rows], ignore_index=True)
+
+    # b.tif only gets its segmentation now.
+    (seg_dir / "b.tif").write_text("x")
+    os.utime(seg_dir, ns=(0, os.stat(seg_dir).st_mtime_ns + 1))
+    new_rows = project.refresh(df)
+    assert new_rows["Segmentation"].tolist() == [str(seg_dir / "b.tif")]
+
+    project.save()
+    loaded = Project.load(str(project_dir))
+    assert loaded.directory_snapshot == project.directory_snapshot
+    assert set(loaded.directory_snapshot) == {str(ref_dir), str(seg_dir)}
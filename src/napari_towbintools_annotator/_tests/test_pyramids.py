@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import tifffile
+
+from napari_towbintools_annotator import pyramids
+from napari_towbintools_annotator.classification_annotator import (
+    ClassificationAnnotatorWidget,
+)
+from napari_towbintools_annotator.pyramids import (
+    PYRAMID_DIR,
+    downsample,
+    is_pyramid_candidate,
+    read_pyramid,
+    write_pyramid,
+)
+
+
+def test_downsample_means_images_and_keeps_label_ids():
+    image = np.array([[0, 2, 9], [2, 4, 9], [9, 9, 9]], dtype=np.uint8)
+    assert downsample(image).tolist() == [[2]]
+
+    labels = np.array([[3, 3, 0, 7], [3, 5, 7, 7]], dtype=np.uint16)
+    assert downsample(labels, labels=True).tolist() == [[3, 0]]
+
+
+def test_is_pyramid_candidate():
+    assert is_pyramid_candidate((5000, 100))
+    assert is_pyramid_candidate((5000, 5000, 3))
+    assert not is_pyramid_candidate((100, 100))
+    assert not is_pyramid_candidate((10, 5000, 5000))
+
+
+def test_write_then_read_pyramid(tmp_path):
+    path = tmp_path / "big.tif"
+    image = np.arange(64 * 48, dtype=np.uint16).reshape(64, 48)
+    tifffile.imwrite(str(path), image)
+    pyramid_dir = str(tmp_path / PYRAMID_DIR)
+
+    assert write_pyramid(str(path), pyramid_dir, min_size=64) is None
+    written = write_pyramid(str(path), pyramid_dir, min_size=16, top_size=16)
+    levels = read_pyramid(str(path), pyramid_dir)
+    assert [level.shape for level in levels] == [(64, 48), (32, 24), (16, 12)]
+    assert np.array_equal(levels[0], image)
+    # A labels pyramid is a different pyramid.
+    assert read_pyramid(str(path), pyramid_dir, labels=True) is None
+
+    tifffile.imwrite(str(path), image[::-1])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert read_pyramid(str(path), pyramid_dir) is None
+    assert write_pyramid(str(path), pyramid_dir, min_size=16) == written
+    assert np.array_equal(read_pyramid(str(path), pyramid_dir)[0], image[::-1])
+
+
+def test_write_pyramid_skips_small_tiffs_without_decoding(
+    tmp_path, monkeypatch
+):
+    path = tmp_path / "small.tif"
+    tifffile.imwrite(
+        str(path), np.zeros((32, 32), dtype=np.uint8), compression="zlib"
+    )
+
+    def fail(*args, **kwargs):
+        raise AssertionError("small image decoded")
+
+    monkeypatch.setattr(pyramids, "_open_source", fail)
+    assert write_pyramid(str(path), str(tmp_path), min_size=64) is None
+
+
+def test_classification_widget_displays_pyramids(tmp_path):
+    import napari
+    import pandas as pd
+
+    from napari_towbintools_annotator.project import ClassificationProject
+
+    project_dir = tmp_path / "proj"
+    (project_dir / "annotations").mkdir(parents=True)
+    paths = []
+    for name, shape in (("big", (64, 64)), ("small", (8, 8))):
+        path = tmp_path / f"{name}.tif"
+        tifffile.imwrite(str(path), np.ones(shape, dtype=np.uint8))
+        paths.append(str(path))
+    write_pyramid(
+        paths[0], str(project_dir / PYRAMID_DIR), min_size=16, top_size=16
+    )
+    pd.DataFrame({"ImagePath": paths, "Class": np.nan}).to_csv(
+        project_dir / "annotations" / "annotations.csv", index=False
+    )
+    project = ClassificationProject(
+        name="p",
+        image_type="2D",
+        annotation_directories=["annotations"],
+        annotation_df_path="annotations/annotations.csv",
+        project_dir=str(project_dir),
+        classes=["a"],
+        data_directories=[str(tmp_path)],
+        pyramids=True,
+    )
+
+    viewer = napari.Viewer(show=False)
+    try:
+        widget = ClassificationAnnotatorWidget(viewer, project)
+        assert widget._image_layer.multiscale
+        assert len(widget._image_layer.data) == 3
+        widget.next_file()
+        assert not widget._image_layer.multiscale
+        assert list(viewer.layers) == [widget._image_layer]
+        widget.close()
+    finally:
+        viewer.close()
+
+
+def test_panoptic_pairs_load_label_pyramids(tmp_path):
+    from napari_towbintools_annotator.panoptic_annotator import _load_pair
+
+    reference = tmp_path / "ref.tif"
+    segmentation = tmp_path / "seg.tif"
+    labels = np.zeros((32, 32), dtype=np.uint16)
+    labels[4:8, 4:8] = 7
+    tifffile.imwrite(str(reference), np.ones((32, 32), dtype=np.uint8))
+    tifffile.imwrite(str(segmentation), labels)
+    pyramid_dir = str(tmp_path / PYRAMID_DIR)
+    write_pyramid(
+        str(segmentation), pyramid_dir, labels=True, min_size=16, top_size=16
+    )
+
+    loaded_ref, loaded_seg, geometry, _ = _load_pair(
+        (str(reference), str(segmentation)),
+        index_dir=str(tmp_path / "annotations"),
+        pyramid_dir=pyramid_dir,
+    )
+    assert not isinstance(loaded_ref, list)
+    assert [level.shape for level in loaded_seg] == [(32, 32), (16, 16)]
+    assert set(np.unique(loaded_seg[1])) == {0, 7}
+    assert geometry["Label"].tolist() == [7]
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from natsort import natsorted
+
+from napari_towbintools_annotator.project_creator import ProjectCreatorWidget
+from napari_towbintools_annotator.scanning import (
+    iter_scan,
+    normalize_extensions,
+    scan_directory,
+    scan_files,
+    status_progress,
+)
+
+
+class _Status:
+    def __init__(self):
+        self.messages = []
+
+    def emit(self, message):
+        self.messages.append(message)
+
+
+def _make_files(directory, names):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (directory / name).write_text("x")
+
+
+def test_normalize_extensions():
+    assert normalize_extensions(None) is None
+    assert normalize_extensions("") is None
+    assert normalize_extensions("tif, .PNG;jpg") == {".tif", ".png", ".jpg"}
+    assert normalize_extensions(["TIFF"]) == {".tiff"}
+
+
+def test_scan_directory_filters_and_natsorts(tmp_path):
+    _make_files(tmp_path, ["img10.tif", "img2.tif", "img1.TIF", "notes.txt"])
+    (tmp_path / "sub").mkdir()
+    assert scan_directory(str(tmp_path)) == [
+        str(tmp_path / name)
+        for name in ("img1.TIF", "img2.tif", "img10.tif", "notes.txt")
+    ]
+    assert scan_directory(str(tmp_path), {".tif"}) == [
+        str(tmp_path / name) for name in ("img1.TIF", "img2.tif", "img10.tif")
+    ]
+
+
+def test_scan_files_matches_natsort_of_full_paths(tmp_path):
+    directories = []
+    for dir_name in ("a", "a10", "a2", "b"):
+        _make_files(tmp_path / dir_name, ["f10.tif", "f1.tif", "f2.tif"])
+        directories.append(str(tmp_path / dir_name))
+
+    expected = natsorted(
+        str(tmp_path / d / f)
+        for d in ("a", "a10", "a2", "b")
+        for f in ("f10.tif", "f1.tif", "f2.tif")
+    )
+    assert scan_files(directories, workers=3) == expected
+
+
+def test_iter_scan_reports_progress(tmp_path):
+    _make_files(tmp_path / "a", ["1.tif", "2.tif"])
+    _make_files(tmp_path / "b", ["1.tif"])
+    calls = []
+    scanned = list(
+        iter_scan(
+            [str(tmp_path / "b"), str(tmp_path / "a")],
+            progress=lambda *args: calls.append(args),
+        )
+    )
+    assert [d for d, _ in scanned] == [
+        str(tmp_path / "a"),
+        str(tmp_path / "b"),
+    ]
+    assert calls == [(1, 2, 2), (2, 2, 3)]
+
+
+def test_classification_creation_streams_csv_with_filter(tmp_path):
+    _make_files(tmp_path / "data" / "d1", ["x2.tif", "x1.tif", "x.log"])
+    _make_files(tmp_path / "data" / "d2", ["y.tif"])
+    project_dir = tmp_path / "proj"
+    status = _Status()
+
+    widget = ProjectCreatorWidget.__new__(ProjectCreatorWidget)
+    ProjectCreatorWidget._run_classification_creation(
+        widget,
+        "proj",
+        "2D",
+        "image",
+        str(project_dir),
+        [str(tmp_path / "data" / "d1"), str(tmp_path / "data" / "d2")],
+        [],
+        ["a"],
+        False,
+        status,
+        extensions="tif",
+    )
+
+    master = pd.read_csv(project_dir / "annotations" / "annotations.csv")
+    assert list(master.columns) == ["ImagePath", "Class"]
+    assert master["ImagePath"].tolist() == [
+        str(tmp_path / "data" / "d1" / "x1.tif"),
+        str(tmp_path / "data" / "d1" / "x2.tif"),
+        str(tmp_path / "data" / "d2" / "y.tif"),
+    ]
+    assert np.all(master["Class"].isna())
+    assert status.messages[-1].startswith("Scanning image files: 2/2")
+
+
+def test_status_progress_formats_and_throttles():
+    status = _Status()
+    progress = status_progress(status, "mask files")
+    progress(1, 2, 7)
+    assert status.messages == [
+        "Scanning mask files: 1/2 directories, 7 files found..."
+    ]
+
+    status = _Status()
+    progress = status_progress(
+        status, message=lambda done, total: f"{done}/{total}", interval=60
+    )
+    for done in range(1, 4):
+        progress(done, 3)
+    # Only the first and the last call get through.
+    assert status.messages == ["1/3", "3/3"]
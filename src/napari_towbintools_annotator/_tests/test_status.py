@@ -0,0 +1,124 @@
+import numpy as np
+
+from napari_towbintools_annotator.status import (
+    ANNOTATED,
+    IGNORED,
+    UNANNOTATED,
+    AnnotationStatus,
+    RowIndex,
+    is_empty,
+)
+
+
+def test_is_empty():
+    values = [np.nan, "", " nan ", "None", "a", None]
+    assert is_empty(values).tolist() == [True, True, True, True, False, True]
+
+
+def test_from_values_is_vectorised_equivalent():
+    status = AnnotationStatus.from_values(
+        ["a", "nan", "b", "legacy", "a"],
+        classes=["a", "b"],
+        ignored=[False, False, False, False, True],
+    )
+    assert status.state.tolist() == [
+        ANNOTATED,
+        UNANNOTATED,
+        ANNOTATED,
+        ANNOTATED,
+        IGNORED,
+    ]
+    assert status.class_ids.tolist() == [0, -1, 1, -1, 0]
+    # The ignored row does not count towards its class.
+    assert status.class_counts.tolist() == [1, 1]
+    assert (status.n_annotated, status.n_ignored, status.n_active) == (3, 1, 4)
+    assert status.summary(["a", "b"]) == (
+        "3/4 annotated (a: 1, b: 1), 1 ignored"
+    )
+
+
+def test_set_keeps_counts_in_step():
+    status = AnnotationStatus.from_values(["nan"] * 4, classes=["a", "b"])
+    status.set(0, ANNOTATED, 1)
+    status.set(1, ANNOTATED, 1)
+    status.set(1, ANNOTATED, 0)
+    status.set(2, IGNORED)
+    assert status.class_counts.tolist() == [1, 1]
+    assert status.state_counts.tolist() == [1, 2, 1]
+
+    recounted = AnnotationStatus(status.state, status.class_ids, 2)
+    assert recounted.class_counts.tolist() == status.class_counts.tolist()
+    assert recounted.state_counts.tolist() == status.state_counts.tolist()
+
+
+def test_navigation_helpers():
+    status = AnnotationStatus([1, 0, 1, 0, 2])
+    assert status.first(UNANNOTATED) == 1
+    assert status.last(ANNOTATED) == 2
+    assert status.next_row(1, UNANNOTATED) == 3
+    assert status.next_row(3, UNANNOTATED) == 1
+    assert status.first(IGNORED) == 4
+
+    status.append(2)
+    assert status.next_row(3, UNANNOTATED) == 5
+    status.compact(status.state != IGNORED)
+    assert status.state.tolist() == [1, 0, 1, 0, 0, 0]
+    assert status.state_counts.tolist() == [4, 2, 0]
+
+
+def test_row_index_bisects_and_wraps():
+    index = RowIndex.from_keys([0, 1, 0, 2, 0], skip=(2,))
+    assert index.rows(0) == [0, 2, 4]
+    assert index.rows(2) == []
+    assert index.next_after(0, 2) == 4
+    assert index.next_after(0, 4) == 0
+    index.discard(0, 2)
+    index.add(0, 3)
+    index.add(0, 3)
+    assert index.rows(0) == [0, 3, 4]
+    assert index.next_after(1, 1) == 1
+    assert index.next_after(2, 0) is None
+
+
+def test_navigation_index_follows_edits():
+    status = AnnotationStatus.from_values(["nan"] * 6, classes=["a", "b"])
+    status.set(1, ANNOTATED, 0)
+    status.set(4, ANNOTATED, 0)
+    status.set(2, ANNOTATED, 1)
+    assert status.next_row(1, UNANNOTATED) == 3
+    assert status.next_of_class(1, 0) == 4
+    assert status.next_of_class(4, 0) == 1
+    status.set(4, ANNOTATED, 1)
+    assert status.next_of_class(1, 0) == 1
+    assert status.next_of_class(0, 1) == 2
+    status.set(3, IGNORED)
+    assert status.next_row(1, UNANNOTATED) == 5
+
+    assert status.next_flagged(0) is None
+    status.set_flag(5, True)
+    status.set_flag(2, True)
+    assert status.next_flagged(2) == 5
+    assert status.next_flagged(5) == 2
+    assert status.summary().endswith("1 ignored, 2 flagged")
+
+    status.append(2)
+    assert status.next_row(5, UNANNOTATED) == 6
+    status.compact(status.state != IGNORED)
+    assert status.next_flagged(0) == 2
+    assert status.next_flagged(2) == 4
+    assert status.next_of_class(0, 1) == 2
+
+
+def test_set_many_matches_single_updates():
+    values = ["a", "nan", "b", "nan", "a"]
+    ignored = [False, False, False, True, False]
+    bulk = AnnotationStatus.from_values(values, ["a", "b"], ignored)
+    single = AnnotationStatus.from_values(values, ["a", "b"], ignored)
+    bulk.set_many([4, 0, 1, 3], ANNOTATED, 1)
+    for row in (0, 1, 3, 4):
+        single.set(row, ANNOTATED, 1)
+    assert bulk.state.tolist() == single.state.tolist()
+    assert bulk.class_counts.tolist() == single.class_counts.tolist() == [0, 5]
+    assert bulk.state_counts.tolist() == single.state_counts.tolist()
+    assert bulk.next_of_class(1, 1) == 2
+    assert bulk.next_of_class(0, 0) is None
@@ -0,0 +1,164 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from napari_towbintools_annotator.storage import (
+    AnnotationJournal,
+    SnapshotWriter,
+    atomic_path,
+    convert_table,
+    read_table,
+    table_filename,
+    write_table_atomic,
+)
+
+
+def test_journal_replays_events_in_order(tmp_path):
+    table = str(tmp_path / "annotations.csv")
+    journal = AnnotationJournal(table)
+    journal.append(0, "Class", "a")
+    journal.append(1, "Class", "b")
+    journal.append(0, "Class", "c")
+    journal.close()
+
+    df = pd.DataFrame({"Class": ["", "", ""]})
+    # A fresh journal (as after a crash) finds the segment on disk.
+    assert AnnotationJournal(table).replay(df) == 3
+    assert df["Class"].tolist() == ["c", "b", ""]
+
+
+def test_journal_rotate_and_discard_keeps_later_edits(tmp_path):
+    table = str(tmp_path / "annotations.csv")
+    journal = AnnotationJournal(table)
+    journal.append(0, "Class", "a")
+    compacted = journal.rotate()
+    assert journal.pending == 0
+    journal.append(1, "Class", "b")
+    journal.discard(compacted)
+    journal.close()
+
+    df = pd.DataFrame({"Class": ["", ""]})
+    AnnotationJournal(table).replay(df)
+    assert df["Class"].tolist() == ["", "b"]
+
+
+def test_journal_skips_truncated_line_and_missing_rows(tmp_path):
+    table = str(tmp_path / "annotations.csv")
+    journal = AnnotationJournal(table)
+    journal.append(0, "Class", "a")
+    journal.append(5, "Class", "b")
+    journal.close()
+    with open(journal.segments()[-1], "a", encoding="utf-8") as file:
+        file.write('{"row": 0, "field": "Cla')
+
+    df = pd.DataFrame({"Class": [""]})
+    assert AnnotationJournal(table).replay(df) == 1
+    assert df["Class"].tolist() == ["a"]
+
+
+def test_snapshot_writer_coalesces_to_latest(tmp_path):
+    path = tmp_path / "annotations.csv"
+    writer = SnapshotWriter(str(path))
+    started = threading.Event()
+    release = threading.Event()
+    written = []
+
+    def hold_writer():
+        started.set()
+        release.wait(timeout=5)
+
+    try:
+        writer.submit(pd.DataFrame({"Class": ["first"]}), hold_writer)
+        assert started.wait(timeout=5)
+        for i in range(10):
+            writer.submit(
+                pd.DataFrame({"Class": [str(i)]}),
+                on_written=lambda i=i: written.append(i),
+            )
+        release.set()
+        writer.flush()
+        assert writer.writes == 2
+        # Callbacks of superseded snapshots still run.
+        assert written == list(range(10))
+        assert pd.read_csv(path)["Class"].tolist() == [9]
+        assert os.listdir(tmp_path) == ["annotations.csv"]
+    finally:
+        writer.close()
+
+
+def test_snapshot_writer_flush_reraises_write_error(tmp_path):
+    writer = SnapshotWriter(str(tmp_path / "missing" / "annotations.csv"))
+    try:
+        writer.submit(pd.DataFrame({"Class": ["a"]}))
+        with pytest.raises(OSError):
+            writer.flush()
+        assert not writer.pending
+    finally:
+        writer.close()
+
+
+@pytest.mark.parametrize("storage_format", ["csv", "parquet", "feather"])
+def test_table_roundtrip_preserves_paths(tmp_path, storage_format):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame(
+        {
+            "Reference": ["/data/a/img1.tif", "C:\\data\\img2.tif", "x.tif"],
+            "Segmentation": ["/seg/img1.tif", "/seg/img2.tif", "/seg/x.tif"],
+            "Annotation": ["", "/proj/annotations/img2.csv", ""],
+        }
+    )
+    path = tmp_path / table_filename(storage_format)
+    write_table_atomic(df, str(path))
+    loaded = read_table(str(path)).fillna("")
+    assert loaded.columns.tolist() == df.columns.tolist()
+    for column in df.columns:
+        assert loaded[column].tolist() == df[column].tolist()
+
+
+def test_parquet_dictionary_encodes_path_directories(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    df = pd.DataFrame(
+        {"ImagePath": [f"/data/dir/img{i}.tif" for i in range(100)]}
+    )
+    path = tmp_path / "annotations.parquet"
+    write_table_atomic(df, str(path))
+    schema = pq.read_schema(str(path))
+    assert str(schema.field("ImagePath__dir").type).startswith("dictionary")
+
+
+def test_convert_table_imports_csv(tmp_path):
+    pytest.importorskip("pyarrow")
+    csv_path = tmp_path / "annotations.csv"
+    pd.DataFrame({"ImagePath": ["/d/a.tif"], "Class": ["x"]}).to_csv(
+        csv_path, index=False
+    )
+    parquet_path = tmp_path / "annotations.parquet"
+    convert_table(str(csv_path), str(parquet_path))
+    loaded = read_table(str(parquet_path))
+    assert loaded["ImagePath"].tolist() == ["/d/a.tif"]
+    assert loaded["Class"].tolist() == ["x"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+def test_atomic_write_keeps_file_mode(tmp_path):
+    df = pd.DataFrame({"Class": ["a"]})
+    shared = str(tmp_path / "shared.csv")
+    df.to_csv(shared, index=False)
+    os.chmod(shared, 0o664)
+    write_table_atomic(df, shared)
+    assert os.stat(shared).st_mode & 0o777 == 0o664
+
+    # New files get the mode of a plain open, not the 0600 of mkstemp.
+    plain = str(tmp_path / "plain.csv")
+    df.to_csv(plain, index=False)
+    fresh = str(tmp_path / "fresh.csv")
+    with atomic_path(fresh) as tmp:
+        df.to_csv(tmp, index=False)
+    assert os.stat(fresh).st_mode & 0o777 == os.stat(plain).st_mode & 0o777
+    assert sorted(os.listdir(tmp_path)) == [
+        "fresh.csv",
+        "plain.csv",
+        "shared.csv",
+    ]
@@ -0,0 +1,126 @@
+import os
+import threading
+
+import numpy as np
+import tifffile
+
+from napari_towbintools_annotator import thumbnails
+from napari_towbintools_annotator.grid_view import thumbnail_image
+from napari_towbintools_annotator.thumbnails import (
+    ThumbnailAtlas,
+    ThumbnailLoader,
+    make_thumbnail,
+    representative_plane,
+)
+
+
+def test_make_thumbnail_bounds_size_and_stretches():
+    image = np.arange(300 * 200, dtype=np.uint16).reshape(300, 200)
+    thumbnail = make_thumbnail(image, size=64)
+    assert thumbnail.dtype == np.uint8
+    assert max(thumbnail.shape) <= 64
+    assert thumbnail.min() == 0 and thumbnail.max() == 255
+
+    assert make_thumbnail(np.zeros((8, 8)), size=64).max() == 0
+    rgb = np.full((10, 10, 3), 7, dtype=np.uint8)
+    assert np.array_equal(make_thumbnail(rgb), rgb)
+
+
+def test_representative_plane_takes_the_middle():
+    stack = np.arange(5)[:, None, None] * np.ones((5, 6, 6))
+    assert representative_plane(stack)[0, 0] == 2
+
+
+def _write_images(tmp_path, n):
+    paths = []
+    for i in range(n):
+        path = tmp_path / f"img{i}.tif"
+        tifffile.imwrite(str(path), np.full((8, 8), i, dtype=np.uint8))
+        paths.append(str(path))
+    return paths
+
+
+def test_atlas_keeps_thumbnails_by_path(tmp_path):
+    paths = _write_images(tmp_path, 3)
+    directory = str(tmp_path / "thumbnails")
+    atlas = ThumbnailAtlas(directory, paths, size=16)
+    assert atlas.get(0) is None
+    thumbnail = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    signature = (os.stat(paths[1]).st_mtime_ns, os.stat(paths[1]).st_size)
+    assert not atlas.put(1, paths[0], thumbnail, signature)
+    assert atlas.put(1, paths[1], thumbnail, signature)
+    atlas.flush()
+
+    reopened = ThumbnailAtlas(directory, paths, size=16)
+    assert np.array_equal(reopened.get(1), thumbnail)
+    assert reopened.is_current(1, paths[1])
+    assert not reopened.is_current(0, paths[0])
+
+    # Rows dropped and added: the thumbnail follows its path.
+    reopened.remap([paths[1], str(tmp_path / "new.tif")])
+    assert len(reopened) == 2
+    assert np.array_equal(reopened.get(0), thumbnail)
+    assert reopened.get(1) is None
+
+
+def _put(atlas, row, path):
+    stat = os.stat(path)
+    thumbnail = np.full((2, 2), row, dtype=np.uint8)
+    assert atlas.put(row, path, thumbnail, (stat.st_mtime_ns, stat.st_size))
+
+
+def test_atlas_grows_in_place_and_compacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(thumbnails, "_GROW_SLOTS", 4)
+    paths = _write_images(tmp_path, 10)
+    atlas = ThumbnailAtlas(str(tmp_path / "thumbnails"), paths[:8], size=16)
+    for row in range(8):
+        _put(atlas, row, paths[row])
+    inode = os.stat(atlas.tiles_path).st_ino
+
+    # Remapping only changes the in-memory mapping.
+    before = [os.stat(p) for p in (atlas.index_path, atlas.tiles_path)]
+    atlas.remap(paths[6:])
+    after = [os.stat(p) for p in (atlas.index_path, atlas.tiles_path)]
+    assert [(s.st_ino, s.st_mtime_ns) for s in before] == [
+        (s.st_ino, s.st_mtime_ns) for s in after
+    ]
+    assert atlas.get(0)[0, 0] == 6 and atlas.get(2) is None
+
+    # New rows are appended to the same files.
+    for row in (2, 3):
+        _put(atlas, row, paths[6 + row])
+    assert os.stat(atlas.tiles_path).st_ino == inode
+    assert atlas.get(3)[0, 0] == 3
+
+    # Compaction drops the six slots of dropped rows and keeps the rest.
+    assert atlas.compact()
+    assert os.path.getsize(atlas.tiles_path) == 4 * 16 * 16
+    assert [atlas.get(row)[0, 0] for row in range(4)] == [6, 7, 2, 3]
+    assert not atlas.compact()
+    atlas.flush()
+    reopened = ThumbnailAtlas(atlas.directory, paths[6:], size=16)
+    assert reopened.get(3)[0, 0] == 3
+    assert reopened.is_current(3, paths[9])
+
+
+def test_loader_fills_the_atlas_in_the_background(tmp_path):
+    paths = _write_images(tmp_path, 3)
+    paths.append(str(tmp_path / "missing.tif"))
+    atlas = ThumbnailAtlas(str(tmp_path / "thumbnails"), paths, size=16)
+
+    ready = []
+    done = threading.Event()
+
+    def on_ready(row):
+        ready.append(row)
+        if len(ready) == 3:
+            done.set()
+
+    loader = ThumbnailLoader(atlas, on_ready, workers=2)
+    loader.request(enumerate(paths))
+    assert done.wait(60)
+    loader.shutdown()
+    assert sorted(ready) == [0, 1, 2]
+    assert atlas.get(2).shape == (8, 8)
+    assert atlas.get(3) is None
+    assert thumbnail_image(atlas.get(2)).width() == 8
@@ -0,0 +1,337 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .colors import CLASS_PALETTE, hex_to_rgba_float
+from .image_io import load_labels
+from .label_index import label_geometry
+from .project import Project
+from .storage import (
+    PATH_COLUMNS,
+    AnnotationJournal,
+    read_table,
+    sidecar_name,
+    write_table_atomic,
+)
+
+# Column holding the plane of instances annotated in 3D segmentations.
+PLANE_AXIS = "Z"
+
+
+def class_colors(classes):
+    """RGBA float color of each class id, taken from the shared palette."""
+    return {
+        i: hex_to_rgba_float(CLASS_PALETTE[i % len(CLASS_PALETTE)])
+        for i in range(len(classes))
+    }
+
+
+def nearest_class_id(color, id_to_color):
+    """Return the class id whose RGBA color is closest to ``color``.
+
+    Reference implementation of :func:`nearest_class_ids` for one color.
+    """
+    target = np.asarray(color, dtype=float)
+    best_id, best_dist = -1, float("inf")
+    for class_id, class_color in id_to_color.items():
+        dist = np.sum((target - np.asarray(class_color, dtype=float)) ** 2)
+        if dist < best_dist:
+            best_dist, best_id = dist, class_id
+    return best_id
+
+
+def class_color_table(id_to_color):
+    """Stack ``id_to_color`` into ``(class_ids, colors)`` arrays."""
+    class_ids = np.array(list(id_to_color), dtype=int)
+    if len(class_ids) == 0:
+        return class_ids, np.empty((0, 4))
+    colors = np.array([id_to_color[i] for i in class_ids], dtype=float)
+    return class_ids, colors
+
+
+def nearest_class_ids(colors, color_table):
+    """Return the nearest class id for each row of ``colors``.
+
+    ``color_table`` comes from :func:`class_color_table`. Ties resolve to the
+    first class, as in :func:`nearest_class_id`.
+    """
+    class_ids, table = color_table
+    if len(colors) == 0 or len(class_ids) == 0:
+        return np.full(len(colors), -1, dtype=int)
+    colors = np.asarray(colors, dtype=float).reshape(len(colors), -1)
+    dist = ((colors[:, None, :] - table[None, :, :]) ** 2).sum(axis=2)
+    return class_ids[np.argmin(dist, axis=1)]
+
+
+def points_to_rows(
+    points,
+    face_colors,
+    label_data,
+    id_to_color,
+    id_to_name,
+    plane_axis=None,
+    color_table=None,
+):
+    """Convert annotation points + colors into per-instance annotation rows.
+
+    Each point is rounded to integer coordinates, used to read the label value
+    under it, and its color is matched to the nearest class. Points outside the
+    label array are skipped. In 3D (``plane_axis`` set) the first-axis index is
+    recorded under that column name. Pass a precomputed ``color_table`` to
+    avoid rebuilding it from ``id_to_color`` on every call.
+    """
+    points = np.asarray(points, dtype=float)
+    shape = label_data.shape
+    if len(points) == 0 or points.ndim != 2 or points.shape[1] != len(shape):
+        return []
+    if color_table is None:
+        color_table = class_color_table(id_to_color)
+
+    index = np.rint(points).astype(int)
+    inside = np.all((index >= 0) & (index < np.array(shape)), axis=1)
+    index = index[inside]
+    colors = np.asarray(face_colors, dtype=float)[inside]
+    labels = np.asarray(label_data[tuple(index.T)]).astype(int)
+    # Background (label 0) is not an annotatable instance; skip it.
+    instance = labels != 0
+    index, colors, labels = index[instance], colors[instance], labels[instance]
+    class_ids = nearest_class_ids(colors, color_table)
+
+    rows = []
+    for plane, label_value, class_id in zip(
+        index[:, 0].tolist(), labels.tolist(), class_ids.tolist(), strict=True
+    ):
+        row = {
+            "Label": label_value,
+            "ClassID": class_id,
+            "Class": id_to_name.get(class_id, "unknown"),
+        }
+        if plane_axis is not None:
+            row = {plane_axis: plane, **row}
+        rows.append(row)
+    return rows
+
+
+def rows_to_points(
+    annotations_df, label_data, id_to_color, plane_axis=None, geometry=None
+):
+    """Convert annotation rows back into ``(point_coords, rgba)`` placements.
+
+    For each row the label's centroid is used as the point location. Rows with
+    an unknown class id, or whose label is absent from the (plane of the) label
+    array, are skipped. Centroids of all labels are computed once with
+    :func:`label_geometry` and rows are looked up in that table; pass a
+    precomputed ``geometry`` table (e.g. from the label index) to skip the
+    pass over ``label_data`` entirely.
+    """
+    if annotations_df.empty:
+        return []
+    keys = ["Label"] if plane_axis is None else [plane_axis, "Label"]
+    rows = annotations_df[keys + ["ClassID"]].astype(int)
+    rows = rows[rows["ClassID"].isin(list(id_to_color))]
+    if rows.empty:
+        return []
+
+    if geometry is None:
+        planes = rows[plane_axis].unique() if plane_axis is not None else None
+        geometry = label_geometry(label_data, plane_axis, planes=planes)
+    if geometry.empty:
+        return []
+    geometry = geometry.astype(dict.fromkeys(keys, int))
+    matched = rows.merge(geometry, on=keys, how="inner", sort=False)
+
+    coord_columns = keys[:-1] + ["CentroidY", "CentroidX"]
+    coords = matched[coord_columns].to_numpy(dtype=float)
+    return [
+        (point, id_to_color[class_id])
+        for point, class_id in zip(
+            coords, matched["ClassID"].tolist(), strict=True
+        )
+    ]
+
+
+# ----- per-file annotations -----
+def annotation_columns(plane_axis=None):
+    """Columns of a per-file annotation table."""
+    return ([plane_axis] if plane_axis is not None else []) + [
+        "Label",
+        "ClassID",
+        "Class",
+    ]
+
+
+def annotation_path(annotations_dir, reference, current=None):
+    """Path of the per-file annotation CSV of a reference image.
+
+    The CSV is named after the reference's basename. When that name is
+    already taken by the CSV of another file, it is named with
+    :func:`~.storage.sidecar_name` instead, so references with the same
+    basename in different directories do not overwrite each other.
+    ``current`` is the CSV already recorded for this reference, if any; it
+    keeps its name.
+    """
+    name = os.path.splitext(os.path.basename(reference))[0]
+    plain = os.path.join(annotations_dir, f"{name}.csv")
+    unique = os.path.join(annotations_dir, f"{sidecar_name(reference)}.csv")
+    if current in (plain, unique):
+        return current
+    return unique if os.path.exists(plain) else plain
+
+
+def read_annotations(csv_path):
+    """Read a per-file annotation CSV; an empty file gives an empty table."""
+    try:
+        return pd.read_csv(csv_path)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame(columns=annotation_columns())
+
+
+class AnnotationStore:
+    """Headless access to a project's annotations, without Qt or napari.
+
+    The master table is read as the annotator widgets read it, with the
+    edits journaled since its last full write replayed. Edits made through
+    :meth:`set` and :meth:`write_annotations` are journaled the same way and
+    compacted into the table by :meth:`save`. Do not edit a project that is
+    open in an annotator at the same time.
+    """
+
+    def __init__(self, project):
+        self.project = project
+        self.table_path = os.path.join(
+            project.project_dir, project.annotation_df_path
+        )
+        self.annotations_dir = os.path.dirname(self.table_path)
+        self.table = read_table(self.table_path)
+        for col in PATH_COLUMNS:
+            if col in self.table.columns:
+                self.table[col] = self.table[col].fillna("").astype(str)
+        self._journal = AnnotationJournal(self.table_path)
+        self._journal.replay(self.table)
+        self.classes = list(project.classes)
+        self.class_id_to_name = dict(enumerate(self.classes))
+        self.class_id_to_color = class_colors(self.classes)
+        self._color_table = class_color_table(self.class_id_to_color)
+
+    @classmethod
+    def open(cls, project_dir):
+        """Open the project saved in ``project_dir``."""
+        return cls(Project.load(project_dir))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.table)
+
+    def active_rows(self):
+        """Positions of the rows that are not ignored."""
+        ignored = np.zeros(len(self.table), dtype=bool)
+        if "Ignored" in self.table.columns:
+            ignored |= self.table["Ignored"].eq(True).to_numpy()
+        ignored_paths = self.project.ignored_images or []
+        for col in ("ImagePath", "MaskPath", "Reference"):
+            if ignored_paths and col in self.table.columns:
+                ignored |= self.table[col].isin(ignored_paths).to_numpy()
+        return np.flatnonzero(~ignored)
+
+    def iter_rows(self):
+        """Yield ``(row, record)`` for each row that is not ignored."""
+        rows = self.active_rows()
+        records = self.table.iloc[rows].to_dict("records")
+        yield from zip(rows.tolist(), records, strict=True)
+
+    def set(self, row, field, value):
+        """Set one cell of the master table."""
+        self.table.at[row, field] = value
+        self._journal.append(row, field, value)
+
+    # ----- panoptic projects -----
+    def annotation_file(self, row):
+        """Per-file annotation CSV recorded for ``row``, or ``None``."""
+        value = self.table.at[row, "Annotation"].strip()
+        return None if value in ("", "nan", "None") else value
+
+    def read_annotations(self, row):
+        """Instance rows annotated on ``row``'s segmentation."""
+        csv_path = self.annotation_file(row)
+        if csv_path is None or not os.path.exists(csv_path):
+            return pd.DataFrame(columns=annotation_columns())
+        return read_annotations(csv_path)
+
+    def write_annotations(self, row, annotations):
+        """Write the instance rows of ``row`` and record them as done."""
+        reference = self.table.at[row, "Reference"]
+        csv_path = annotation_path(
+            self.annotations_dir, reference, self.annotation_file(row)
+        )
+        pd.DataFrame(annotations).to_csv(csv_path, index=False)
+        self.set(row, "Annotation", csv_path)
+        return csv_path
+
+    def load_segmentation(self, row):
+        return load_labels(self.table.at[row, "Segmentation"])
+
+    def annotations_from_points(self, row, points, face_colors):
+        """Instance rows for points placed on ``row``'s segmentation."""
+        label_data = self.load_segmentation(row)
+        plane_axis = PLANE_AXIS if label_data.ndim == 3 else None
+        rows = points_to_rows(
+            points,
+            face_colors,
+            label_data,
+            self.class_id_to_color,
+            self.class_id_to_name,
+            plane_axis,
+            color_table=self._color_table,
+        )
+        return pd.DataFrame(rows, columns=annotation_columns(plane_axis))
+
+    def points(self, row):
+        """``(point_coords, rgba)`` placements of ``row``'s annotations."""
+        annotations = self.read_annotations(row)
+        if annotations.empty:
+            return []
+        label_data = self.load_segmentation(row)
+        plane_axis = PLANE_AXIS if label_data.ndim == 3 else None
+        return rows_to_points(
+            annotations, label_data, self.class_id_to_color, plane_axis
+        )
+
+    def concat_annotations(self):
+        """Instance rows of every annotated row in one table.
+
+        Each instance row is prefixed with its ``Reference`` and
+        ``Segmentation`` paths.
+        """
+        tables = []
+        for row, record in self.iter_rows():
+            if self.annotation_file(row) is None:
+                continue
+            annotations = self.read_annotations(row)
+            if annotations.empty:
+                continue
+            annotations.insert(0, "Segmentation", record["Segmentation"])
+            annotations.insert(0, "Reference", record["Reference"])
+            tables.append(annotations)
+        if not tables:
+            return pd.DataFrame(
+                columns=["Reference", "Segmentation", *annotation_columns()]
+            )
+        return pd.concat(tables, ignore_index=True)
+
+    # ----- saving -----
+    def save(self):
+        """Write the master table and drop the journal it now contains."""
+        segments = self._journal.rotate()
+        write_table_atomic(self.table, self.table_path)
+        self._journal.discard(segments)
+
+    def close(self):
+        if self._journal.pending:
+            self.save()
+        self._journal.close()
@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+
+
+class ArrayCache:
+    """Least-recently-used cache of decoded arrays bounded by total bytes.
+
+    The budget is checked against ``array.nbytes`` before an array is stored,
+    so the cache never holds more than ``max_bytes``. Arrays larger than the
+    whole budget are not cached at all.
+    """
+
+    def __init__(self, max_bytes):
+        self._max_bytes = int(max_bytes)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value):
+        with self._lock:
+            self._max_bytes = int(value)
+            self._evict(0)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            array = self._entries.get(key)
+            if array is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return array
+
+    def put(self, key, array):
+        size = int(array.nbytes)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= int(old.nbytes)
+            if size > self._max_bytes:
+                return
+            self._evict(size)
+            self._entries[key] = array
+            self._bytes += size
+
+    def _evict(self, incoming):
+        while self._entries and self._bytes + incoming > self._max_bytes:
+            _, array = self._entries.popitem(last=False)
+            self._bytes -= int(array.nbytes)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "items": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+            }
@@ -1,36 +1,42 @@
+import contextlib
+import functools
 import os
-import threading
 
-import imageio
+import numpy as np
 import pandas as pd
-import tifffile
 from qtpy.QtGui import QColor
 from qtpy.QtWidgets import (
     QButtonGroup,
+    QCheckBox,
+    QComboBox,
+    QHBoxLayout,
     QLabel,
-    QListWidget,
-    QListWidgetItem,
     QPushButton,
     QVBoxLayout,
     QWidget,
 )
 
+from .cache import ArrayCache
 from .colors import CLASS_PALETTE as _CLASS_PALETTE
+from .file_list import FileListModel, FileListView, text_color_for
+from .grid_view import ThumbnailGridModel, ThumbnailGridView, ThumbnailSource
+from .image_io import load_image, load_labels
+from .image_stats import contrast_limits, contrast_range, load_image_stats
 from .project import ClassificationProject
+from .pyramids import PYRAMID_DIR, base_level, read_pyramid
+from .status import ANNOTATED, IGNORED, UNANNOTATED, AnnotationStatus
+from .storage import AnnotationJournal, SnapshotWriter, read_table
+from .thumbnails import ATLAS_DIR
 
-
-def _read_image(path):
-    try:
-        return tifffile.imread(path)
-    except Exception:  # noqa: BLE001
-        return imageio.imread(path)
-
-
-def _read_labels(path):
-    return tifffile.imread(path)
+_IGNORED_COLORS = (QColor("transparent"), QColor("gray"))
 
 
 class ClassificationAnnotatorWidget(QWidget):
+    # Journaled edits between two full rewrites of the annotation table.
+    COMPACT_EVERY = 500
+    # Thumbnails per page of the grid view.
+    GRID_PAGE_SIZE = 48
+
     def __init__(
         self, napari_viewer, project: ClassificationProject, parent=None
     ):
@@ -44,12 +50,14 @@ class ClassificationAnnotatorWidget(QWidget):
 
         self.project_label = QLabel(f"Project: {self.project.name}")
         self.main_layout.addWidget(self.project_label)
+        self.progress_label = QLabel("")
+        self.main_layout.addWidget(self.progress_label)
 
         self.annotation_df_path = os.path.join(
             project.project_dir, project.annotation_df_path
         )
 
-        self.annotation_df = pd.read_csv(self.annotation_df_path)
+        self.annotation_df = read_table(self.annotation_df_path)
         if "ImagePath" in self.annotation_df.columns:
             self.annotation_df["ImagePath"] = self.annotation_df[
                 "ImagePath"
@@ -72,23 +80,109 @@ class ClassificationAnnotatorWidget(QWidget):
 
         self.annotation_df["Class"] = self.annotation_df["Class"].astype(str)
 
-        self.file_list_widget = QListWidget()
-        self._populate_file_list()
+        # Recover edits journaled after the last full write (e.g. a crash).
+        self._journal = AnnotationJournal(self.annotation_df_path)
+        recovered = self._journal.replay(self.annotation_df)
+
+        # Ignored rows stay in the table as tombstones until the next save.
+        ignored = np.array(
+            self.annotation_df[primary_col].isin(project.ignored_images or [])
+        )
+        if "Ignored" in self.annotation_df.columns:
+            ignored |= self.annotation_df["Ignored"].eq(True).to_numpy()
+            self.annotation_df["Ignored"] = ignored
+        flagged = None
+        if "Flagged" in self.annotation_df.columns:
+            flagged = np.array(self.annotation_df["Flagged"].eq(True))
+            self.annotation_df["Flagged"] = flagged
+        self._class_ids = {cls: i for i, cls in enumerate(project.classes)}
+        self._status = AnnotationStatus.from_values(
+            self.annotation_df["Class"],
+            project.classes,
+            ignored=ignored,
+            flagged=flagged,
+        )
+
+        self._class_item_colors = [
+            (QColor(color), text_color_for(QColor(color)))
+            for color in self._class_colors.values()
+        ]
+        self.file_list_model = FileListModel(
+            self.data_files, colors=self._item_colors, parent=self
+        )
+        self.file_list_widget = FileListView(self.file_list_model)
 
         self.current_file_idx = self._find_resume_index()
         if self.current_file_idx >= len(self.data_files):
             self.current_file_idx = 0
+        if self.data_files and self._status.is_ignored(self.current_file_idx):
+            self.current_file_idx = self._next_visible(self.current_file_idx)
 
         self._image_layer = None
         self._mask_layer = None
-        self._write_lock = threading.Lock()
-        self._pending_write = False
+        self._lazy = project.uses_lazy_loading()
+        self._image_cache = ArrayCache(max_bytes=project.cache_bytes())
+        self._stats_dir = os.path.dirname(self.annotation_df_path)
+        self._pyramid_dir = (
+            os.path.join(project.project_dir, PYRAMID_DIR)
+            if project.pyramids
+            else None
+        )
+        self._writer = SnapshotWriter(self.annotation_df_path)
+        if recovered:
+            self._save_sync()
 
         self.file_list_widget.setCurrentRow(self.current_file_idx)
         self._init_layers()
-        self.file_list_widget.itemClicked.connect(self.choose_file_from_list)
+        self.file_list_widget.clicked.connect(self.choose_file_from_list)
 
         self.main_layout.addWidget(self.file_list_widget)
+        self._init_grid()
+
+        # Navigation.
+        nav_layout = QHBoxLayout()
+        self.previous_button = QPushButton("Previous [H]")
+        self.next_button = QPushButton("Next [J]")
+        self.previous_button.clicked.connect(self.previous_file)
+        self.next_button.clicked.connect(self.next_file)
+        nav_layout.addWidget(self.previous_button)
+        nav_layout.addWidget(self.next_button)
+        self.main_layout.addLayout(nav_layout)
+
+        jump_layout = QHBoxLayout()
+        self.next_unannotated_button = QPushButton("Next unannotated [U]")
+        self.next_unannotated_button.clicked.connect(self.next_unannotated)
+        self.flag_button = QPushButton("Flag [F]")
+        self.flag_button.clicked.connect(self.toggle_flag)
+        self.next_flagged_button = QPushButton("Next flagged [G]")
+        self.next_flagged_button.clicked.connect(self.next_flagged)
+        jump_layout.addWidget(self.next_unannotated_button)
+        jump_layout.addWidget(self.flag_button)
+        jump_layout.addWidget(self.next_flagged_button)
+        self.main_layout.addLayout(jump_layout)
+
+        class_jump_layout = QHBoxLayout()
+        self.jump_class_selector = QComboBox()
+        self.jump_class_selector.addItems(self.project.classes)
+        self.next_of_class_button = QPushButton("Next of class [C]")
+        self.next_of_class_button.clicked.connect(self.next_of_class)
+        class_jump_layout.addWidget(self.jump_class_selector)
+        class_jump_layout.addWidget(self.next_of_class_button)
+        self.main_layout.addLayout(class_jump_layout)
+
+        self.grid_button = QPushButton("Grid view")
+        self.grid_button.setCheckable(True)
+        self.grid_button.setToolTip(
+            "Show a page of thumbnails; selected files are classified "
+            "together with the class buttons or the keys 1-9."
+        )
+        self.grid_button.toggled.connect(self.set_grid_mode)
+        self.thumbnails_checkbox = QCheckBox("Show thumbnails")
+        self.thumbnails_checkbox.toggled.connect(self.set_list_thumbnails)
+        view_layout = QHBoxLayout()
+        view_layout.addWidget(self.grid_button)
+        view_layout.addWidget(self.thumbnails_checkbox)
+        self.main_layout.addLayout(view_layout)
 
         # Current class status label
         self.class_status_label = QLabel("")
@@ -97,6 +191,7 @@ class ClassificationAnnotatorWidget(QWidget):
         )
         self.main_layout.addWidget(self.class_status_label)
         self._update_class_display(self.current_file_idx)
+        self._update_progress()
 
         self.class_buttons_widget = QWidget()
         self.class_buttons_layout = QVBoxLayout()
@@ -116,48 +211,159 @@ class ClassificationAnnotatorWidget(QWidget):
         self.main_layout.addWidget(self.ignore_button)
 
         self.save_button = QPushButton("Save")
-        self.save_button.clicked.connect(self._save_sync)
+        self.save_button.clicked.connect(self.save)
         self.main_layout.addWidget(self.save_button)
 
-    def _find_resume_index(self):
-        if (
-            "Class" not in self.annotation_df.columns
-            or self.annotation_df.empty
-        ):
-            return 0
+        self.refresh_button = QPushButton("Refresh files")
+        self.refresh_button.setToolTip(
+            "Add files written to the project directories since the "
+            "project was created, keeping existing annotations."
+        )
+        self.refresh_button.clicked.connect(self.refresh_files)
+        self.main_layout.addWidget(self.refresh_button)
+
+        # Key bindings.
+        self._bound_keys = {
+            "j": self._next_file_key,
+            "h": self._previous_file_key,
+            "u": self._next_unannotated_key,
+            "c": self._next_of_class_key,
+            "f": self._toggle_flag_key,
+            "g": self._next_flagged_key,
+        }
+        for key, callback in self._bound_keys.items():
+            self.viewer.bind_key(key, callback, overwrite=True)
+
+    # ----- grid view -----
+    def _init_grid(self):
+        self.thumbnails = ThumbnailSource(
+            os.path.join(self._stats_dir, ATLAS_DIR),
+            self.data_files,
+            parent=self,
+        )
+        self.grid_model = ThumbnailGridModel(
+            self.data_files,
+            colors=self._item_colors,
+            thumbnails=self.thumbnails.image,
+            page_size=self.GRID_PAGE_SIZE,
+            parent=self,
+        )
+        self.thumbnails.changed.connect(self.grid_model.thumbnail_changed)
+        self.grid_view = ThumbnailGridView(self.grid_model)
+        self.grid_view.number_pressed.connect(self._on_grid_number)
+        self.grid_view.activated.connect(self._on_grid_activated)
+
+        self.grid_widget = QWidget()
+        grid_layout = QVBoxLayout()
+        grid_layout.setContentsMargins(0, 0, 0, 0)
+        self.grid_widget.setLayout(grid_layout)
+        page_layout = QHBoxLayout()
+        self.previous_page_button = QPushButton("Previous page")
+        self.next_page_button = QPushButton("Next page")
+        self.page_label = QLabel("")
+        self.previous_page_button.clicked.connect(
+            lambda: self._show_grid_page(self._grid_page - 1)
+        )
+        self.next_page_button.clicked.connect(
+            lambda: self._show_grid_page(self._grid_page + 1)
+        )
+        page_layout.addWidget(self.previous_page_button)
+        page_layout.addWidget(self.page_label)
+        page_layout.addWidget(self.next_page_button)
+        grid_layout.addLayout(page_layout)
+        grid_layout.addWidget(self.grid_view)
+        self.grid_widget.setVisible(False)
+        self.main_layout.addWidget(self.grid_widget)
+        self._grid_page = 0
+
+    def grid_mode(self):
+        return self.grid_button.isChecked()
+
+    def set_grid_mode(self, enabled):
+        """Switch between the file list and the thumbnail grid."""
+        if self.grid_button.isChecked() != enabled:
+            self.grid_button.setChecked(enabled)
+            return
+        self.grid_widget.setVisible(enabled)
+        self.file_list_widget.setVisible(not enabled)
+        if enabled:
+            self._show_grid_page(
+                max(self.current_file_idx, 0) // self.GRID_PAGE_SIZE
+            )
+            self.grid_view.setFocus()
+        else:
+            # Back to the rows of the list, if it shows thumbnails.
+            self.file_list_widget.request_thumbnails()
 
-        classes = self.annotation_df["Class"].astype(str).str.strip()
-        annotated = classes[
-            (classes != "") & (classes != "nan") & (classes != "None")
-        ]
+    def set_list_thumbnails(self, enabled):
+        """Show thumbnails in the file list."""
+        self.file_list_widget.set_thumbnails(
+            self.thumbnails if enabled else None
+        )
 
-        if annotated.empty:
-            return 0
+    def _n_grid_pages(self):
+        return max(1, -(-len(self.data_files) // self.GRID_PAGE_SIZE))
+
+    def _show_grid_page(self, page):
+        page = min(max(page, 0), self._n_grid_pages() - 1)
+        self._grid_page = page
+        self.grid_model.set_page(page * self.GRID_PAGE_SIZE)
+        self.page_label.setText(f"Page {page + 1}/{self._n_grid_pages()}")
+        # This page first, then the next one.
+        start = page * self.GRID_PAGE_SIZE
+        self.thumbnails.request(range(start, start + 2 * self.GRID_PAGE_SIZE))
+
+    def _on_grid_number(self, number):
+        if number <= len(self.project.classes):
+            self.assign_class_to_rows(
+                self.grid_view.selected_rows(),
+                self.project.classes[number - 1],
+            )
 
-        return annotated.index[-1] + 1
+    def _on_grid_activated(self, index):
+        """Open a thumbnail in the viewer (double-click or Enter)."""
+        self._go_to(self.grid_model.start + index.row())
 
-    def _populate_file_list(self):
-        self.file_list_widget.clear()
-        for i, path in enumerate(self.data_files):
-            item = QListWidgetItem(os.path.basename(path))
-            self._apply_item_color(item, i)
-            self.file_list_widget.addItem(item)
+    def assign_class_to_rows(self, rows, class_name):
+        """Give every row in ``rows`` the class ``class_name``.
 
-    def _apply_item_color(self, item, idx):
-        class_name = str(self.annotation_df.loc[idx, "Class"]).strip()
-        if (
-            class_name in ("", "nan", "None")
-            or class_name not in self._class_colors
-        ):
-            item.setBackground(QColor("transparent"))
-            item.setForeground(QColor("white"))
+        The table is updated in one vectorised assignment and written once,
+        instead of journaling each row.
+        """
+        rows = np.unique(np.asarray(rows, dtype=int))
+        if rows.size == 0:
             return
+        self.annotation_df.loc[rows, "Class"] = class_name
+        if "Ignored" in self.annotation_df.columns:
+            # Annotating ignored files brings them back.
+            self.annotation_df.loc[rows, "Ignored"] = False
+        self._status.set_many(
+            rows, ANNOTATED, self._class_ids.get(class_name, -1)
+        )
+        self.grid_model.rows_changed()
+        for row in rows.tolist():
+            self.file_list_model.row_changed(row)
+        self._update_progress()
+        self._update_class_display(self.current_file_idx)
+        self._save_sync()
+
+    # ----- single file -----
+    def _find_resume_index(self):
+        last = self._status.last(ANNOTATED)
+        return 0 if last is None else last + 1
+
+    def _update_progress(self):
+        self.progress_label.setText(
+            self._status.summary(self.project.classes)
+        )
 
-        bg = QColor(self._class_colors[class_name])
-        # Use white or black text depending on luminance of background.
-        luminance = 0.299 * bg.red() + 0.587 * bg.green() + 0.114 * bg.blue()
-        item.setBackground(bg)
-        item.setForeground(QColor("black" if luminance > 128 else "white"))
+    def _item_colors(self, idx):
+        if self._status.is_ignored(idx):
+            return _IGNORED_COLORS
+        class_id = self._status.class_ids[idx]
+        if class_id < 0:
+            return None
+        return self._class_item_colors[class_id]
 
     def _update_class_display(self, idx):
         if idx < 0 or idx >= len(self.data_files):
@@ -185,6 +391,70 @@ class ClassificationAnnotatorWidget(QWidget):
                 f"font-weight: bold; font-size: 13px; padding: 4px;"
                 f"background-color: {color}; color: {text_color}; border-radius: 3px;"
             )
+        if self._status.flagged[idx]:
+            self.class_status_label.setText(
+                f"{self.class_status_label.text()} (flagged)"
+            )
+
+    def _read(self, path, labels=False):
+        """Data to display for ``path``: its pyramid levels when built."""
+        if self._pyramid_dir is not None:
+            levels = read_pyramid(path, self._pyramid_dir, labels)
+            if levels is not None:
+                return levels
+        if labels:
+            return load_labels(path, lazy=self._lazy, cache=self._image_cache)
+        return load_image(path, lazy=self._lazy, cache=self._image_cache)
+
+    def _image_stats(self, path, data):
+        """Percentile table of an image, from its statistics sidecar.
+
+        Pyramids are measured on their coarsest level.
+        """
+        if isinstance(data, list):
+            data = data[-1]
+        return load_image_stats(
+            path,
+            self._stats_dir,
+            data,
+            max_samples=self.project.contrast_sample_size,
+        )
+
+    @staticmethod
+    def _set_contrast(layer, data, stats):
+        """Set the contrast of ``layer`` and its slider range."""
+        limits = contrast_limits(stats)
+        layer.contrast_limits_range = contrast_range(
+            base_level(data).dtype, stats, limits
+        )
+        layer.contrast_limits = limits
+
+    def _add_image_layer(self, data, path):
+        stats = self._image_stats(path, data)
+        layer = self.viewer.add_image(
+            data,
+            colormap="viridis",
+            name=os.path.basename(path),
+            contrast_limits=contrast_limits(stats),
+            multiscale=isinstance(data, list),
+        )
+        # napari takes the given limits as the slider range.
+        self._set_contrast(layer, data, stats)
+        return layer
+
+    def _add_mask_layer(self, data, path):
+        return self.viewer.add_labels(
+            data,
+            name=f"mask_{os.path.basename(path)}",
+            multiscale=isinstance(data, list),
+        )
+
+    def _replace_layer(self, layer, new_layer):
+        """Put ``new_layer`` where ``layer`` was in the layer list."""
+        index = self.viewer.layers.index(layer)
+        self.viewer.layers.remove(layer)
+        self.viewer.layers.move(self.viewer.layers.index(new_layer), index)
+        return new_layer
 
     def _init_layers(self):
         if self.current_file_idx < 0 or self.current_file_idx >= len(
@@ -199,11 +469,8 @@ class ClassificationAnnotatorWidget(QWidget):
             display_mode in ("image", "both")
             and "ImagePath" in self.annotation_df.columns
         ):
-            data = _read_image(row["ImagePath"])
-            self._image_layer = self.viewer.add_image(
-                data,
-                colormap="viridis",
-                name=os.path.basename(row["ImagePath"]),
+            self._image_layer = self._add_image_layer(
+                self._read(row["ImagePath"]), row["ImagePath"]
             )
 
         if (
@@ -212,10 +479,8 @@ class ClassificationAnnotatorWidget(QWidget):
         ):
             mask_path = row["MaskPath"]
             if pd.notna(mask_path) and mask_path not in ("", "nan", "None"):
-                data = _read_labels(mask_path)
-                self._mask_layer = self.viewer.add_labels(
-                    data,
-                    name=f"mask_{os.path.basename(mask_path)}",
+                self._mask_layer = self._add_mask_layer(
+                    self._read(mask_path, labels=True), mask_path
                 )
 
     def _load_file(self):
@@ -228,14 +493,32 @@ class ClassificationAnnotatorWidget(QWidget):
         row = self.annotation_df.iloc[self.current_file_idx]
 
         if display_mode in ("image", "both") and self._image_layer is not None:
-            self._image_layer.data = _read_image(row["ImagePath"])
-            self._image_layer.name = os.path.basename(row["ImagePath"])
+            data = self._read(row["ImagePath"])
+            if self._image_layer.multiscale != isinstance(data, list):
+                # Only a new layer can switch to or from a pyramid.
+                self._image_layer = self._replace_layer(
+                    self._image_layer,
+                    self._add_image_layer(data, row["ImagePath"]),
+                )
+            else:
+                stats = self._image_stats(row["ImagePath"], data)
+                self._image_layer.data = data
+                self._set_contrast(self._image_layer, data, stats)
+                self._image_layer.name = os.path.basename(row["ImagePath"])
 
         if display_mode in ("mask", "both") and self._mask_layer is not None:
             mask_path = row["MaskPath"]
             if pd.notna(mask_path) and mask_path not in ("", "nan", "None"):
-                self._mask_layer.data = _read_labels(mask_path)
-                self._mask_layer.name = f"mask_{os.path.basename(mask_path)}"
+                data = self._read(mask_path, labels=True)
+                if self._mask_layer.multiscale != isinstance(data, list):
+                    self._mask_layer = self._replace_layer(
+                        self._mask_layer, self._add_mask_layer(data, mask_path)
+                    )
+                else:
+                    self._mask_layer.data = data
+                    self._mask_layer.name = (
+                        f"mask_{os.path.basename(mask_path)}"
+                    )
 
         self.viewer.reset_view()
         self._update_class_display(self.current_file_idx)
@@ -244,27 +527,107 @@ class ClassificationAnnotatorWidget(QWidget):
         self.current_file_idx = self.file_list_widget.currentRow()
         self._load_file()
 
-    def next_file(self):
-        self.current_file_idx += 1
-        if self.current_file_idx >= len(self.data_files):
-            self.current_file_idx = 0
+    def _next_visible(self, idx):
+        """First row after ``idx`` that is not ignored, wrapping around.
+
+        Returns ``idx`` itself if every other row is ignored.
+        """
+        visible = self._status.state[idx + 1 :] != IGNORED
+        if visible.any():
+            return idx + 1 + int(visible.argmax())
+        visible = self._status.state[: idx + 1] != IGNORED
+        return int(visible.argmax()) if visible.any() else idx
+
+    def _previous_visible(self, idx):
+        """Last row before ``idx`` that is not ignored, or ``idx`` itself."""
+        visible = self._status.state[:idx] != IGNORED
+        if visible.any():
+            return idx - 1 - int(visible[::-1].argmax())
+        return idx
+
+    def _go_to(self, idx):
+        if idx is None or not self.data_files:
+            return
+        self.current_file_idx = idx
         self.file_list_widget.setCurrentRow(self.current_file_idx)
         self._load_file()
 
+    def next_file(self):
+        if not self.data_files:
+            return
+        self._go_to(self._next_visible(self.current_file_idx))
+
+    def previous_file(self):
+        if not self.data_files:
+            return
+        self._go_to(self._previous_visible(self.current_file_idx))
+
+    def next_unannotated(self):
+        self._go_to(
+            self._status.next_row(self.current_file_idx, UNANNOTATED)
+        )
+
+    def next_of_class(self, class_name=None):
+        """Jump to the next file annotated as ``class_name``.
+
+        Defaults to the class picked in the jump selector.
+        """
+        if not isinstance(class_name, str):
+            class_name = self.jump_class_selector.currentText()
+        class_id = self._class_ids.get(class_name)
+        if class_id is None:
+            return
+        self._go_to(
+            self._status.next_of_class(self.current_file_idx, class_id)
+        )
+
+    def next_flagged(self):
+        self._go_to(self._status.next_flagged(self.current_file_idx))
+
+    def toggle_flag(self):
+        """Flag the current file for review, or clear its flag."""
+        if self.current_file_idx < 0 or self.current_file_idx >= len(
+            self.data_files
+        ):
+            return
+
+        idx = self.current_file_idx
+        flagged = not self._status.flagged[idx]
+        if "Flagged" not in self.annotation_df.columns:
+            self.annotation_df["Flagged"] = False
+        self.annotation_df.at[idx, "Flagged"] = flagged
+        self._status.set_flag(idx, flagged)
+        self._update_class_display(idx)
+        self._update_progress()
+        self._record(idx, "Flagged", flagged)
+
     def assign_class(self, button):
         if self.current_file_idx < 0 or self.current_file_idx >= len(
             self.data_files
         ):
             return
 
+        if self.grid_mode():
+            rows = self.grid_view.selected_rows()
+            if rows:
+                self.assign_class_to_rows(rows, button.text())
+                return
+
+        idx = self.current_file_idx
         class_name = button.text()
-        self.annotation_df.loc[self.current_file_idx, "Class"] = class_name
+        self.annotation_df.loc[idx, "Class"] = class_name
+        if self._status.is_ignored(idx):
+            # Annotating an ignored file brings it back.
+            self._set_ignored(idx, False)
+        self._status.set(
+            idx, ANNOTATED, self._class_ids.get(class_name, -1)
+        )
 
-        item = self.file_list_widget.item(self.current_file_idx)
-        self._apply_item_color(item, self.current_file_idx)
+        self.file_list_model.row_changed(idx)
+        self._update_progress()
 
         self.next_file()
-        self._save_async()
+        self._record(idx, "Class", class_name)
 
     def ignore_file(self):
         if self.current_file_idx < 0 or self.current_file_idx >= len(
@@ -272,39 +635,176 @@ class ClassificationAnnotatorWidget(QWidget):
         ):
             return
 
-        self.annotation_df.drop(index=self.current_file_idx, inplace=True)
-        self.annotation_df.reset_index(drop=True, inplace=True)
-
-        self.data_files.pop(self.current_file_idx)
-        self.file_list_widget.takeItem(self.current_file_idx)
+        idx = self.current_file_idx
+        self._set_ignored(idx, True)
+        self._update_progress()
+        self.next_file()
 
+    def _set_ignored(self, idx, ignored):
+        """Mark a row as ignored (a tombstone) or clear the mark.
+
+        Ignored rows are skipped by navigation and dropped from the table
+        by :meth:`save`; until then they are kept so row indices, and the
+        journal entries referring to them, stay valid.
+        """
+        if "Ignored" not in self.annotation_df.columns:
+            self.annotation_df["Ignored"] = False
+        if ignored:
+            self._status.set(idx, IGNORED)
+        else:
+            annotated = self._status.class_ids[idx] >= 0
+            self._status.set(idx, ANNOTATED if annotated else UNANNOTATED)
+        self.annotation_df.at[idx, "Ignored"] = ignored
+        self.file_list_model.row_changed(idx)
+        self._record(idx, "Ignored", ignored)
+
+    def _drop_ignored(self, update_view=True):
+        """Remove ignored rows, recording their files in the project.
+
+        Without ``update_view`` the lists, grid and layers are left as they
+        are, for a widget being closed.
+        """
+        keep = self._status.state != IGNORED
+        paths = np.asarray(self.data_files, dtype=object)
+        self.project.ignored_images = [
+            *(self.project.ignored_images or []),
+            *paths[~keep].tolist(),
+        ]
+        self.project.save()
+
+        # The current row, or the next one kept if it was ignored.
+        current = int(np.count_nonzero(keep[: self.current_file_idx]))
+        self.annotation_df = (
+            self.annotation_df[keep]
+            .drop(columns="Ignored", errors="ignore")
+            .reset_index(drop=True)
+        )
+        self.data_files = paths[keep].tolist()
+        self._status.compact(keep)
+        if not update_view:
+            return
+        self.thumbnails.set_paths(self.data_files)
+        self.file_list_model.set_paths(self.data_files)
+        self.grid_model.set_paths(self.data_files)
+        if self.grid_mode():
+            self._show_grid_page(self._grid_page)
         if self.data_files:
-            self.current_file_idx = min(
-                self.current_file_idx, len(self.data_files) - 1
-            )
+            self.current_file_idx = min(current, len(self.data_files) - 1)
             self.file_list_widget.setCurrentRow(self.current_file_idx)
             self._load_file()
 
-        self._save_async()
+    def save(self, closing=False):
+        """Write the table, dropping the rows ignored since the last save.
+
+        With ``closing`` the view is not updated (nor the next file loaded)
+        after ignored rows are dropped.
+        """
+        if self._status.n_ignored:
+            # Commit the journal against the current row numbering first, so
+            # that a crash below never replays it onto renumbered rows.
+            self._save_sync()
+            self._drop_ignored(update_view=not closing)
+            if not closing:
+                self._update_progress()
+        self._save_sync()
+
+    def refresh_files(self):
+        """Append rows for new files in the project directories.
+
+        Existing rows, their annotations and the journal are untouched;
+        returns the number of rows added.
+        """
+        new_rows = self.project.refresh(self.annotation_df)
+        if new_rows.empty:
+            self.project.save()
+            return 0
+
+        for col in ("ImagePath", "MaskPath", "Class"):
+            if col in new_rows.columns:
+                new_rows[col] = new_rows[col].astype(str)
+        for col in ("Ignored", "Flagged"):
+            if col in self.annotation_df.columns:
+                new_rows[col] = False
+        start = len(self.annotation_df)
+        self.annotation_df = pd.concat(
+            [self.annotation_df, new_rows], ignore_index=True
+        )
+        primary_col = (
+            "ImagePath" if self.project.display_mode != "mask" else "MaskPath"
+        )
+        self._status.append(len(new_rows))
+        self._update_progress()
+        self.file_list_model.append(
+            self.annotation_df[primary_col].iloc[start:]
+        )
+        self.thumbnails.set_paths(self.data_files)
+        if self.grid_mode():
+            self._show_grid_page(self._grid_page)
+
+        # Write the table before the directory snapshot, so a crash in
+        # between only causes a rescan.
+        self._save_sync()
+        self.project.save()
+
+        if start == 0:
+            self.current_file_idx = 0
+            self.file_list_widget.setCurrentRow(0)
+            self._init_layers()
+            self._update_class_display(0)
+        return len(new_rows)
+
+    def _record(self, row, field, value):
+        """Journal an edit, compacting into the table every so often."""
+        self._journal.append(row, field, value)
+        if self._journal.pending >= self.COMPACT_EVERY:
+            self._save_async()
 
     def _save_sync(self):
-        with self._write_lock:
-            self._pending_write = False
-            self.annotation_df.to_csv(self.annotation_df_path, index=False)
+        segments = self._journal.rotate()
+        # The table is not touched while we wait, so no copy is needed.
+        self._writer.submit(
+            self.annotation_df,
+            on_written=functools.partial(self._journal.discard, segments),
+        )
+        self._writer.flush()
 
     def _save_async(self):
-        snapshot = self.annotation_df.copy()
-        path = self.annotation_df_path
+        segments = self._journal.rotate()
+        self._writer.submit(
+            self.annotation_df.copy(),
+            on_written=functools.partial(self._journal.discard, segments),
+        )
+
+    # ----- key callbacks (napari passes the viewer) -----
+    def _next_file_key(self, viewer=None):
+        self.next_file()
 
-        def write():
-            with self._write_lock:
-                self._pending_write = False
-                snapshot.to_csv(path, index=False)
+    def _previous_file_key(self, viewer=None):
+        self.previous_file()
 
-        self._pending_write = True
-        threading.Thread(target=write, daemon=True).start()
+    def _next_unannotated_key(self, viewer=None):
+        self.next_unannotated()
+
+    def _next_of_class_key(self, viewer=None):
+        self.next_of_class()
+
+    def _toggle_flag_key(self, viewer=None):
+        self.toggle_flag()
+
+    def _next_flagged_key(self, viewer=None):
+        self.next_flagged()
 
     def closeEvent(self, event):
-        if self._pending_write:
-            self._save_sync()
+        for key in self._bound_keys:
+            with contextlib.suppress(Exception):
+                self.viewer.bind_key(key, None, overwrite=True)
+        self.thumbnails.close()
+        if (
+            self._writer.pending
+            or self._journal.pending
+            or self._status.n_ignored
+        ):
+            self.save(closing=True)
+        self._writer.close()
+        self._journal.close()
         super().closeEvent(event)
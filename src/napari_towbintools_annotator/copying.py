@@ -0,0 +1,236 @@
+import contextlib
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Ways of materialising a file at the destination; "reflink" and "hardlink"
+# fall back to a plain copy when the filesystem does not support them.
+LINK_MODES = ("copy", "reflink", "hardlink")
+
+DEFAULT_COPY_WORKERS = 8
+_CHUNK_SIZE = 16 * 1024**2
+_PARTIAL_SUFFIX = ".partial"
+# ioctl(2) request cloning one file into another (linux/fs.h).
+_FICLONE = 0x40049409
+
+
+def check_link_mode(link_mode):
+    if link_mode not in LINK_MODES:
+        raise ValueError(
+            f"link_mode must be one of {LINK_MODES}, got '{link_mode}'."
+        )
+
+
+def file_checksum(path):
+    digest = hashlib.blake2b()
+    with open(path, "rb") as file:
+        while chunk := file.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_copied(src, dst, checksum=False):
+    """Whether ``dst`` already holds a complete copy of ``src``.
+
+    Compares size and modification time, which :func:`copy_file`
+    preserves, or the file contents when ``checksum`` is set.
+    """
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    src_stat = os.stat(src)
+    if os.path.samestat(src_stat, dst_stat):
+        return True
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if checksum:
+        return file_checksum(src) == file_checksum(dst)
+    return src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+
+
+def _try_reflink(src, dst):
+    """Clone ``src`` into ``dst`` sharing its data blocks.
+
+    Returns ``False`` if the platform or filesystem does not support it.
+    """
+    try:
+        import fcntl
+
+        with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+            fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def _copy_data(src, dst, on_bytes):
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        src_fd, dst_fd = src_file.fileno(), dst_file.fileno()
+        sendfile = hasattr(os, "sendfile")
+        while True:
+            if sendfile:
+                try:
+                    n = os.sendfile(dst_fd, src_fd, None, _CHUNK_SIZE)
+                except OSError:
+                    sendfile = False
+                    continue
+            else:
+                chunk = src_file.read(_CHUNK_SIZE)
+                n = dst_file.write(chunk)
+            if not n:
+                return
+            on_bytes(n)
+
+
+def copy_file(src, dst, link_mode="copy", on_bytes=None):
+    """Copy ``src`` to ``dst`` through a temporary ``.partial`` file.
+
+    The destination only appears once it is complete, so an interrupted
+    copy is redone on the next run rather than mistaken for a finished one.
+    ``on_bytes(n)`` is called as data is written.
+    """
+    check_link_mode(link_mode)
+    on_bytes = on_bytes or (lambda n: None)
+    size = os.path.getsize(src)
+    tmp = dst + _PARTIAL_SUFFIX
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(tmp)
+
+    if link_mode == "hardlink":
+        try:
+            os.link(src, tmp)
+        except OSError:
+            pass
+        else:
+            os.replace(tmp, dst)
+            on_bytes(size)
+            return
+
+    try:
+        if link_mode == "reflink" and _try_reflink(src, tmp):
+            on_bytes(size)
+        else:
+            _copy_data(src, tmp, on_bytes)
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def plan_copy(src_dir, dst_dir):
+    """List ``(src, dst, size)`` for every file below ``src_dir``.
+
+    Also creates the destination directory tree.
+    """
+    plan = []
+    for root, _, files in os.walk(src_dir, followlinks=True):
+        target = os.path.join(dst_dir, os.path.relpath(root, src_dir))
+        os.makedirs(target, exist_ok=True)
+        for name in files:
+            if name.endswith(_PARTIAL_SUFFIX):
+                continue
+            src = os.path.join(root, name)
+            plan.append(
+                (src, os.path.join(target, name), os.path.getsize(src))
+            )
+    return plan
+
+
+class _CopyProgress:
+    def __init__(self, total_bytes, total_files, callback):
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.bytes = 0
+        self.files = 0
+        self._callback = callback
+        self._lock = threading.Lock()
+
+    def add(self, n_bytes=0, n_files=0):
+        with self._lock:
+            self.bytes += n_bytes
+            self.files += n_files
+            state = (
+                self.bytes,
+                self.total_bytes,
+                self.files,
+                self.total_files,
+            )
+        if self._callback is not None:
+            self._callback(*state)
+
+
+def copy_trees(
+    pairs,
+    workers=DEFAULT_COPY_WORKERS,
+    link_mode="copy",
+    checksum=False,
+    progress=None,
+):
+    """Copy each ``(src_dir, dst_dir)`` pair, resuming earlier runs.
+
+    Files are copied concurrently on ``workers`` threads. Files already
+    present at the destination (see :func:`is_copied`) are skipped.
+    ``progress(bytes_done, bytes_total, files_done, files_total)`` is called
+    as data is copied, from worker threads. Returns a dict with the number of
+    ``copied`` and ``skipped`` files and the ``bytes`` copied.
+    """
+    check_link_mode(link_mode)
+    plan = [item for pair in pairs for item in plan_copy(*pair)]
+    tracker = _CopyProgress(
+        sum(size for _, _, size in plan), len(plan), progress
+    )
+
+    def copy_one(item):
+        src, dst, size = item
+        if is_copied(src, dst, checksum=checksum):
+            tracker.add(size, 1)
+            return None
+        written = [0]
+
+        def on_bytes(n):
+            written[0] += n
+            tracker.add(n)
+
+        try:
+            copy_file(src, dst, link_mode=link_mode, on_bytes=on_bytes)
+        except BaseException:
+            tracker.add(-written[0])
+            raise
+        # Sizes can drift if the source changes while it is copied.
+        tracker.add(size - written[0], 1)
+        return written[0]
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, int(workers)),
+        thread_name_prefix="towbintools-copy",
+    ) as executor:
+        results = list(executor.map(copy_one, plan))
+    copied = [n for n in results if n is not None]
+    return {
+        "copied": len(copied),
+        "skipped": len(results) - len(copied),
+        "bytes": sum(copied),
+    }
+
+
+def format_bytes(n):
+    if n < 1024:
+        return f"{n} B"
+    for unit in ("KB", "MB", "GB", "TB"):
+        n /= 1024
+        if n < 1024 or unit == "TB":
+            return f"{n:.1f} {unit}"
+
+
+def copy_message(bytes_done, bytes_total, files_done, files_total):
+    """Status message of a copy, see :func:`scanning.status_progress`."""
+    return (
+        f"Copying data: {format_bytes(bytes_done)} / "
+        f"{format_bytes(bytes_total)} "
+        f"({files_done}/{files_total} files)..."
+    )
@@ -0,0 +1,492 @@
+import argparse
+import collections
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tarfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import tifffile
+
+from .annotation_store import PLANE_AXIS, AnnotationStore, read_annotations
+from .image_io import read_image, read_labels
+from .label_index import label_geometry
+from .storage import atomic_path, sidecar_name, table_format
+
+# Directories of the export holding the class masks and the per-file
+# instance tables they are consolidated from.
+MASK_DIR = "masks"
+PART_DIR = "instances"
+# Consolidated instance table; the extension picks the storage format.
+INSTANCES_FILE = "instances.parquet"
+# Samples per tar shard of a classification export.
+DEFAULT_SHARD_SIZE = 1000
+# Index of the shards, also used to resume an export.
+SHARD_MANIFEST = "shards.json"
+
+
+def class_lut(labels, class_ids, max_label, dtype=np.uint8):
+    """Lookup table mapping label IDs to ``class_id + 1``.
+
+    Label IDs without a class, and background, map to 0.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    keep = labels >= 0
+    size = int(max(max_label, labels.max(initial=0))) + 1
+    lut = np.zeros(size, dtype=dtype)
+    lut[labels[keep]] = np.asarray(class_ids)[keep] + 1
+    return lut
+
+
+def class_mask(label_data, annotations, plane_axis=None, dtype=np.uint8):
+    """Class-semantic mask of a label image and its instance rows.
+
+    Pixels of an instance annotated as class ``i`` get ``i + 1``;
+    background and unannotated instances stay 0. Each plane is mapped with
+    a single ``np.take`` over a lookup table. In 3D (``plane_axis`` set)
+    label IDs are looked up per first-axis plane, as they are annotated.
+    """
+    label_data = np.asarray(label_data)
+    mask = np.zeros(label_data.shape, dtype=dtype)
+    if annotations.empty:
+        return mask
+    if plane_axis is None:
+        groups = [(None, annotations)]
+    else:
+        groups = annotations.groupby(plane_axis, sort=False)
+    for plane, group in groups:
+        if plane is None:
+            labels, out = label_data, mask
+        elif 0 <= int(plane) < label_data.shape[0]:
+            labels, out = label_data[int(plane)], mask[int(plane)]
+        else:
+            continue
+        lut = class_lut(
+            group["Label"].to_numpy(),
+            group["ClassID"].to_numpy(dtype=np.int64),
+            labels.max(initial=0),
+            dtype,
+        )
+        np.take(lut, labels, out=out)
+    return mask
+
+
+def instance_table(label_data, annotations, plane_axis=None):
+    """Instance rows joined to the area, centroid and box of their label."""
+    keys = ["Label"] if plane_axis is None else [plane_axis, "Label"]
+    if annotations.empty:
+        return annotations
+    planes = None
+    if plane_axis is not None:
+        planes = annotations[plane_axis].unique()
+    geometry = label_geometry(label_data, plane_axis, planes=planes)
+    annotations = annotations.astype(dict.fromkeys(keys, int))
+    geometry = geometry.astype(dict.fromkeys(keys, int))
+    return annotations.merge(geometry, on=keys, how="left", sort=False)
+
+
+def _write_atomic(path, write):
+    """Call ``write(tmp_path)`` and move the result to ``path``.
+
+    A crash mid-write never leaves a partial output that looks exported.
+    """
+    with atomic_path(path) as tmp_path:
+        write(tmp_path)
+
+
+def write_training_table(df, path):
+    """Write ``df`` in the format implied by ``path``, for external tools.
+
+    Unlike :func:`~.storage.write_table`, path columns are kept as plain
+    strings, so the file reads back with plain pandas.
+    """
+    storage_format = table_format(path)
+    df = df.reset_index(drop=True)
+
+    def write(tmp_path):
+        if storage_format == "csv":
+            df.to_csv(tmp_path, index=False)
+        elif storage_format == "parquet":
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_feather(tmp_path)
+
+    _write_atomic(path, write)
+
+
+def _is_current(output, sources):
+    """Whether ``output`` was written after every file in ``sources``."""
+    try:
+        written = os.stat(output).st_mtime_ns
+        return all(
+            os.stat(source).st_mtime_ns <= written for source in sources
+        )
+    except OSError:
+        return False
+
+
+def _export_file(task):
+    """Worker: export one annotated file; returns its number of instances."""
+    reference, segmentation, csv_path, mask_path, part_path, dtype = task
+    annotations = read_annotations(csv_path)
+    label_data = read_labels(segmentation)
+    plane_axis = PLANE_AXIS if label_data.ndim == 3 else None
+    if mask_path is not None:
+        mask = class_mask(label_data, annotations, plane_axis, dtype)
+        _write_atomic(
+            mask_path,
+            lambda path: tifffile.imwrite(path, mask, compression="zlib"),
+        )
+    if part_path is not None:
+        instances = instance_table(label_data, annotations, plane_axis)
+        instances.insert(0, "Segmentation", segmentation)
+        instances.insert(0, "Reference", reference)
+        _write_atomic(
+            part_path, lambda path: instances.to_csv(path, index=False)
+        )
+    return len(annotations)
+
+
+def export_panoptic(
+    store,
+    output_dir,
+    masks=True,
+    instances=INSTANCES_FILE,
+    workers=None,
+    resume=True,
+    progress=None,
+):
+    """Export the annotations of a panoptic project for training.
+
+    For every annotated file, the segmentation is read once on a process
+    pool and written as a class mask to ``masks/`` (with ``masks``) and
+    its instance rows, with areas, centroids and boxes, to ``instances/``
+    (with ``instances``). The per-file instance tables are then
+    consolidated into ``instances``, in the format of its extension.
+    Outputs are named with :func:`~.storage.sidecar_name`.
+
+    With ``resume``, files whose outputs are newer than their segmentation
+    and annotation CSV are skipped, so an interrupted export picks up
+    where it stopped. ``progress(done, total)`` is called after each file.
+    Returns ``(exported, failed)``: the number of files written and the
+    references of the files that could not be exported.
+    """
+    mask_dir = os.path.join(output_dir, MASK_DIR)
+    part_dir = os.path.join(output_dir, PART_DIR)
+    for directory, wanted in ((mask_dir, masks), (part_dir, instances)):
+        if wanted:
+            os.makedirs(directory, exist_ok=True)
+    dtype = np.uint8 if len(store.classes) < 255 else np.uint16
+
+    tasks, parts = [], []
+    for row, record in store.iter_rows():
+        csv_path = store.annotation_file(row)
+        if csv_path is None or not os.path.isfile(csv_path):
+            continue
+        reference, segmentation = record["Reference"], record["Segmentation"]
+        name = sidecar_name(reference)
+        mask_path = os.path.join(mask_dir, f"{name}.tif") if masks else None
+        part_path = (
+            os.path.join(part_dir, f"{name}.csv") if instances else None
+        )
+        if part_path is not None:
+            parts.append(part_path)
+        outputs = [path for path in (mask_path, part_path) if path]
+        if resume and all(
+            _is_current(path, (segmentation, csv_path)) for path in outputs
+        ):
+            continue
+        tasks.append(
+            (reference, segmentation, csv_path, mask_path, part_path, dtype)
+        )
+
+    failed = []
+    if tasks:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        # Spawned, not forked, so it is safe to call from the GUI process.
+        with ProcessPoolExecutor(
+            max_workers=max(1, min(int(workers), len(tasks))),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = {
+                executor.submit(_export_file, task): task[0] for task in tasks
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                if future.exception() is not None:
+                    failed.append(futures[future])
+                if progress is not None:
+                    progress(done, len(tasks))
+
+    if instances:
+        tables = [pd.read_csv(path) for path in parts if os.path.isfile(path)]
+        table = pd.concat(tables, ignore_index=True) if tables else None
+        if table is not None:
+            write_training_table(table, os.path.join(output_dir, instances))
+    return len(tasks) - len(failed), sorted(failed)
+
+
+# ----- classification projects -----
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(array), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _encode_sample(task):
+    """Worker: the tar members of one classification sample."""
+    key, image_path, mask_path, class_name, class_id = task
+    members = [(f"{key}.image.npy", _npy_bytes(read_image(image_path)))]
+    if mask_path is not None:
+        members.append((f"{key}.mask.npy", _npy_bytes(read_labels(mask_path))))
+    members.append((f"{key}.cls", str(class_id).encode("ascii")))
+    metadata = {
+        "class": class_name,
+        "class_id": class_id,
+        "image_path": image_path,
+        "mask_path": mask_path,
+    }
+    members.append((f"{key}.json", json.dumps(metadata).encode("utf-8")))
+    return members
+
+
+def _shard_digest(tasks):
+    """Digest of a shard's samples and of the files they are read from."""
+    digest = hashlib.sha1()
+    for task in tasks:
+        sources = [
+            [path, os.stat(path).st_mtime_ns, os.stat(path).st_size]
+            for path in task[1:3]
+            if path is not None
+        ]
+        digest.update(json.dumps([task, sources]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _read_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as file:
+            return {
+                shard["name"]: shard for shard in json.load(file)["shards"]
+            }
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def _write_manifest(path, shards, shard_size):
+    manifest = {"shard_size": shard_size, "shards": shards}
+
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=1)
+
+    _write_atomic(path, write)
+
+
+def export_classification(
+    store,
+    output_dir,
+    shard_size=DEFAULT_SHARD_SIZE,
+    workers=None,
+    resume=True,
+    progress=None,
+):
+    """Export the classified rows of a project as WebDataset-style shards.
+
+    Rows with a class of the project are written, in table order, to tar
+    shards of ``shard_size`` samples each. A sample is a group of members
+    sharing its row number as key: ``.image.npy``, ``.mask.npy`` (if the
+    row has a mask), ``.cls`` (the class index) and ``.json`` (the class
+    name and source paths). Images are decoded on a process pool, a few
+    samples ahead of a single writer that keeps them in order.
+
+    :data:`SHARD_MANIFEST` lists every shard with its sample count. With
+    ``resume``, shards whose samples and source files are unchanged since
+    they were written are skipped. ``progress(done, total)`` is called
+    after each sample. Returns ``(exported, failed)``: the number of
+    samples written and the image paths that could not be read.
+    """
+    class_ids = {name: i for i, name in enumerate(store.classes)}
+    has_masks = "MaskPath" in store.table.columns
+    tasks = []
+    for row, record in store.iter_rows():
+        class_name = str(record["Class"]).strip()
+        if class_name not in class_ids:
+            continue
+        mask_path = record["MaskPath"] if has_masks else ""
+        tasks.append(
+            (
+                f"{row:08d}",
+                record["ImagePath"],
+                mask_path if mask_path not in ("", "nan", "None") else None,
+                class_name,
+                class_ids[class_name],
+            )
+        )
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, SHARD_MANIFEST)
+    previous = _read_manifest(manifest_path) if resume else {}
+    shards, todo = [], []
+    for start in range(0, len(tasks), shard_size):
+        shard_tasks = tasks[start : start + shard_size]
+        name = f"shard-{start // shard_size:06d}.tar"
+        try:
+            digest = _shard_digest(shard_tasks)
+        except OSError:
+            digest = None
+        shard = {"name": name, "count": len(shard_tasks), "digest": digest}
+        done = previous.get(name)
+        if (
+            digest is not None
+            and done is not None
+            and done.get("digest") == digest
+            and os.path.isfile(os.path.join(output_dir, name))
+        ):
+            shards.append(shard)
+        else:
+            todo.append((shard, shard_tasks))
+    # Shards past the end of a dataset that shrank.
+    names = {shard["name"] for shard in shards} | {
+        shard["name"] for shard, _ in todo
+    }
+    for name in set(previous) - names:
+        with contextlib.suppress(OSError):
+            os.remove(os.path.join(output_dir, name))
+
+    exported, failed = 0, []
+    total = sum(len(shard_tasks) for _, shard_tasks in todo)
+    if todo:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, int(workers))
+        # Spawned, not forked, so it is safe to call from the GUI process.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            for shard, shard_tasks in todo:
+                n_failed = len(failed)
+                _write_atomic(
+                    os.path.join(output_dir, shard["name"]),
+                    lambda path, shard_tasks=shard_tasks: _write_shard(
+                        path, shard_tasks, executor, 2 * workers, failed
+                    ),
+                )
+                written = len(shard_tasks) - (len(failed) - n_failed)
+                exported += written
+                if len(failed) > n_failed:
+                    # Not recorded as done, so a resumed export retries it.
+                    shard = {**shard, "count": written, "digest": None}
+                shards.append(shard)
+                shards.sort(key=lambda shard: shard["name"])
+                _write_manifest(manifest_path, shards, shard_size)
+                if progress is not None:
+                    progress(exported + len(failed), total)
+    else:
+        _write_manifest(manifest_path, shards, shard_size)
+    return exported, failed
+
+
+def _write_shard(path, tasks, executor, window, failed):
+    """Write the samples of ``tasks`` to the tar file ``path``, in order.
+
+    At most ``window`` samples are decoded ahead of the writer, which
+    bounds the memory held by decoded images.
+    """
+    pending = collections.deque()
+    tasks = iter(tasks)
+    with tarfile.open(path, "w") as tar:
+        while True:
+            for task in tasks:
+                pending.append((task, executor.submit(_encode_sample, task)))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                return
+            task, future = pending.popleft()
+            try:
+                members = future.result()
+            except Exception:  # noqa: BLE001
+                failed.append(task[1])
+                continue
+            for name, data in members:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m napari_towbintools_annotator.export",
+        description="Export a project's annotations as training data.",
+    )
+    parser.add_argument("project_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument(
+        "--no-masks",
+        action="store_true",
+        help="Skip the class masks (panoptic projects).",
+    )
+    parser.add_argument(
+        "--instances",
+        default=INSTANCES_FILE,
+        help="Consolidated instance table (.parquet, .arrow or .csv) of "
+        "panoptic projects; an empty name skips it.",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=DEFAULT_SHARD_SIZE,
+        help="Samples per tar shard (classification projects).",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Re-export files whose outputs are up to date.",
+    )
+    args = parser.parse_args(argv)
+
+    if args.shard_size < 1:
+        parser.error("--shard-size must be at least 1")
+
+    def progress(done, total):
+        print(f"Exported {done}/{total}", file=sys.stderr)
+
+    with AnnotationStore.open(args.project_dir) as store:
+        if store.project.project_type == "classification":
+            exported, failed = export_classification(
+                store,
+                args.output_dir,
+                shard_size=args.shard_size,
+                workers=args.workers,
+                resume=not args.no_resume,
+                progress=progress,
+            )
+            unit = "samples"
+        else:
+            exported, failed = export_panoptic(
+                store,
+                args.output_dir,
+                masks=not args.no_masks,
+                instances=args.instances or None,
+                workers=args.workers,
+                resume=not args.no_resume,
+                progress=progress,
+            )
+            unit = "files"
+    print(f"Exported {exported} {unit} to {args.output_dir}")
+    for path in failed:
+        print(f"Failed: {path}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
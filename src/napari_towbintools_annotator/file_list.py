@@ -0,0 +1,174 @@
+import os
+
+from qtpy.QtCore import QAbstractListModel, QModelIndex, QSize, Qt
+from qtpy.QtGui import QColor
+from qtpy.QtWidgets import QAbstractItemView, QListView
+
+_TRANSPARENT = QColor("transparent")
+_WHITE = QColor("white")
+
+
+def text_color_for(background):
+    """Black or white, whichever reads better on ``background``."""
+    luminance = (
+        0.299 * background.red()
+        + 0.587 * background.green()
+        + 0.114 * background.blue()
+    )
+    return QColor("black" if luminance > 128 else "white")
+
+
+class FileListModel(QAbstractListModel):
+    """List model over a project's file paths.
+
+    Holds a reference to the widget's path list instead of one item per
+    file; names and colours are computed only for the rows Qt displays.
+    ``colors(row)`` returns a ``(background, foreground)`` pair of
+    ``QColor``, or ``None`` for the default look, and ``thumbnails(row)``
+    the ``QImage`` shown next to the name, if any.
+    """
+
+    def __init__(self, paths, colors=None, thumbnails=None, parent=None):
+        super().__init__(parent)
+        self._paths = paths
+        self._colors = colors
+        self._thumbnails = thumbnails
+
+    def rowCount(self, parent=QModelIndex()):  # noqa: B008
+        if parent.isValid():
+            return 0
+        return len(self._paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        return self._row_data(index.row(), role)
+
+    def _row_data(self, row, role):
+        if not 0 <= row < len(self._paths):
+            return None
+        if role == Qt.DisplayRole:
+            return os.path.basename(self._paths[row])
+        if role == Qt.ToolTipRole:
+            return self._paths[row]
+        if role == Qt.DecorationRole:
+            if self._thumbnails is None:
+                return None
+            return self._thumbnails(row)
+        if role in (Qt.BackgroundRole, Qt.ForegroundRole):
+            colors = self._colors(row) if self._colors is not None else None
+            if colors is None:
+                colors = (_TRANSPARENT, _WHITE)
+            return colors[0] if role == Qt.BackgroundRole else colors[1]
+        return None
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self._paths = paths
+        self.endResetModel()
+
+    def set_thumbnails(self, thumbnails):
+        self._thumbnails = thumbnails
+        if self.rowCount():
+            self.dataChanged.emit(
+                self.index(0),
+                self.index(self.rowCount() - 1),
+                [Qt.DecorationRole],
+            )
+
+    def row_changed(self, row):
+        """Repaint ``row`` after its annotation changed."""
+        index = self.index(row)
+        self.dataChanged.emit(
+            index, index, [Qt.BackgroundRole, Qt.ForegroundRole]
+        )
+
+    def thumbnail_changed(self, row):
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def append(self, paths):
+        """Extend the shared path list by ``paths``."""
+        paths = list(paths)
+        if not paths:
+            return
+        start = len(self._paths)
+        self.beginInsertRows(QModelIndex(), start, start + len(paths) - 1)
+        self._paths.extend(paths)
+        self.endInsertRows()
+
+    def remove(self, row):
+        """Remove ``row`` from the shared path list."""
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self._paths.pop(row)
+        self.endRemoveRows()
+
+
+class FileListView(QListView):
+    """``QListView`` with the row helpers of ``QListWidget``.
+
+    With :meth:`set_thumbnails`, rows show a thumbnail; only the rows
+    scrolled into view (and one screen below) are requested.
+    """
+
+    THUMBNAIL_ICON_SIZE = 48
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        # Every row has the same height; lets Qt skip measuring each one.
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setModel(model)
+        self._thumbnails = None
+        self.verticalScrollBar().valueChanged.connect(
+            self.request_thumbnails
+        )
+
+    def set_thumbnails(self, source):
+        """Show the thumbnails of a ``ThumbnailSource``, or none."""
+        if self._thumbnails is not None:
+            self._thumbnails.changed.disconnect(self.model().thumbnail_changed)
+        self._thumbnails = source
+        if source is None:
+            self.model().set_thumbnails(None)
+            self.setIconSize(QSize())
+            return
+        source.changed.connect(self.model().thumbnail_changed)
+        size = self.THUMBNAIL_ICON_SIZE
+        self.setIconSize(QSize(size, size))
+        self.model().set_thumbnails(source.image)
+        self.request_thumbnails()
+
+    def visible_rows(self):
+        """Rows at least partly in view."""
+        rect = self.viewport().rect()
+        first = self.indexAt(rect.topLeft())
+        if not first.isValid():
+            return range(0)
+        last = self.indexAt(rect.bottomLeft())
+        stop = last.row() + 1 if last.isValid() else self.count()
+        return range(first.row(), stop)
+
+    def request_thumbnails(self):
+        if self._thumbnails is None:
+            return
+        rows = self.visible_rows()
+        if rows:
+            # One more screen below, for scrolling down.
+            stop = min(self.count(), 2 * rows.stop - rows.start)
+            self._thumbnails.request(range(rows.start, stop))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.request_thumbnails()
+
+    def count(self):
+        return self.model().rowCount()
+
+    def currentRow(self):
+        return self.currentIndex().row()
+
+    def setCurrentRow(self, row):
+        index = self.model().index(row)
+        self.setCurrentIndex(index)
+        self.scrollTo(index)
@@ -0,0 +1,163 @@
+from qtpy.QtCore import QModelIndex, QObject, QSize, Qt, Signal
+from qtpy.QtGui import QImage
+from qtpy.QtWidgets import QAbstractItemView, QListView
+
+from .file_list import FileListModel
+from .thumbnails import THUMBNAIL_SIZE, ThumbnailAtlas, ThumbnailLoader
+
+
+def thumbnail_image(thumbnail):
+    """Wrap an 8-bit grey or RGB(A) thumbnail array in a ``QImage``."""
+    height, width = thumbnail.shape[:2]
+    if thumbnail.ndim == 2:
+        image_format, channels = QImage.Format_Grayscale8, 1
+    elif thumbnail.shape[2] == 3:
+        image_format, channels = QImage.Format_RGB888, 3
+    else:
+        image_format, channels = QImage.Format_RGBA8888, 4
+    data = thumbnail.tobytes()
+    # QImage does not own ``data``; copy it before the bytes go away.
+    return QImage(data, width, height, width * channels, image_format).copy()
+
+
+class ThumbnailSource(QObject):
+    """Thumbnails of a shared path list, for item views.
+
+    The :class:`ThumbnailAtlas` in ``directory`` is opened and the loader
+    started on first use. ``changed(row)`` is emitted, on the GUI thread,
+    when a row's thumbnail was made.
+    """
+
+    changed = Signal(int)
+
+    def __init__(self, directory, paths, size=THUMBNAIL_SIZE, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.size = size
+        self._paths = paths
+        self._atlas = None
+        self._loader = None
+        self._placeholder = QImage(size, size, QImage.Format_Grayscale8)
+        self._placeholder.fill(0)
+
+    def _ensure_loader(self):
+        if self._loader is None:
+            self._atlas = ThumbnailAtlas(
+                self.directory, self._paths, self.size
+            )
+            # Emitted from the loader thread; Qt queues it to our thread.
+            self._loader = ThumbnailLoader(self._atlas, self.changed.emit)
+
+    def image(self, row):
+        """``QImage`` of ``row``, blank until its thumbnail is made."""
+        thumbnail = None if self._atlas is None else self._atlas.get(row)
+        if thumbnail is None:
+            return self._placeholder
+        return thumbnail_image(thumbnail)
+
+    def request(self, rows):
+        """Make ``rows`` the rows to fill, most wanted first."""
+        self._ensure_loader()
+        self._loader.request(
+            (row, self._paths[row])
+            for row in rows
+            if 0 <= row < len(self._paths)
+        )
+
+    def set_paths(self, paths):
+        """Follow rows dropped from or added to the path list."""
+        self._paths = paths
+        if self._atlas is not None:
+            self._loader.request(())
+            self._atlas.remap(paths)
+
+    def close(self):
+        if self._loader is not None:
+            self._loader.shutdown()
+
+
+class ThumbnailGridModel(FileListModel):
+    """One page of a path list, with thumbnails as decorations.
+
+    Row ``i`` of the model is row ``start + i`` of the shared path list.
+    """
+
+    def __init__(
+        self, paths, colors=None, thumbnails=None, page_size=48, parent=None
+    ):
+        super().__init__(
+            paths, colors=colors, thumbnails=thumbnails, parent=parent
+        )
+        self.page_size = page_size
+        self.start = 0
+
+    def rowCount(self, parent=QModelIndex()):  # noqa: B008
+        if parent.isValid():
+            return 0
+        return max(0, min(self.page_size, len(self._paths) - self.start))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.rowCount():
+            return None
+        return self._row_data(self.start + index.row(), role)
+
+    def page_paths(self):
+        return self._paths[self.start : self.start + self.rowCount()]
+
+    def set_page(self, start):
+        self.beginResetModel()
+        self.start = start
+        self.endResetModel()
+
+    def rows(self, indexes):
+        """Rows of the path list shown at ``indexes``, sorted."""
+        return sorted({self.start + index.row() for index in indexes})
+
+    def row_changed(self, row):
+        if 0 <= row - self.start < self.rowCount():
+            super().row_changed(row - self.start)
+
+    def rows_changed(self):
+        """Repaint the whole page."""
+        if self.rowCount():
+            self.dataChanged.emit(
+                self.index(0),
+                self.index(self.rowCount() - 1),
+                [Qt.BackgroundRole, Qt.ForegroundRole],
+            )
+
+    def thumbnail_changed(self, row):
+        if 0 <= row - self.start < self.rowCount():
+            super().thumbnail_changed(row - self.start)
+
+
+class ThumbnailGridView(QListView):
+    """Icon-mode view of a :class:`ThumbnailGridModel`.
+
+    Rows are picked with the usual click, Shift/Ctrl-click and keyboard
+    selection; the number keys 1-9 emit ``number_pressed``.
+    """
+
+    number_pressed = Signal(int)
+
+    def __init__(self, model, icon_size=THUMBNAIL_SIZE, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.IconMode)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setWrapping(True)
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setIconSize(QSize(icon_size, icon_size))
+        self.setGridSize(QSize(icon_size + 16, icon_size + 24))
+        self.setModel(model)
+
+    def keyPressEvent(self, event):
+        if Qt.Key_1 <= event.key() <= Qt.Key_9:
+            self.number_pressed.emit(event.key() - Qt.Key_1 + 1)
+            return
+        super().keyPressEvent(event)
+
+    def selected_rows(self):
+        return self.model().rows(self.selectedIndexes())
@@ -0,0 +1,165 @@
+import math
+import os
+import threading
+import weakref
+
+import dask.array as da
+import imageio
+import numpy as np
+import tifffile
+
+from .cache import ArrayCache
+
+# Share of physical memory the decoded-array cache uses by default, and
+# the budget used where the memory size cannot be read.
+CACHE_MEMORY_FRACTION = 0.25
+FALLBACK_CACHE_BYTES = 2 * 1024**3
+
+
+def default_cache_bytes():
+    """Default budget of :data:`image_cache`, from the machine's RAM."""
+    try:
+        total = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, OSError, ValueError):
+        return FALLBACK_CACHE_BYTES
+    if total <= 0:
+        return FALLBACK_CACHE_BYTES
+    return int(total * CACHE_MEMORY_FRACTION)
+
+
+# Default cache of :func:`load_image` and :func:`load_labels`. Annotator
+# widgets read through a cache of their own, sized by their project (see
+# ``Project.cache_bytes``).
+image_cache = ArrayCache(max_bytes=default_cache_bytes())
+
+
+def is_rgb(shape):
+    """Whether an array of ``shape`` is a single RGB(A) plane."""
+    return len(shape) == 3 and shape[-1] in (3, 4)
+
+
+def read_image(path):
+    try:
+        return tifffile.imread(path)
+    except Exception:  # noqa: BLE001
+        return imageio.imread(path)
+
+
+def read_labels(path):
+    return tifffile.imread(path)
+
+
+def _cached_read(path, reader, cache=None):
+    if cache is None:
+        cache = image_cache
+    stat = os.stat(path)
+    key = (
+        reader.__name__,
+        os.path.abspath(path),
+        stat.st_mtime_ns,
+        stat.st_size,
+    )
+    array = cache.get(key)
+    if array is None:
+        array = reader(path)
+        # Cached arrays are shared between layers and widgets; guard them
+        # against in-place edits.
+        array.setflags(write=False)
+        cache.put(key, array)
+    return array
+
+
+class _TiffPageStore:
+    """Array-like view of a TIFF series that decodes only requested pages.
+
+    Leading axes index TIFF pages; the trailing axes are one page. Used as
+    the backing store of a dask array with one page per chunk.
+    """
+
+    def __init__(self, path):
+        self._tif = tifffile.TiffFile(path)
+        self._finalizer = weakref.finalize(self, self._tif.close)
+        self._lock = threading.Lock()
+        try:
+            series = self._tif.series[0]
+            self.shape = tuple(series.shape)
+            self.dtype = np.dtype(series.dtype)
+            self.page_shape = tuple(series.keyframe.shape)
+            self.n_pages = len(series.pages)
+        except Exception:
+            self._finalizer()
+            raise
+        self.ndim = len(self.shape)
+        lead = self.shape[: self.ndim - len(self.page_shape)]
+        if (
+            self.shape[len(lead) :] != self.page_shape
+            or math.prod(lead) != self.n_pages
+        ):
+            self._finalizer()
+            raise ValueError("TIFF series does not split into whole pages.")
+        self.lead_shape = lead
+
+    @property
+    def chunks(self):
+        return (1,) * len(self.lead_shape) + self.page_shape
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (self.ndim - len(key))
+        n_lead = len(self.lead_shape)
+        pages = np.arange(self.n_pages).reshape(self.lead_shape)[key[:n_lead]]
+        with self._lock:
+            data = self._tif.asarray(key=pages.ravel().tolist(), series=0)
+        data = data.reshape(pages.shape + self.page_shape)
+        return data[(slice(None),) * pages.ndim + key[n_lead:]]
+
+
+def open_lazy(path, mode="r"):
+    """Open ``path`` without decoding it, or return ``None`` if unsupported.
+
+    Uncompressed contiguous TIFFs are memory-mapped with ``mode``; other
+    TIFFs become a dask array decoding one page per chunk, so napari only
+    reads the planes it displays.
+    """
+    try:
+        return tifffile.memmap(path, mode=mode)
+    except Exception:  # noqa: BLE001
+        pass
+    try:
+        store = _TiffPageStore(path)
+    except Exception:  # noqa: BLE001
+        return None
+    return da.from_array(
+        store,
+        chunks=store.chunks,
+        asarray=False,
+        fancy=False,
+        meta=np.empty((0,) * store.ndim, dtype=store.dtype),
+    )
+
+
+def load_image(path, lazy=False, cache=None):
+    """Read an image through ``cache``, or open it lazily.
+
+    ``cache`` defaults to the shared :data:`image_cache`.
+    """
+    if lazy:
+        array = open_lazy(path)
+        if array is not None:
+            return array
+    return _cached_read(path, read_image, cache)
+
+
+def load_labels(path, lazy=False, cache=None):
+    """Read a label image to paint on, through ``cache``.
+
+    The cached array is read-only, so a private copy is returned; lazily
+    opened files are mapped copy-on-write. Edits never reach the cache or
+    the file.
+    """
+    if lazy:
+        array = open_lazy(path, mode="c")
+        if array is not None:
+            return array
+    return _cached_read(path, read_labels, cache).copy()
@@ -0,0 +1,161 @@
+import contextlib
+import math
+import os
+
+import numpy as np
+
+from .storage import atomic_path, sidecar_name, source_signature
+
+# Percentiles stored per channel; contrast limits are read off this table.
+PERCENTILES = (0.0, 0.1, 0.5, 1.0, 99.0, 99.5, 99.9, 100.0)
+DEFAULT_CONTRAST_PERCENTILES = (0.1, 99.9)
+# Pixels sampled when a file is measured for the first time; 0 reads the
+# whole array.
+DEFAULT_SAMPLE_SIZE = 1 << 22
+
+# Bump when the stored arrays or their meaning change.
+_STATS_VERSION = 1
+
+
+def strided_sample(data, max_samples, channel_axis=None):
+    """Read an evenly strided subset of ``data`` of about ``max_samples``.
+
+    Every axis but ``channel_axis`` is strided by the same step, so lazily
+    opened stacks only decode the planes that are sampled. ``max_samples``
+    of 0 (or an array already small enough) reads everything.
+    """
+    size = math.prod(data.shape)
+    axes = [axis for axis in range(data.ndim) if axis != channel_axis]
+    if not max_samples or size <= max_samples or not axes:
+        return np.asarray(data)
+    step = math.ceil((size / max_samples) ** (1 / len(axes)))
+    index = tuple(
+        slice(None) if axis == channel_axis else slice(None, None, step)
+        for axis in range(data.ndim)
+    )
+    return np.asarray(data[index])
+
+
+def image_percentiles(
+    data, channel_axis=None, max_samples=DEFAULT_SAMPLE_SIZE
+):
+    """Return the :data:`PERCENTILES` of ``data``, one row per channel.
+
+    Without ``channel_axis`` the whole array is a single channel.
+    """
+    sample = strided_sample(data, max_samples, channel_axis)
+    if channel_axis is None:
+        sample = sample.reshape(1, -1)
+    else:
+        sample = np.moveaxis(sample, channel_axis, 0)
+        sample = sample.reshape(sample.shape[0], -1)
+    if sample.size == 0:
+        return np.zeros((len(sample), len(PERCENTILES)))
+    percentile = (
+        np.nanpercentile
+        if np.issubdtype(sample.dtype, np.floating)
+        else np.percentile
+    )
+    return percentile(sample, PERCENTILES, axis=1).T.astype(float)
+
+
+def contrast_limits(percentiles, low=None, high=None):
+    """Contrast limits covering every channel of a percentile table.
+
+    ``low`` and ``high`` default to :data:`DEFAULT_CONTRAST_PERCENTILES`
+    and must be among :data:`PERCENTILES`.
+    """
+    if low is None:
+        low = DEFAULT_CONTRAST_PERCENTILES[0]
+    if high is None:
+        high = DEFAULT_CONTRAST_PERCENTILES[1]
+    percentiles = np.asarray(percentiles, dtype=float)
+    lower = float(np.min(percentiles[:, PERCENTILES.index(low)]))
+    upper = float(np.max(percentiles[:, PERCENTILES.index(high)]))
+    if not upper > lower:
+        # Flat images; napari needs increasing limits.
+        upper = lower + 1.0
+    return [lower, upper]
+
+
+def contrast_range(dtype, percentiles, limits):
+    """Slider range for ``limits``: the dtype's range for integer images.
+
+    Float images range over their stored 0th to 100th percentiles (when
+    ``percentiles`` is given), widened to include ``limits``.
+    """
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return [float(info.min), float(info.max)]
+    lower, upper = (float(value) for value in limits)
+    if percentiles is not None:
+        low, high = contrast_limits(percentiles, low=0.0, high=100.0)
+        lower, upper = min(lower, low), max(upper, high)
+    return [lower, upper]
+
+
+def stats_path(image_path, stats_dir):
+    """Sidecar path of the statistics of ``image_path``."""
+    return os.path.join(stats_dir, f"{sidecar_name(image_path)}.stats.npz")
+
+
+def _axis_code(channel_axis):
+    return -1 if channel_axis is None else int(channel_axis)
+
+
+def read_image_stats(image_path, stats_dir, channel_axis=None):
+    """Return the stored percentile table, or ``None`` if missing or stale."""
+    path = stats_path(image_path, stats_dir)
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if (
+                int(data["version"]) != _STATS_VERSION
+                or int(data["channel_axis"]) != _axis_code(channel_axis)
+                or not np.array_equal(
+                    data["percentiles"], np.asarray(PERCENTILES)
+                )
+                or not np.array_equal(
+                    data["source"], source_signature(image_path)
+                )
+            ):
+                return None
+            return data["values"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def write_image_stats(image_path, stats_dir, values, channel_axis=None):
+    """Store the percentile table ``values`` as the sidecar of an image."""
+    os.makedirs(stats_dir, exist_ok=True)
+    path = stats_path(image_path, stats_dir)
+    with atomic_path(path) as tmp_path, open(tmp_path, "wb") as file:
+        np.savez(
+            file,
+            version=np.array(_STATS_VERSION),
+            source=source_signature(image_path),
+            channel_axis=np.array(_axis_code(channel_axis)),
+            percentiles=np.asarray(PERCENTILES),
+            values=np.asarray(values, dtype=float),
+        )
+
+
+def load_image_stats(
+    image_path,
+    stats_dir,
+    data,
+    channel_axis=None,
+    max_samples=DEFAULT_SAMPLE_SIZE,
+):
+    """Return the percentile table of an image file.
+
+    The table is read from the sidecar in ``stats_dir`` when it matches the
+    file's current mtime and size. Otherwise it is measured on ``data``
+    (strided down to ``max_samples`` pixels) and stored for next time.
+    """
+    values = read_image_stats(image_path, stats_dir, channel_axis)
+    if values is not None:
+        return values
+    values = image_percentiles(data, channel_axis, max_samples)
+    with contextlib.suppress(OSError):
+        write_image_stats(image_path, stats_dir, values, channel_axis)
+    return values
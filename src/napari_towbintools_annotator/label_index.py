@@ -0,0 +1,173 @@
+import contextlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from .image_io import load_labels
+from .storage import atomic_path, sidecar_name, source_signature
+
+_GEOMETRY_COLUMNS = [
+    "Label",
+    "Area",
+    "CentroidY",
+    "CentroidX",
+    "MinY",
+    "MinX",
+    "MaxY",
+    "MaxX",
+]
+
+
+def _plane_geometry(plane):
+    """Per-label area, centroid and bounding box of a 2D label plane.
+
+    Bounding boxes follow ``regionprops``: max coordinates are exclusive.
+    """
+    labels = np.asarray(plane).ravel()
+    height, width = plane.shape
+    if labels.size == 0:
+        return {column: np.zeros(0) for column in _GEOMETRY_COLUMNS}
+    if labels.min() < 0 or labels.max() > 4 * labels.size:
+        # Sparse or unusual ids; compact them before counting.
+        ids, labels = np.unique(labels, return_inverse=True)
+    else:
+        ids = None
+    labels = labels.astype(np.intp, copy=False)
+    rows = np.repeat(np.arange(height), width)
+    cols = np.tile(np.arange(width), height)
+    area = np.bincount(labels)
+    n_ids = len(area)
+    sum_y = np.bincount(labels, weights=rows, minlength=n_ids)
+    sum_x = np.bincount(labels, weights=cols, minlength=n_ids)
+    min_y = np.full(n_ids, height)
+    min_x = np.full(n_ids, width)
+    max_y = np.full(n_ids, -1)
+    max_x = np.full(n_ids, -1)
+    np.minimum.at(min_y, labels, rows)
+    np.minimum.at(min_x, labels, cols)
+    np.maximum.at(max_y, labels, rows)
+    np.maximum.at(max_x, labels, cols)
+    if ids is None:
+        ids = np.arange(n_ids)
+    present = (area > 0) & (ids != 0)
+    area = area[present]
+    return {
+        "Label": ids[present],
+        "Area": area,
+        "CentroidY": sum_y[present] / area,
+        "CentroidX": sum_x[present] / area,
+        "MinY": min_y[present],
+        "MinX": min_x[present],
+        "MaxY": max_y[present] + 1,
+        "MaxX": max_x[present] + 1,
+    }
+
+
+def label_geometry(label_data, plane_axis=None, planes=None):
+    """Area, centroid and bounding box of every label, in a single pass.
+
+    Returns a DataFrame with ``Label``, ``Area``, ``CentroidY``,
+    ``CentroidX`` and ``MinY``/``MinX``/``MaxY``/``MaxX`` columns; background
+    (label 0) is omitted. In 3D (``plane_axis`` set) labels are measured per
+    first-axis plane and the plane index is stored under ``plane_axis``;
+    ``planes`` restricts which planes are measured.
+    """
+    if plane_axis is None:
+        return pd.DataFrame(
+            _plane_geometry(label_data), columns=_GEOMETRY_COLUMNS
+        )
+
+    if planes is None:
+        planes = range(label_data.shape[0])
+    frames = []
+    for plane in planes:
+        plane = int(plane)
+        if plane < 0 or plane >= label_data.shape[0]:
+            continue
+        frame = pd.DataFrame(
+            _plane_geometry(label_data[plane]), columns=_GEOMETRY_COLUMNS
+        )
+        frame.insert(0, plane_axis, plane)
+        frames.append(frame)
+    if not frames:
+        frame = pd.DataFrame(
+            _plane_geometry(np.zeros((0, 0), dtype=int)),
+            columns=_GEOMETRY_COLUMNS,
+        )
+        frame.insert(0, plane_axis, np.zeros(0, dtype=int))
+        return frame
+    return pd.concat(frames, ignore_index=True)
+
+
+# Bump when the stored columns or their meaning change.
+_INDEX_VERSION = 1
+
+
+def label_index_path(segmentation_path, index_dir):
+    """Sidecar path of the label index for ``segmentation_path``."""
+    return os.path.join(
+        index_dir, f"{sidecar_name(segmentation_path)}.labels.npz"
+    )
+
+
+def read_label_index(segmentation_path, index_dir, plane_axis=None):
+    """Return the stored geometry table, or ``None`` if missing or stale."""
+    path = label_index_path(segmentation_path, index_dir)
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if (
+                int(data["version"]) != _INDEX_VERSION
+                or str(data["plane_axis"]) != (plane_axis or "")
+                or not np.array_equal(
+                    data["source"], source_signature(segmentation_path)
+                )
+            ):
+                return None
+            columns = [str(column) for column in data["columns"]]
+            return pd.DataFrame(
+                {column: data[f"col_{column}"] for column in columns},
+                columns=columns,
+            )
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def write_label_index(segmentation_path, index_dir, geometry, plane_axis=None):
+    """Store ``geometry`` as the sidecar index of ``segmentation_path``."""
+    os.makedirs(index_dir, exist_ok=True)
+    path = label_index_path(segmentation_path, index_dir)
+    arrays = {
+        f"col_{column}": geometry[column].to_numpy()
+        for column in geometry.columns
+    }
+    with atomic_path(path) as tmp_path, open(tmp_path, "wb") as file:
+        np.savez(
+            file,
+            version=np.array(_INDEX_VERSION),
+            source=source_signature(segmentation_path),
+            plane_axis=np.array(plane_axis or ""),
+            columns=np.array(list(geometry.columns)),
+            **arrays,
+        )
+
+
+def load_label_index(
+    segmentation_path, index_dir, plane_axis=None, label_data=None
+):
+    """Return the label geometry table of a segmentation file.
+
+    The table is read from the sidecar index in ``index_dir`` when it matches
+    the segmentation's current mtime and size. Otherwise it is computed with
+    :func:`label_geometry` from ``label_data`` (read from disk if not given)
+    and stored for next time.
+    """
+    geometry = read_label_index(segmentation_path, index_dir, plane_axis)
+    if geometry is not None:
+        return geometry
+    if label_data is None:
+        label_data = load_labels(segmentation_path)
+    geometry = label_geometry(np.asarray(label_data), plane_axis)
+    with contextlib.suppress(OSError):
+        write_label_index(segmentation_path, index_dir, geometry, plane_axis)
+    return geometry
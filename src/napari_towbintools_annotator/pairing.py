@@ -0,0 +1,194 @@
+import os
+import re
+
+from natsort import natsorted
+
+_DIGITS = re.compile(r"\d+")
+# Suffixes that mark a segmentation or mask, dropped from default keys so
+# that "img0.tif" pairs with "img0_seg.tif".
+_LABEL_SUFFIX = re.compile(
+    r"[_\-. ](?:seg|segmentation|mask|masks|label|labels)$", re.IGNORECASE
+)
+
+
+def _normalize_token(token):
+    # Case-insensitive, and "t001" matches "t1".
+    if token is None:
+        return ""
+    return _DIGITS.sub(lambda m: str(int(m.group())), token.lower())
+
+
+def file_stem(path):
+    """File name without its extension (``.ome.tif`` counts as one)."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem.lower().endswith(".ome"):
+        stem = stem[:-4]
+    return stem
+
+
+def compile_pattern(pattern):
+    """Compile a pairing regex, raising ``ValueError`` if it is invalid."""
+    if not pattern:
+        return None
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error as error:
+        raise ValueError(
+            f"Invalid pairing pattern '{pattern}': {error}"
+        ) from error
+
+
+def pairing_key(path, pattern=None):
+    """Key under which ``path`` is paired, or ``None`` if it has none.
+
+    Without ``pattern`` the key is the normalised file stem, less a
+    trailing ``_seg``, ``_mask`` or ``_labels`` (or similar). With a
+    pattern, the key is made of its capture groups (or the whole match)
+    searched in the stem, e.g. ``r"(?P<well>[A-H]\\d+).*_t(?P<time>\\d+)"``
+    pairs files on their well and time point only.
+    """
+    stem = file_stem(path)
+    pattern = compile_pattern(pattern)
+    if pattern is None:
+        return (_normalize_token(_LABEL_SUFFIX.sub("", stem)),)
+    match = pattern.search(stem)
+    if match is None:
+        return None
+    tokens = match.groups() or (match.group(0),)
+    return tuple(_normalize_token(token) for token in tokens)
+
+
+def directory_groups(first_directories, second_directories):
+    """Map the directories of each side to the index of their counterpart.
+
+    With as many directories on both sides, the n-th directory of one side
+    (in natural order, as they are scanned) corresponds to the n-th of the
+    other, and files are only paired within corresponding directories.
+    Returns one ``{directory: index}`` dict per side, or ``None`` when the
+    counts differ: files are then paired across all directories.
+    """
+    if len(first_directories) != len(second_directories):
+        return None
+    return tuple(
+        {
+            directory: group
+            for group, directory in enumerate(
+                natsorted(os.path.normpath(d) for d in directories)
+            )
+        }
+        for directories in (first_directories, second_directories)
+    )
+
+
+def _index(paths, pattern, groups=None):
+    index = {}
+    unkeyed = []
+    duplicates = set()
+    for path in paths:
+        key = pairing_key(path, pattern)
+        if key is not None and groups is not None:
+            directory = os.path.normpath(os.path.dirname(path))
+            key = (groups.get(directory), *key)
+        if key is None:
+            unkeyed.append(path)
+        elif key in index:
+            duplicates.add(key)
+            index[key].append(path)
+        else:
+            index[key] = [path]
+    return index, unkeyed, duplicates
+
+
+def pair_files(references, segmentations, pattern=None, directories=None):
+    """Pair two file lists on their :func:`pairing_key`.
+
+    Builds one hash index per side, so pairing is linear in the number of
+    files. ``directories`` is the ``(reference_directories,
+    segmentation_directories)`` the files were scanned from; when both
+    sides have as many directories, files are only paired within
+    corresponding directories (see :func:`directory_groups`), so file
+    names may repeat across directories. Returns ``(paired_references,
+    paired_segmentations, unmatched_references, unmatched_segmentations)``;
+    pairs are ordered by the natural order of the reference paths. Files
+    whose key has no counterpart, or is shared by several files on one
+    side, are unmatched.
+    """
+    pattern = compile_pattern(pattern)
+    groups = directory_groups(*directories) if directories else None
+    ref_groups, seg_groups = groups or (None, None)
+    ref_index, ref_unkeyed, ref_duplicates = _index(
+        references, pattern, ref_groups
+    )
+    seg_index, seg_unkeyed, seg_duplicates = _index(
+        segmentations, pattern, seg_groups
+    )
+    ambiguous = ref_duplicates | seg_duplicates
+
+    pairs = {}
+    unmatched_references = list(ref_unkeyed)
+    for key, paths in ref_index.items():
+        if key in seg_index and key not in ambiguous:
+            pairs[paths[0]] = seg_index[key][0]
+        else:
+            unmatched_references.extend(paths)
+    unmatched_segmentations = list(seg_unkeyed)
+    for key, paths in seg_index.items():
+        if key not in ref_index or key in ambiguous:
+            unmatched_segmentations.extend(paths)
+
+    paired_references = natsorted(pairs)
+    return (
+        paired_references,
+        [pairs[path] for path in paired_references],
+        natsorted(unmatched_references),
+        natsorted(unmatched_segmentations),
+    )
+
+
+def unmatched_message(
+    unmatched_references,
+    unmatched_segmentations,
+    labels=("reference", "segmentation"),
+    limit=5,
+):
+    """Describe unmatched files for an error or status message."""
+    parts = []
+    for label, paths in zip(
+        labels, (unmatched_references, unmatched_segmentations), strict=True
+    ):
+        if not paths:
+            continue
+        names = ", ".join(os.path.basename(p) for p in paths[:limit])
+        if len(paths) > limit:
+            names += ", ..."
+        parts.append(f"{len(paths)} unmatched {label} files ({names})")
+    return "; ".join(parts)
+
+
+def pair_or_raise(
+    references,
+    segmentations,
+    pattern=None,
+    allow_unmatched=False,
+    labels=("reference", "segmentation"),
+    report=None,
+    directories=None,
+):
+    """Pair two file lists, raising ``ValueError`` on unmatched files.
+
+    With ``allow_unmatched`` the unmatched files are left out instead and
+    ``report`` (if given) is called with a description of them.
+    ``directories`` is passed on to :func:`pair_files`.
+    """
+    references, segmentations, unmatched_refs, unmatched_segs = pair_files(
+        references, segmentations, pattern, directories
+    )
+    if unmatched_refs or unmatched_segs:
+        message = unmatched_message(unmatched_refs, unmatched_segs, labels)
+        if not allow_unmatched:
+            raise ValueError(f"Could not pair every file: {message}.")
+        if report is not None:
+            report(f"Skipping {message}.")
+    return references, segmentations
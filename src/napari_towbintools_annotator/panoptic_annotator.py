@@ -1,33 +1,52 @@
 import contextlib
+import functools
 import os
-import threading
 
-import imageio
 import numpy as np
 import pandas as pd
-import tifffile
 from qtpy.QtGui import QColor
 from qtpy.QtWidgets import (
     QButtonGroup,
+    QCheckBox,
     QHBoxLayout,
     QLabel,
-    QListWidget,
-    QListWidgetItem,
     QPushButton,
     QRadioButton,
     QVBoxLayout,
     QWidget,
 )
-from skimage.measure import regionprops
-
-from .colors import CLASS_PALETTE, hex_to_rgba_float
 
+# Re-exported for code that imports them from here.
+from .annotation_store import (  # noqa: F401
+    PLANE_AXIS,
+    annotation_columns,
+    annotation_path,
+    class_color_table,
+    class_colors,
+    nearest_class_id,
+    nearest_class_ids,
+    points_to_rows,
+    read_annotations,
+    rows_to_points,
+)
+from .cache import ArrayCache
+from .colors import CLASS_PALETTE
+from .file_list import FileListModel, FileListView
+from .grid_view import ThumbnailSource
+from .image_io import load_image
+from .image_stats import (
+    DEFAULT_SAMPLE_SIZE,
+    contrast_limits,
+    contrast_range,
+    load_image_stats,
+)
+from .label_index import label_geometry, load_label_index  # noqa: F401
+from .prefetch import Prefetcher
+from .pyramids import PYRAMID_DIR, base_level, read_pyramid
+from .status import ANNOTATED, UNANNOTATED, AnnotationStatus
+from .storage import AnnotationJournal, SnapshotWriter, read_table
+from .thumbnails import ATLAS_DIR
 
-def _read_array(path):
-    try:
-        return tifffile.imread(path)
-    except Exception:  # noqa: BLE001
-        return imageio.imread(path)
 
 def channel_axis_first(image, mask_shape):
     """Move the axes around so that the mask Z sliders matches the image's Z slider.
@@ -38,114 +57,86 @@ def channel_axis_first(image, mask_shape):
     return image.swapaxes(0, 1)
 
 
-def nearest_class_id(color, id_to_color):
-    """Return the class id whose RGBA color is closest to ``color``."""
-    target = np.asarray(color, dtype=float)
-    best_id, best_dist = -1, float("inf")
-    for class_id, class_color in id_to_color.items():
-        dist = np.sum((target - np.asarray(class_color, dtype=float)) ** 2)
-        if dist < best_dist:
-            best_dist, best_id = dist, class_id
-    return best_id
-
-
-def points_to_rows(
-    points, face_colors, label_data, id_to_color, id_to_name, plane_axis=None
+def _load_pair(
+    paths,
+    lazy=False,
+    index_dir=None,
+    sample_size=DEFAULT_SAMPLE_SIZE,
+    pyramid_dir=None,
+    cache=None,
+    sidecars=None,
 ):
-    """Convert annotation points + colors into per-instance annotation rows.
-
-    Each point is rounded to integer coordinates, used to read the label value
-    under it, and its color is matched to the nearest class. Points outside the
-    label array are skipped. In 3D (``plane_axis`` set) the first-axis index is
-    recorded under that column name.
+    """Read a ``(reference, segmentation, geometry, stats)`` tuple.
+
+    Arrays are decoded through ``cache`` (see :func:`image_io.load_image`)
+    and are read-only. With ``lazy`` the reference is opened without
+    decoding it; the segmentation is always read in full since points are
+    matched against it. With ``index_dir`` the segmentation's label index
+    is loaded (and built on first use) as ``geometry``, and the reference's
+    percentile table ``stats`` comes from its statistics sidecar in the same
+    directory; otherwise both are ``None``. ``sidecars`` is a ``(geometry,
+    stats)`` pair read beforehand, see :func:`_prefetch_pair`. With
+    ``pyramid_dir``, files that have a pyramid there are returned as their
+    list of memory-mapped levels.
     """
-    rows = []
-    shape = label_data.shape
-    for point, color in zip(points, face_colors, strict=False):
-        index = tuple(int(round(coord)) for coord in point)
-        if len(index) != len(shape):
-            continue
-        if any(i < 0 or i >= s for i, s in zip(index, shape, strict=False)):
-            continue
-        label_value = int(label_data[index])
-        # Background (label 0) is not an annotatable instance; skip it.
-        if label_value == 0:
-            continue
-        class_id = nearest_class_id(color, id_to_color)
-        class_name = id_to_name.get(class_id, "unknown")
-        if plane_axis is not None:
-            row = {
-                plane_axis: index[0],
-                "Label": label_value,
-                "ClassID": class_id,
-                "Class": class_name,
-            }
-        else:
-            row = {
-                "Label": label_value,
-                "ClassID": class_id,
-                "Class": class_name,
-            }
-        rows.append(row)
-    return rows
+    reference_file, segmentation_file = paths
+    reference = segmentation = None
+    if pyramid_dir is not None:
+        reference = read_pyramid(reference_file, pyramid_dir)
+        segmentation = read_pyramid(
+            segmentation_file, pyramid_dir, labels=True
+        )
+    if segmentation is None:
+        segmentation = load_image(segmentation_file, cache=cache)
+    labels = base_level(segmentation)
+    if reference is None:
+        reference = channel_axis_first(
+            load_image(reference_file, lazy=lazy, cache=cache), labels.shape
+        )
+    geometry = stats = None
+    if sidecars is not None:
+        geometry, stats = sidecars
+    elif index_dir is not None:
+        plane_axis = PLANE_AXIS if labels.ndim == 3 else None
+        geometry = load_label_index(
+            segmentation_file, index_dir, plane_axis, label_data=labels
+        )
+        # Pyramids are measured on their coarsest level.
+        image = reference[-1] if isinstance(reference, list) else reference
+        channel_axis = 0 if image.ndim == labels.ndim + 1 else None
+        stats = load_image_stats(
+            reference_file,
+            index_dir,
+            image,
+            channel_axis,
+            max_samples=sample_size,
+        )
+    return reference, segmentation, geometry, stats
 
 
-def _centroid(mask):
-    props = regionprops(mask.astype(int))
-    if not props:
-        return None
-    return props[0].centroid
+def _prefetch_pair(paths, **kwargs):
+    """Read a pair ahead of time and return its ``(geometry, stats)``.
 
+    The decoded arrays are only kept by the cache, so prefetching stays
+    within its budget; arrays evicted before the pair is shown are read
+    again then.
+    """
+    return _load_pair(paths, **kwargs)[2:]
 
-def rows_to_points(annotations_df, label_data, id_to_color, plane_axis=None):
-    """Convert annotation rows back into ``(point_coords, rgba)`` placements.
 
-    For each row the label's centroid is used as the point location. Rows with
-    an unknown class id, or whose label is absent from the (plane of the) label
-    array, are skipped.
-    """
-    placements = []
-    if plane_axis is not None:
-        for plane in annotations_df[plane_axis].unique():
-            plane = int(plane)
-            if plane < 0 or plane >= label_data.shape[0]:
-                continue
-            plane_df = annotations_df[annotations_df[plane_axis] == plane]
-            for _, row in plane_df.iterrows():
-                color = id_to_color.get(int(row["ClassID"]))
-                if color is None:
-                    continue
-                mask = label_data[plane] == int(row["Label"])
-                if not mask.any():
-                    continue
-                centroid = _centroid(mask)
-                if centroid is None:
-                    continue
-                placements.append(
-                    (np.array([plane, centroid[0], centroid[1]]), color)
-                )
-    else:
-        for _, row in annotations_df.iterrows():
-            color = id_to_color.get(int(row["ClassID"]))
-            if color is None:
-                continue
-            mask = label_data == int(row["Label"])
-            if not mask.any():
-                continue
-            centroid = _centroid(mask)
-            if centroid is None:
-                continue
-            placements.append(
-                (np.array([centroid[0], centroid[1]]), color)
-            )
-    return placements
+def _layer_base(layer):
+    """Full-resolution data of a layer, multiscale or not."""
+    return layer.data[0] if layer.multiscale else layer.data
 
 
-_PLANE_AXIS = "Z"
 _DONE_COLOR = "#55A868"
+_DONE_COLORS = (QColor(_DONE_COLOR), QColor("white"))
 
 
 class PanopticAnnotatorWidget(QWidget):
+    # Journaled edits between two full rewrites of the master table.
+    COMPACT_EVERY = 100
+
     def __init__(self, napari_viewer, project, parent=None):
         super().__init__(parent=parent)
         self.viewer = napari_viewer
@@ -156,47 +147,79 @@ class PanopticAnnotatorWidget(QWidget):
 
         self.project_label = QLabel(f"Project: {project.name}")
         self.main_layout.addWidget(self.project_label)
+        self.progress_label = QLabel("")
+        self.main_layout.addWidget(self.progress_label)
 
         self.annotation_df_path = os.path.join(
             project.project_dir, project.annotation_df_path
         )
-        self.annotation_df = pd.read_csv(self.annotation_df_path)
+        self.annotation_df = read_table(self.annotation_df_path)
         for col in ("Reference", "Segmentation", "Annotation"):
             if col in self.annotation_df.columns:
                 self.annotation_df[col] = (
                     self.annotation_df[col].fillna("").astype(str)
                 )
+        # Recover edits journaled after the last full write (e.g. a crash).
+        self._journal = AnnotationJournal(self.annotation_df_path)
+        recovered = self._journal.replay(self.annotation_df)
         self.reference_files = self.annotation_df["Reference"].tolist()
+        flagged = None
+        if "Flagged" in self.annotation_df.columns:
+            flagged = np.array(self.annotation_df["Flagged"].eq(True))
+            self.annotation_df["Flagged"] = flagged
+        self._status = AnnotationStatus.from_values(
+            self.annotation_df["Annotation"], flagged=flagged
+        )
 
         # Class lookups; colors derived from palette by class index.
         self.classes = list(project.classes)
         self.class_id_to_name = dict(enumerate(self.classes))
         self.class_name_to_id = {c: i for i, c in enumerate(self.classes)}
-        self.class_id_to_color = {
-            i: hex_to_rgba_float(CLASS_PALETTE[i % len(CLASS_PALETTE)])
-            for i in range(len(self.classes))
-        }
+        self.class_id_to_color = class_colors(self.classes)
         self.class_name_to_color = {
             c: self.class_id_to_color[i]
             for i, c in enumerate(self.classes)
         }
+        self._class_color_table = class_color_table(self.class_id_to_color)
         self.selected_class = self.classes[0] if self.classes else None
 
         # Layer + write state.
         self._reference_layer = None
         self._segmentation_layer = None
         self._annotation_layer = None
-        self._write_lock = threading.Lock()
-        self._pending_write = False
+        self._writer = SnapshotWriter(self.annotation_df_path)
+        if recovered:
+            self._save_master_sync()
+        # Decoded files, prefetched ones included; see Project.cache_bytes.
+        self._image_cache = ArrayCache(max_bytes=project.cache_bytes())
+        pair_options = {
+            "lazy": project.uses_lazy_loading(),
+            "index_dir": os.path.dirname(self.annotation_df_path),
+            "sample_size": project.contrast_sample_size,
+            "pyramid_dir": (
+                os.path.join(project.project_dir, PYRAMID_DIR)
+                if project.pyramids
+                else None
+            ),
+            "cache": self._image_cache,
+        }
+        self._load_pair = functools.partial(_load_pair, **pair_options)
+        self._geometry = None
+        self._prefetcher = Prefetcher(
+            functools.partial(_prefetch_pair, **pair_options),
+            workers=project.prefetch_workers,
+        )
 
         # File list.
-        self.file_list_widget = QListWidget()
-        self._populate_file_list()
+        self.file_list_model = FileListModel(
+            self.reference_files, colors=self._item_colors, parent=self
+        )
+        self.file_list_widget = FileListView(self.file_list_model)
         self.current_file_idx = self._find_resume_index()
         if self.current_file_idx >= len(self.reference_files):
             self.current_file_idx = 0
         self.file_list_widget.setCurrentRow(self.current_file_idx)
-        self.file_list_widget.itemClicked.connect(self.choose_file_from_list)
+        self.file_list_widget.clicked.connect(self.choose_file_from_list)
         self.main_layout.addWidget(self.file_list_widget)
 
         # Navigation.
@@ -208,6 +231,17 @@ class PanopticAnnotatorWidget(QWidget):
         nav_layout.addWidget(self.previous_button)
         nav_layout.addWidget(self.next_button)
         self.main_layout.addLayout(nav_layout)
+        jump_layout = QHBoxLayout()
+        self.next_unannotated_button = QPushButton("Next unannotated [U]")
+        self.flag_button = QPushButton("Flag [F]")
+        self.next_flagged_button = QPushButton("Next flagged [G]")
+        self.next_unannotated_button.clicked.connect(self.next_unannotated)
+        self.flag_button.clicked.connect(self.toggle_flag)
+        self.next_flagged_button.clicked.connect(self.next_flagged)
+        jump_layout.addWidget(self.next_unannotated_button)
+        jump_layout.addWidget(self.flag_button)
+        jump_layout.addWidget(self.next_flagged_button)
+        self.main_layout.addLayout(jump_layout)
 
         # Class radio buttons.
         self.class_buttons_widget = QWidget()
@@ -228,42 +262,65 @@ class PanopticAnnotatorWidget(QWidget):
         self.save_button.clicked.connect(self.save_annotations)
         self.main_layout.addWidget(self.save_button)
 
+        self.refresh_button = QPushButton("Refresh files")
+        self.refresh_button.setToolTip(
+            "Add reference/segmentation pairs written to the project "
+            "directories since the project was created."
+        )
+        self.refresh_button.clicked.connect(self.refresh_files)
+        self.main_layout.addWidget(self.refresh_button)
+
+        self.keep_contrast_checkbox = QCheckBox("Keep contrast limits")
+        self.keep_contrast_checkbox.setToolTip(
+            "Keep the reference contrast limits when moving to a file of the "
+            "same data type, instead of rescaling them to each file."
+        )
+        self.main_layout.addWidget(self.keep_contrast_checkbox)
+
+        self.thumbnails = ThumbnailSource(
+            os.path.join(os.path.dirname(self.annotation_df_path), ATLAS_DIR),
+            self.reference_files,
+            parent=self,
+        )
+        self.thumbnails_checkbox = QCheckBox("Show thumbnails")
+        self.thumbnails_checkbox.toggled.connect(self.set_list_thumbnails)
+        self.main_layout.addWidget(self.thumbnails_checkbox)
+
         # Key bindings.
         self._bound_keys = {
             "Up": self._cycle_class_up,
             "Down": self._cycle_class_down,
             "j": self._next_file_key,
             "h": self._previous_file_key,
+            "u": self._next_unannotated_key,
+            "f": self._toggle_flag_key,
+            "g": self._next_flagged_key,
             "s": self._save_key,
         }
         for key, callback in self._bound_keys.items():
             self.viewer.bind_key(key, callback, overwrite=True)
 
+        self._update_progress()
         self._load_file()
 
     # ----- file list -----
-    def _populate_file_list(self):
-        self.file_list_widget.clear()
-        for i, path in enumerate(self.reference_files):
-            item = QListWidgetItem(os.path.basename(path))
-            self._apply_item_color(item, i)
-            self.file_list_widget.addItem(item)
-
-    def _apply_item_color(self, item, idx):
-        annotation = str(self.annotation_df.loc[idx, "Annotation"]).strip()
-        if annotation in ("", "nan", "None"):
-            item.setBackground(QColor("transparent"))
-            item.setForeground(QColor("white"))
-        else:
-            item.setBackground(QColor(_DONE_COLOR))
-            item.setForeground(QColor("white"))
+    def set_list_thumbnails(self, enabled):
+        """Show thumbnails of the reference images in the file list."""
+        self.file_list_widget.set_thumbnails(
+            self.thumbnails if enabled else None
+        )
+
+    def _item_colors(self, idx):
+        if self._status.state[idx] != ANNOTATED:
+            return None
+        return _DONE_COLORS
 
     def _find_resume_index(self):
-        annotated = self.annotation_df["Annotation"].astype(str).str.strip()
-        for i, value in enumerate(annotated):
-            if value in ("", "nan", "None"):
-                return i
-        return 0
+        first = self._status.first(UNANNOTATED)
+        return 0 if first is None else first
+
+    def _update_progress(self):
+        self.progress_label.setText(self._status.summary())
 
     # ----- class selection -----
     def _style_class_button(self, button, class_name):
@@ -306,7 +363,7 @@ class PanopticAnnotatorWidget(QWidget):
     def _plane_axis(self):
         if self._segmentation_layer is None:
             return None
-        return _PLANE_AXIS if self._segmentation_layer.ndim == 3 else None
+        return PLANE_AXIS if self._segmentation_layer.ndim == 3 else None
 
     def _add_annotation_layer(self):
         ndim = self._segmentation_layer.ndim
@@ -316,15 +373,15 @@ class PanopticAnnotatorWidget(QWidget):
         self._update_point_color()
 
     def _replay_annotations(self, csv_path):
-        try:
-            df = pd.read_csv(csv_path)
-        except pd.errors.EmptyDataError:
-            return
+        df = read_annotations(csv_path)
         if df.empty:
             return
-        label_data = np.asarray(self._segmentation_layer.data)
         placements = rows_to_points(
-            df, label_data, self.class_id_to_color, self._plane_axis()
+            df,
+            _layer_base(self._segmentation_layer),
+            self.class_id_to_color,
+            self._plane_axis(),
+            geometry=self._geometry,
         )
         if not placements:
             return
@@ -333,36 +390,121 @@ class PanopticAnnotatorWidget(QWidget):
         self._annotation_layer.data = coords
         self._annotation_layer.face_color = colors
 
+    def _layers_reusable(self, reference, segmentation):
+        """Whether the current layers can display the next pair in place.
+
+        Layers are only rebuilt when the dimensionality changes, a file
+        switches to or from a pyramid, or a layer was removed from the
+        viewer; shape and dtype may differ.
+        """
+        layers = (
+            self._reference_layer,
+            self._segmentation_layer,
+            self._annotation_layer,
+        )
+        if any(
+            layer is None or layer not in self.viewer.layers
+            for layer in layers
+        ):
+            return False
+        return (
+            self._reference_layer.multiscale == isinstance(reference, list)
+            and self._segmentation_layer.multiscale
+            == isinstance(segmentation, list)
+            and _layer_base(self._reference_layer).ndim
+            == base_level(reference).ndim
+            and _layer_base(self._segmentation_layer).ndim
+            == base_level(segmentation).ndim
+        )
+
+    def _set_contrast(self, stats, limits=None):
+        """Set the reference contrast from its percentile table ``stats``.
+
+        ``limits`` default to the table's default percentiles; the slider
+        range comes from :func:`image_stats.contrast_range`.
+        """
+        layer = self._reference_layer
+        if limits is None:
+            if stats is None:
+                layer.reset_contrast_limits_range()
+                layer.reset_contrast_limits()
+                return
+            limits = contrast_limits(stats)
+        layer.contrast_limits_range = contrast_range(
+            _layer_base(layer).dtype, stats, limits
+        )
+        layer.contrast_limits = limits
+
+    def _swap_layer_data(self, reference, segmentation, names, stats):
+        """Show a new pair in the existing layers."""
+        reference_layer = self._reference_layer
+        limits = None
+        if (
+            self.keep_contrast_checkbox.isChecked()
+            and _layer_base(reference_layer).dtype
+            == base_level(reference).dtype
+        ):
+            limits = reference_layer.contrast_limits
+        reference_layer.data = reference
+        self._set_contrast(stats, limits)
+        reference_layer.name = names[0]
+        self._segmentation_layer.data = segmentation
+        # Setting data keeps the undo history; undoing edits of the previous
+        # file would write them into this one (and its cached array).
+        self._segmentation_layer._reset_history()
+        self._segmentation_layer.name = names[1]
+        self._annotation_layer.selected_data = set()
+        self._annotation_layer.data = np.zeros(
+            (0, base_level(segmentation).ndim)
+        )
+        self._update_point_color()
+
     def _load_file(self):
         if not self.reference_files or not (
             0 <= self.current_file_idx < len(self.reference_files)
         ):
             return
 
-        self.viewer.layers.select_all()
-        self.viewer.layers.remove_selected()
-        self._reference_layer = None
-        self._segmentation_layer = None
-        self._annotation_layer = None
-
         row = self.annotation_df.iloc[self.current_file_idx]
         reference_file = row["Reference"]
         segmentation_file = row["Segmentation"]
         annotation_file = str(row["Annotation"]).strip()
 
-        segmentation = _read_array(segmentation_file)
-
-        reference = channel_axis_first(
-            _read_array(reference_file), segmentation.shape
-        )
-
-        self._reference_layer = self.viewer.add_image(
-            reference, name=os.path.basename(reference_file)
+        paths = (reference_file, segmentation_file)
+        reference, segmentation, self._geometry, stats = self._load_pair(
+            paths, sidecars=self._prefetcher.take(paths)
         )
-        self._segmentation_layer = self.viewer.add_labels(
-            segmentation, name=os.path.basename(segmentation_file), opacity=0.5
+        if not isinstance(segmentation, list):
+            # Cached arrays are read-only; the Labels layer paints on a copy.
+            segmentation = segmentation.copy()
+        names = (
+            os.path.basename(reference_file),
+            os.path.basename(segmentation_file),
         )
-        self._add_annotation_layer()
+
+        if self._layers_reusable(reference, segmentation):
+            self._swap_layer_data(reference, segmentation, names, stats)
+        else:
+            self.viewer.layers.select_all()
+            self.viewer.layers.remove_selected()
+            self._reference_layer = self.viewer.add_image(
+                reference,
+                name=names[0],
+                contrast_limits=(
+                    None if stats is None else contrast_limits(stats)
+                ),
+                multiscale=isinstance(reference, list),
+            )
+            if stats is not None:
+                # napari takes the given limits as the slider range.
+                self._set_contrast(stats)
+            self._segmentation_layer = self.viewer.add_labels(
+                segmentation,
+                name=names[1],
+                opacity=0.5,
+                multiscale=isinstance(segmentation, list),
+            )
+            self._add_annotation_layer()
 
         if annotation_file not in ("", "nan", "None") and os.path.isfile(
             annotation_file
@@ -370,6 +512,24 @@ class PanopticAnnotatorWidget(QWidget):
             self._replay_annotations(annotation_file)
 
         self.viewer.reset_view()
+        self._schedule_prefetch()
+
+    def _schedule_prefetch(self):
+        """Queue the neighbouring rows for background loading."""
+        idx = self.current_file_idx
+        n_files = len(self.reference_files)
+        ahead = self.project.prefetch_ahead
+        behind = self.project.prefetch_behind
+        rows = [
+            i for i in range(idx + 1, idx + 1 + ahead) if i < n_files
+        ] + [i for i in range(idx - 1, idx - 1 - behind, -1) if i >= 0]
+        self._prefetcher.schedule(
+            (
+                self.annotation_df.at[i, "Reference"],
+                self.annotation_df.at[i, "Segmentation"],
+            )
+            for i in rows
+        )
 
     def _autosave_current_file(self):
         """Persist the current file's annotations before navigating away.
@@ -391,30 +551,56 @@ class PanopticAnnotatorWidget(QWidget):
         self.current_file_idx = self.file_list_widget.currentRow()
         self._load_file()
 
-    def next_file(self):
+    def _go_to(self, find):
+        """Autosave, then load the row ``find(current_row)`` returns.
+
+        ``find`` runs after the autosave, so a file annotated just now is
+        already out of the unannotated index. Returning ``None`` stays put.
+        """
         if not self.reference_files:
             return
         self._autosave_current_file()
-        self.current_file_idx = min(
-            self.current_file_idx + 1, len(self.reference_files) - 1
-        )
+        idx = find(self.current_file_idx)
+        if idx is None:
+            return
+        self.current_file_idx = idx
         self.file_list_widget.setCurrentRow(self.current_file_idx)
         self._load_file()
 
+    def next_file(self):
+        last = len(self.reference_files) - 1
+        self._go_to(lambda idx: min(idx + 1, last))
+
     def previous_file(self):
-        if not self.reference_files:
+        self._go_to(lambda idx: max(idx - 1, 0))
+
+    def next_unannotated(self):
+        self._go_to(
+            functools.partial(self._status.next_row, state=UNANNOTATED)
+        )
+
+    def next_flagged(self):
+        self._go_to(self._status.next_flagged)
+
+    def toggle_flag(self):
+        """Flag the current file for review, or clear its flag."""
+        if not 0 <= self.current_file_idx < len(self.reference_files):
             return
-        self._autosave_current_file()
-        self.current_file_idx = max(self.current_file_idx - 1, 0)
-        self.file_list_widget.setCurrentRow(self.current_file_idx)
-        self._load_file()
+        idx = self.current_file_idx
+        flagged = not self._status.flagged[idx]
+        if "Flagged" not in self.annotation_df.columns:
+            self.annotation_df["Flagged"] = False
+        self.annotation_df.at[idx, "Flagged"] = flagged
+        self._status.set_flag(idx, flagged)
+        self._update_progress()
+        self._record(idx, "Flagged", flagged)
 
     # ----- saving -----
     def save_annotations(self):
         if self._annotation_layer is None or self._segmentation_layer is None:
             return
         plane_axis = self._plane_axis()
-        label_data = np.asarray(self._segmentation_layer.data)
+        label_data = np.asarray(_layer_base(self._segmentation_layer))
         rows = points_to_rows(
             np.asarray(self._annotation_layer.data),
             np.asarray(self._annotation_layer.face_color),
@@ -422,40 +608,80 @@ class PanopticAnnotatorWidget(QWidget):
             self.class_id_to_color,
             self.class_id_to_name,
             plane_axis,
+            color_table=self._class_color_table,
         )
-        columns = (
-            ([plane_axis] if plane_axis is not None else [])
-            + ["Label", "ClassID", "Class"]
-        )
-        df = pd.DataFrame(rows, columns=columns)
+        df = pd.DataFrame(rows, columns=annotation_columns(plane_axis))
 
-        reference = self.annotation_df.loc[self.current_file_idx, "Reference"]
-        name = os.path.splitext(os.path.basename(reference))[0]
-        annotations_dir = os.path.dirname(self.annotation_df_path)
-        out_path = os.path.join(annotations_dir, f"{name}.csv")
+        record = self.annotation_df.loc[self.current_file_idx]
+        out_path = annotation_path(
+            os.path.dirname(self.annotation_df_path),
+            record["Reference"],
+            record["Annotation"],
+        )
         df.to_csv(out_path, index=False)
 
         self.annotation_df.loc[self.current_file_idx, "Annotation"] = out_path
-        item = self.file_list_widget.item(self.current_file_idx)
-        self._apply_item_color(item, self.current_file_idx)
-        self._save_master_async()
+        self._status.set(self.current_file_idx, ANNOTATED)
+        self.file_list_model.row_changed(self.current_file_idx)
+        self._update_progress()
+        self._record(self.current_file_idx, "Annotation", out_path)
 
-    def _save_master_sync(self):
-        with self._write_lock:
-            self._pending_write = False
-            self.annotation_df.to_csv(self.annotation_df_path, index=False)
+    def refresh_files(self):
+        """Append rows for new file pairs in the project directories.
 
-    def _save_master_async(self):
-        snapshot = self.annotation_df.copy()
-        path = self.annotation_df_path
+        Returns the number of rows added.
+        """
+        new_rows = self.project.refresh(self.annotation_df)
+        if new_rows.empty:
+            self.project.save()
+            return 0
+
+        start = len(self.annotation_df)
+        new_rows = new_rows.astype(str)
+        if "Flagged" in self.annotation_df.columns:
+            new_rows["Flagged"] = False
+        self.annotation_df = pd.concat(
+            [self.annotation_df, new_rows], ignore_index=True
+        )
+        self._status.append(len(new_rows))
+        self.file_list_model.append(new_rows["Reference"])
+        self.thumbnails.set_paths(self.reference_files)
+        self._update_progress()
 
-        def write():
-            with self._write_lock:
-                self._pending_write = False
-                snapshot.to_csv(path, index=False)
+        # Write the table before the directory snapshot, so a crash in
+        # between only causes a rescan.
+        self._save_master_sync()
+        self.project.save()
 
-        self._pending_write = True
-        threading.Thread(target=write, daemon=True).start()
+        if start == 0:
+            self.current_file_idx = 0
+            self.file_list_widget.setCurrentRow(0)
+            self._load_file()
+        else:
+            self._schedule_prefetch()
+        return len(new_rows)
+
+    def _record(self, row, field, value):
+        """Journal an edit, compacting into the table every so often."""
+        self._journal.append(row, field, value)
+        if self._journal.pending >= self.COMPACT_EVERY:
+            self._save_master_async()
+
+    def _save_master_sync(self):
+        segments = self._journal.rotate()
+        # The table is not touched while we wait, so no copy is needed.
+        self._writer.submit(
+            self.annotation_df,
+            on_written=functools.partial(self._journal.discard, segments),
+        )
+        self._writer.flush()
+
+    def _save_master_async(self):
+        segments = self._journal.rotate()
+        self._writer.submit(
+            self.annotation_df.copy(),
+            on_written=functools.partial(self._journal.discard, segments),
+        )
 
     # ----- key callbacks (napari passes the viewer) -----
     def _cycle_class_up(self, viewer=None):
@@ -470,6 +696,15 @@ class PanopticAnnotatorWidget(QWidget):
     def _previous_file_key(self, viewer=None):
         self.previous_file()
 
+    def _next_unannotated_key(self, viewer=None):
+        self.next_unannotated()
+
+    def _toggle_flag_key(self, viewer=None):
+        self.toggle_flag()
+
+    def _next_flagged_key(self, viewer=None):
+        self.next_flagged()
+
     def _save_key(self, viewer=None):
         self.save_annotations()
 
@@ -477,6 +712,10 @@ class PanopticAnnotatorWidget(QWidget):
         for key in self._bound_keys:
             with contextlib.suppress(Exception):
                 self.viewer.bind_key(key, None, overwrite=True)
-        if self._pending_write:
+        self._prefetcher.shutdown()
+        self.thumbnails.close()
+        if self._writer.pending or self._journal.pending:
             self._save_master_sync()
+        self._writer.close()
+        self._journal.close()
         super().closeEvent(event)
@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    """Load items ahead of time on a small worker pool.
+
+    ``loader`` is called with a key on a worker thread. Results are kept until
+    ``take`` is called for that key, or until the key drops out of the window
+    passed to ``schedule``.
+    """
+
+    def __init__(self, loader, workers=2):
+        self._loader = loader
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, int(workers)),
+            thread_name_prefix="towbintools-prefetch",
+        )
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, keys):
+        """Make ``keys`` the prefetch window, nearest first.
+
+        Pending loads for keys outside the window are cancelled and their
+        results released.
+        """
+        keys = list(dict.fromkeys(keys))
+        wanted = set(keys)
+        with self._lock:
+            for key in list(self._futures):
+                if key not in wanted:
+                    self._futures.pop(key).cancel()
+            for key in keys:
+                if key not in self._futures:
+                    self._futures[key] = self._executor.submit(
+                        self._loader, key
+                    )
+
+    def take(self, key):
+        """Return the prefetched result for ``key``, or ``None``.
+
+        Waits if the load is still running. ``None`` means the key was never
+        scheduled or its load failed; the caller should load synchronously.
+        """
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception:  # noqa: BLE001
+            return None
+
+    def clear(self):
+        self.schedule(())
+
+    def shutdown(self):
+        self.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
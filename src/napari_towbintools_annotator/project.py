@@ -1,7 +1,18 @@
+import numpy as np
 import yaml
 
+from .image_io import default_cache_bytes
+from .image_stats import DEFAULT_SAMPLE_SIZE
+from .refresh import find_new_rows
+from .storage import check_storage_format
+
 
 class Project:
+    # Image types whose stacks are opened lazily unless overridden.
+    LAZY_IMAGE_TYPES = ("zstack", "time_series")
+    # Values of the non-path columns of rows added by ``refresh``.
+    NEW_ROW_DEFAULTS = {}
+
     def __init__(
         self,
         name: str,
@@ -11,7 +22,15 @@ class Project:
         data_directories: list,
         project_dir: str,
         ignored_images: list = None,
+        lazy_loading: bool = None,
+        contrast_sample_size: int = DEFAULT_SAMPLE_SIZE,
+        pyramids: bool = False,
+        image_cache_mb: int = None,
     ):
+        if contrast_sample_size < 0:
+            raise ValueError("contrast_sample_size must be non-negative.")
+        if image_cache_mb is not None and image_cache_mb <= 0:
+            raise ValueError("image_cache_mb must be positive.")
         self.name = name
         self.image_type = image_type
         self.project_type = project_type
@@ -19,6 +38,64 @@ class Project:
         self.data_directories = data_directories
         self.project_dir = project_dir
         self.ignored_images = ignored_images
+        self.lazy_loading = lazy_loading
+        # Pixels sampled to measure an image's contrast limits; 0 uses all.
+        self.contrast_sample_size = contrast_sample_size
+        # Whether large 2D images have multiscale pyramids to display.
+        self.pyramids = pyramids
+        # Budget of the decoded-image cache in MiB; None derives it from
+        # the machine's RAM (see :meth:`cache_bytes`).
+        self.image_cache_mb = image_cache_mb
+
+    def uses_lazy_loading(self):
+        """Whether images should be opened lazily instead of fully decoded.
+
+        An explicit ``lazy_loading`` setting wins; otherwise it follows the
+        image type.
+        """
+        if self.lazy_loading is not None:
+            return bool(self.lazy_loading)
+        return self.image_type in self.LAZY_IMAGE_TYPES
+
+    def cache_bytes(self):
+        """Budget of the decoded-image cache of an annotator of this project.
+
+        Each annotator widget has a cache of its own. Files prefetched by
+        the panoptic annotator are only held by that cache, so prefetching
+        never takes memory beyond the budget; for it to pay off the budget
+        has to cover the current file and its ``prefetch_ahead +
+        prefetch_behind`` neighbours (reference and segmentation each).
+        Lazily opened images are not cached.
+        """
+        if self.image_cache_mb is not None:
+            return int(self.image_cache_mb) * 1024**2
+        return default_cache_bytes()
+
+    def _refresh_sides(self):
+        raise NotImplementedError(
+            f"Refreshing {self.project_type} projects is not supported."
+        )
+
+    def refresh(self, annotation_df):
+        """Return rows for files added to the project directories.
+
+        Only directories modified since the last refresh are listed (see
+        :func:`refresh.find_new_rows`); files already in ``annotation_df``
+        or in ``ignored_images`` are left out. The directory snapshot is
+        updated in memory: append the rows to the table, write it, then
+        :meth:`save` the project.
+        """
+        new_rows, self.directory_snapshot = find_new_rows(
+            annotation_df,
+            self._refresh_sides(),
+            self.directory_snapshot,
+            extensions=self.file_extensions,
+            pattern=self.pairing_pattern,
+            exclude=self.ignored_images or (),
+        )
+        for column, value in self.NEW_ROW_DEFAULTS.items():
+            new_rows[column] = value
+        return new_rows
 
     def __str__(self):
         return (
@@ -56,6 +133,7 @@ class Project:
 
 class ClassificationProject(Project):
     VALID_DISPLAY_MODES = ("image", "mask", "both")
+    NEW_ROW_DEFAULTS = {"Class": np.nan}
 
     def __init__(
         self,
@@ -69,12 +147,22 @@ class ClassificationProject(Project):
         mask_directories: list = None,
         display_mode: str = "image",
         ignored_images: list = None,
+        lazy_loading: bool = None,
+        contrast_sample_size: int = DEFAULT_SAMPLE_SIZE,
+        pyramids: bool = False,
+        storage_format: str = "csv",
+        image_cache_mb: int = None,
+        file_extensions: list = None,
+        pairing_pattern: str = None,
+        directory_snapshot: dict = None,
     ):
         if not classes:
             raise ValueError(
                 "Classes must be provided for classification projects."
             )
 
+        check_storage_format(storage_format)
+
         if display_mode not in self.VALID_DISPLAY_MODES:
             raise ValueError(
                 f"display_mode must be one of {self.VALID_DISPLAY_MODES}, got '{display_mode}'."
@@ -98,12 +186,28 @@ class ClassificationProject(Project):
             data_directories=data_directories or [],
             project_dir=project_dir,
             ignored_images=ignored_images,
+            lazy_loading=lazy_loading,
+            contrast_sample_size=contrast_sample_size,
+            pyramids=pyramids,
+            image_cache_mb=image_cache_mb,
         )
 
         self.annotation_df_path = annotation_df_path
+        self.storage_format = storage_format
         self.classes = classes
         self.mask_directories = mask_directories or []
         self.display_mode = display_mode
+        self.file_extensions = file_extensions
+        self.pairing_pattern = pairing_pattern
+        self.directory_snapshot = directory_snapshot or {}
+
+    def _refresh_sides(self):
+        sides = []
+        if self.display_mode in ("image", "both"):
+            sides.append(("ImagePath", self.data_directories))
+        if self.display_mode in ("mask", "both"):
+            sides.append(("MaskPath", self.mask_directories))
+        return sides
 
     def save(self):
         project_data = {
@@ -112,12 +216,20 @@ class ClassificationProject(Project):
             "project_type": self.project_type,
             "annotation_directories": self.annotation_directories,
             "annotation_df_path": self.annotation_df_path,
+            "storage_format": self.storage_format,
             "data_directories": self.data_directories,
             "project_dir": self.project_dir,
             "ignored_images": self.ignored_images,
+            "lazy_loading": self.lazy_loading,
+            "contrast_sample_size": self.contrast_sample_size,
+            "pyramids": self.pyramids,
+            "image_cache_mb": self.image_cache_mb,
             "classes": self.classes,
             "mask_directories": self.mask_directories,
             "display_mode": self.display_mode,
+            "file_extensions": self.file_extensions,
+            "pairing_pattern": self.pairing_pattern,
+            "directory_snapshot": self.directory_snapshot,
         }
 
         with open(f"{self.project_dir}/project.yaml", "w") as file:
@@ -130,16 +242,28 @@ class ClassificationProject(Project):
             image_type=project_data["image_type"],
             annotation_directories=project_data["annotation_directories"],
             annotation_df_path=project_data["annotation_df_path"],
+            storage_format=project_data.get("storage_format", "csv"),
             data_directories=project_data["data_directories"],
             project_dir=project_dir,
             classes=project_data.get("classes", []),
             mask_directories=project_data.get("mask_directories", []),
             display_mode=project_data.get("display_mode", "image"),
             ignored_images=project_data.get("ignored_images", []),
+            lazy_loading=project_data.get("lazy_loading"),
+            contrast_sample_size=project_data.get(
+                "contrast_sample_size", DEFAULT_SAMPLE_SIZE
+            ),
+            pyramids=project_data.get("pyramids", False),
+            image_cache_mb=project_data.get("image_cache_mb"),
+            file_extensions=project_data.get("file_extensions"),
+            pairing_pattern=project_data.get("pairing_pattern"),
+            directory_snapshot=project_data.get("directory_snapshot", {}),
         )
 
 
 class PanopticProject(Project):
+    NEW_ROW_DEFAULTS = {"Annotation": ""}
+
     def __init__(
         self,
         name: str,
@@ -151,11 +275,27 @@ class PanopticProject(Project):
         data_directories: list = None,
         mask_directories: list = None,
         ignored_images: list = None,
+        lazy_loading: bool = None,
+        contrast_sample_size: int = DEFAULT_SAMPLE_SIZE,
+        pyramids: bool = False,
+        storage_format: str = "csv",
+        prefetch_ahead: int = 2,
+        prefetch_behind: int = 1,
+        prefetch_workers: int = 2,
+        image_cache_mb: int = None,
+        file_extensions: list = None,
+        pairing_pattern: str = None,
+        directory_snapshot: dict = None,
     ):
         if not classes:
             raise ValueError(
                 "Classes must be provided for panoptic projects."
             )
+        check_storage_format(storage_format)
+        if prefetch_ahead < 0 or prefetch_behind < 0:
+            raise ValueError("Prefetch depths must be non-negative.")
+        if prefetch_workers < 1:
+            raise ValueError("prefetch_workers must be at least 1.")
         if not data_directories:
             raise ValueError(
                 "data_directories must be provided for panoptic projects."
@@ -173,11 +313,28 @@ class PanopticProject(Project):
             data_directories=data_directories or [],
             project_dir=project_dir,
             ignored_images=ignored_images,
+            lazy_loading=lazy_loading,
+            contrast_sample_size=contrast_sample_size,
+            pyramids=pyramids,
+            image_cache_mb=image_cache_mb,
         )
 
         self.annotation_df_path = annotation_df_path
+        self.storage_format = storage_format
         self.classes = classes
         self.mask_directories = mask_directories or []
+        self.prefetch_ahead = prefetch_ahead
+        self.prefetch_behind = prefetch_behind
+        self.prefetch_workers = prefetch_workers
+        self.file_extensions = file_extensions
+        self.pairing_pattern = pairing_pattern
+        self.directory_snapshot = directory_snapshot or {}
+
+    def _refresh_sides(self):
+        return [
+            ("Reference", self.data_directories),
+            ("Segmentation", self.mask_directories),
+        ]
 
     def save(self):
         project_data = {
@@ -186,11 +343,22 @@ class PanopticProject(Project):
             "project_type": self.project_type,
             "annotation_directories": self.annotation_directories,
             "annotation_df_path": self.annotation_df_path,
+            "storage_format": self.storage_format,
             "data_directories": self.data_directories,
             "project_dir": self.project_dir,
             "ignored_images": self.ignored_images,
+            "lazy_loading": self.lazy_loading,
+            "contrast_sample_size": self.contrast_sample_size,
+            "pyramids": self.pyramids,
+            "image_cache_mb": self.image_cache_mb,
             "classes": self.classes,
             "mask_directories": self.mask_directories,
+            "prefetch_ahead": self.prefetch_ahead,
+            "prefetch_behind": self.prefetch_behind,
+            "prefetch_workers": self.prefetch_workers,
+            "file_extensions": self.file_extensions,
+            "pairing_pattern": self.pairing_pattern,
+            "directory_snapshot": self.directory_snapshot,
         }
 
         with open(f"{self.project_dir}/project.yaml", "w") as file:
@@ -203,9 +371,22 @@ class PanopticProject(Project):
             image_type=project_data["image_type"],
             annotation_directories=project_data["annotation_directories"],
             annotation_df_path=project_data["annotation_df_path"],
+            storage_format=project_data.get("storage_format", "csv"),
             data_directories=project_data["data_directories"],
             project_dir=project_dir,
             classes=project_data.get("classes", []),
             mask_directories=project_data.get("mask_directories", []),
             ignored_images=project_data.get("ignored_images", []),
+            lazy_loading=project_data.get("lazy_loading"),
+            contrast_sample_size=project_data.get(
+                "contrast_sample_size", DEFAULT_SAMPLE_SIZE
+            ),
+            pyramids=project_data.get("pyramids", False),
+            image_cache_mb=project_data.get("image_cache_mb"),
+            prefetch_ahead=project_data.get("prefetch_ahead", 2),
+            prefetch_behind=project_data.get("prefetch_behind", 1),
+            prefetch_workers=project_data.get("prefetch_workers", 2),
+            file_extensions=project_data.get("file_extensions"),
+            pairing_pattern=project_data.get("pairing_pattern"),
+            directory_snapshot=project_data.get("directory_snapshot", {}),
         )
@@ -1,16 +1,15 @@
 import datetime
 import os
-import shutil
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 from napari_guitils.gui_structures import VHGroup
-from natsort import natsorted
 from qtpy.QtCore import QThread, QTimer, Signal
 from qtpy.QtWidgets import (
     QButtonGroup,
     QCheckBox,
+    QComboBox,
     QFileDialog,
     QHBoxLayout,
     QLabel,
@@ -25,8 +24,18 @@ from qtpy.QtWidgets import (
 )
 
 from .classification_annotator import ClassificationAnnotatorWidget
+from .copying import copy_message, copy_trees, format_bytes
+from .pairing import compile_pattern, pair_or_raise
 from .panoptic_annotator import PanopticAnnotatorWidget
 from .project import ClassificationProject, PanopticProject, Project
+from .pyramids import PYRAMID_DIR, PYRAMID_MESSAGE, build_pyramids
+from .scanning import (
+    iter_scan,
+    normalize_extensions,
+    scan_files,
+    status_progress,
+)
+from .storage import read_table, table_filename, write_table
 
 
 def convert_path_to_dir_name(path):
@@ -36,34 +45,68 @@ def convert_path_to_dir_name(path):
     return path
 
 
-def scan_panoptic_files(data_directories, mask_directories):
+def scan_panoptic_files(
+    data_directories,
+    mask_directories,
+    extensions=None,
+    progress=None,
+    pattern=None,
+    allow_unmatched=False,
+    report=None,
+):
     """Scan reference and segmentation directories for a panoptic project.
 
-    Returns ``(reference_files, segmentation_files)`` as natsorted absolute
-    paths. Raises ``ValueError`` if the counts do not match.
+    References and segmentations are paired on their file stems, less a
+    segmentation suffix such as ``_seg`` (or on the tokens captured by ``pattern``, see :func:`pairing.pairing_key`),
+    within corresponding directories when there are as many of each (see
+    :func:`pairing.directory_groups`).
+    Returns ``(reference_files, segmentation_files)`` as paired absolute
+    paths in natural order. Raises ``ValueError`` if some files cannot be
+    paired, unless ``allow_unmatched`` is set.
     """
-    reference_files = natsorted(
-        [
-            os.path.join(d, f)
-            for d in data_directories
-            for f in os.listdir(d)
-            if os.path.isfile(os.path.join(d, f))
-        ]
+    reference_files = scan_files(
+        data_directories, extensions=extensions, progress=progress
     )
-    segmentation_files = natsorted(
-        [
-            os.path.join(d, f)
-            for d in mask_directories
-            for f in os.listdir(d)
-            if os.path.isfile(os.path.join(d, f))
-        ]
+    segmentation_files = scan_files(
+        mask_directories, extensions=extensions, progress=progress
+    )
+    return pair_or_raise(
+        reference_files,
+        segmentation_files,
+        pattern=pattern,
+        allow_unmatched=allow_unmatched,
+        report=report,
+        directories=(data_directories, mask_directories),
     )
-    if len(reference_files) != len(segmentation_files):
-        raise ValueError(
-            f"File count mismatch: {len(reference_files)} reference files vs "
-            f"{len(segmentation_files)} segmentation files."
-        )
-    return reference_files, segmentation_files
+
+
+def _stored_extensions(extensions):
+    extensions = normalize_extensions(extensions)
+    return sorted(extensions) if extensions else None
+
+
+def stream_classification_csv(
+    path, column, directories, extensions=None, progress=None
+):
+    """Write a single-path-column classification table while scanning.
+
+    Rows of each directory are appended as soon as it has been listed, so
+    the file list of a large dataset is never held in memory at once.
+    Returns the number of rows written.
+    """
+    n_rows = 0
+    with open(path, "w", newline="") as file:
+        pd.DataFrame(columns=[column, "Class"]).to_csv(file, index=False)
+        for _, files in iter_scan(
+            directories, extensions=extensions, progress=progress
+        ):
+            if not files:
+                continue
+            pd.DataFrame({column: files, "Class": np.nan}).to_csv(
+                file, index=False, header=False
+            )
+            n_rows += len(files)
+    return n_rows
 
 
 class ProjectCreationWorker(QThread):
@@ -303,6 +346,32 @@ class ProjectCreatorWidget(QWidget):
             self.project_dir_selection_layout
         )
 
+        self.extension_filter_input = QLineEdit()
+        self.extension_filter_input.setPlaceholderText(
+            "File extensions, e.g. tif, png (empty: all files)"
+        )
+        self.dir_selection_layout.glayout.addWidget(
+            self.extension_filter_input
+        )
+
+        self.pairing_pattern_input = QLineEdit()
+        self.pairing_pattern_input.setPlaceholderText(
+            "Pairing pattern (regex, optional), e.g. (\\w\\d+)_t(\\d+)"
+        )
+        self.pairing_pattern_input.setToolTip(
+            "Images and masks are paired on their file names. A pattern "
+            "pairs them on its captured groups only (e.g. well and time "
+            "point), ignoring the rest of the name."
+        )
+        self.allow_unmatched_checkbox = QCheckBox(
+            "Skip files without a counterpart"
+        )
+        self.dir_selection_layout.glayout.addWidget(self.pairing_pattern_input)
+        self.dir_selection_layout.glayout.addWidget(
+            self.allow_unmatched_checkbox
+        )
+        self._toggle_pairing_options()
+
         self.project_creation_layout.addWidget(self.dir_selection_layout.gbox)
 
         # --- Classification-specific options ---
@@ -339,7 +408,66 @@ class ProjectCreatorWidget(QWidget):
         )
         self.classification_options_layout.gbox.setVisible(True)
 
+        self.storage_format_group = VHGroup(
+            "Annotation Storage", orientation="G"
+        )
+        self.storage_format_selector = QButtonGroup()
+        self.storage_format_csv = QRadioButton("CSV")
+        self.storage_format_csv.setChecked(True)
+        self.storage_format_parquet = QRadioButton("Parquet")
+        self.storage_format_feather = QRadioButton("Arrow (Feather)")
+
+        self.storage_format_selector.addButton(self.storage_format_csv)
+        self.storage_format_selector.addButton(self.storage_format_parquet)
+        self.storage_format_selector.addButton(self.storage_format_feather)
+
+        self.storage_format_csv.setToolTip(
+            "Plain CSV table, readable anywhere"
+        )
+        self.storage_format_parquet.setToolTip(
+            "Compressed columnar table, fastest to load for large projects "
+            "(requires pyarrow)"
+        )
+        self.storage_format_feather.setToolTip(
+            "Uncompressed columnar table (requires pyarrow)"
+        )
+
+        self.storage_format_group.glayout.addWidget(self.storage_format_csv)
+        self.storage_format_group.glayout.addWidget(
+            self.storage_format_parquet
+        )
+        self.storage_format_group.glayout.addWidget(
+            self.storage_format_feather
+        )
+        self.project_creation_layout.addWidget(self.storage_format_group.gbox)
+
         self.copy_data_checkbox = QCheckBox("Copy data to project directory")
+        self.copy_mode_selector = QComboBox()
+        self.copy_mode_selector.addItem("Copy files", "copy")
+        self.copy_mode_selector.addItem("Reflink when possible", "reflink")
+        self.copy_mode_selector.addItem("Hardlink when possible", "hardlink")
+        self.copy_mode_selector.setToolTip(
+            "Reflinks and hardlinks avoid duplicating data when the project "
+            "is on the same filesystem as the source; hardlinked files share "
+            "their contents with the source."
+        )
+        self.copy_checksum_checkbox = QCheckBox(
+            "Verify existing copies with checksums"
+        )
+        self.copy_checksum_checkbox.setToolTip(
+            "When resuming a copy, compare file contents instead of size "
+            "and modification time."
+        )
+        self.copy_data_checkbox.toggled.connect(self._toggle_copy_options)
+        self._toggle_copy_options(False)
+        self.pyramids_checkbox = QCheckBox(
+            "Build multiscale pyramids for large 2D images"
+        )
+        self.pyramids_checkbox.setToolTip(
+            "Store downsampled copies of large 2D images in the project "
+            "directory so the annotators can display them as multiscale "
+            "layers. Segmentations are downsampled without mixing labels."
+        )
         self.create_button = QPushButton("Create Project")
         self.cancel_button = QPushButton("Cancel")
         self.status_label = QLabel("")
@@ -348,10 +476,17 @@ class ProjectCreatorWidget(QWidget):
         self.cancel_button.clicked.connect(self.cancel_creation)
 
         self.project_creation_layout.addWidget(self.copy_data_checkbox)
+        self.project_creation_layout.addWidget(self.copy_mode_selector)
+        self.project_creation_layout.addWidget(self.copy_checksum_checkbox)
+        self.project_creation_layout.addWidget(self.pyramids_checkbox)
         self.project_creation_layout.addWidget(self.create_button)
         self.project_creation_layout.addWidget(self.cancel_button)
         self.project_creation_layout.addWidget(self.status_label)
 
+    def _toggle_copy_options(self, checked):
+        self.copy_mode_selector.setVisible(checked)
+        self.copy_checksum_checkbox.setVisible(checked)
+
     def toggle_project_type_options(self):
         is_classification = self.project_type_classification.isChecked()
         is_panoptic = self.project_type_panoptic.isChecked()
@@ -360,6 +495,8 @@ class ProjectCreatorWidget(QWidget):
             is_classification or is_panoptic
         )
         self.display_mode_group.gbox.setVisible(is_classification)
+        self.toggle_storage_format_options()
+        self._toggle_pairing_options()
 
         if is_panoptic:
             # Panoptic always needs references (images) and segmentations.
@@ -380,6 +517,22 @@ class ProjectCreatorWidget(QWidget):
         self.data_selection_widget.setVisible(
             not self.display_mode_mask.isChecked()
         )
+        self._toggle_pairing_options()
+
+    def _toggle_pairing_options(self):
+        pairs_files = self.project_type_panoptic.isChecked() or (
+            self.project_type_classification.isChecked()
+            and self.display_mode_both.isChecked()
+        )
+        self.pairing_pattern_input.setVisible(pairs_files)
+        self.allow_unmatched_checkbox.setVisible(pairs_files)
+
+    def toggle_storage_format_options(self):
+        uses_table = (
+            self.project_type_classification.isChecked()
+            or self.project_type_panoptic.isChecked()
+        )
+        self.storage_format_group.gbox.setVisible(uses_table)
 
     def _add_class(self):
         class_name = self.class_input.text().strip()
@@ -498,6 +651,25 @@ class ProjectCreatorWidget(QWidget):
             return "both"
         return "image"
 
+    def _get_storage_format(self):
+        if self.storage_format_parquet.isChecked():
+            return "parquet"
+        if self.storage_format_feather.isChecked():
+            return "feather"
+        return "csv"
+
+    def _get_pairing(self):
+        return {
+            "pattern": self.pairing_pattern_input.text().strip() or None,
+            "allow_unmatched": self.allow_unmatched_checkbox.isChecked(),
+        }
+
+    def _get_copy_options(self):
+        return {
+            "link_mode": self.copy_mode_selector.currentData(),
+            "checksum": self.copy_checksum_checkbox.isChecked(),
+        }
+
     def _show_error(self, message):
         msg = QMessageBox(self)
         msg.setIcon(QMessageBox.Critical)
@@ -513,7 +685,17 @@ class ProjectCreatorWidget(QWidget):
 
         image_type = self._get_selected_image_type()
         project_type = self._get_selected_project_type()
+        storage_format = self._get_storage_format()
+        extensions = self.extension_filter_input.text().strip() or None
         copy_data = self.copy_data_checkbox.isChecked()
+        copy_options = self._get_copy_options()
+        pairing = self._get_pairing()
+        pyramids = self.pyramids_checkbox.isChecked()
+        try:
+            compile_pattern(pairing["pattern"])
+        except ValueError as error:
+            self._show_error(str(error))
+            return
 
         project_dir = os.path.join(
             self.project_dir[0] if self.project_dir else Path.home(),
@@ -542,6 +724,11 @@ class ProjectCreatorWidget(QWidget):
                     classes,
                     copy_data,
                     status,
+                    storage_format=storage_format,
+                    extensions=extensions,
+                    copy_options=copy_options,
+                    pairing=pairing,
+                    pyramids=pyramids,
                 )
 
         elif project_type == "panoptic":
@@ -568,6 +755,11 @@ class ProjectCreatorWidget(QWidget):
                     classes,
                     copy_data,
                     status,
+                    storage_format=storage_format,
+                    extensions=extensions,
+                    copy_options=copy_options,
+                    pairing=pairing,
+                    pyramids=pyramids,
                 )
 
         else:
@@ -582,6 +774,7 @@ class ProjectCreatorWidget(QWidget):
                     data_directories,
                     copy_data,
                     status,
+                    copy_options=copy_options,
                 )
 
         self.create_button.setEnabled(False)
@@ -618,6 +811,11 @@ class ProjectCreatorWidget(QWidget):
         classes,
         copy_data,
         status,
+        storage_format="csv",
+        extensions=None,
+        copy_options=None,
+        pairing=None,
+        pyramids=False,
     ):
         os.makedirs(project_dir, exist_ok=True)
         annotations_save_dir = os.path.join(project_dir, "annotations")
@@ -628,54 +826,72 @@ class ProjectCreatorWidget(QWidget):
             os.makedirs(local_data_dir, exist_ok=True)
             status.emit("Copying data...")
             data_directories = self._copy_data_directories_static(
-                data_directories, local_data_dir, status
+                data_directories, local_data_dir, status, copy_options
             )
 
-        mask_files = []
-        if display_mode in ("mask", "both") and mask_directories:
-            status.emit("Scanning mask files...")
-            mask_files = natsorted(
-                [
-                    os.path.join(d, f)
-                    for d in mask_directories
-                    for f in os.listdir(d)
-                    if os.path.isfile(os.path.join(d, f))
-                ]
+        annotation_df_path = os.path.join(
+            annotations_save_dir, table_filename(storage_format)
+        )
+        single_column = {"image": "ImagePath", "mask": "MaskPath"}
+        if storage_format == "csv" and display_mode in single_column:
+            directories = (
+                mask_directories
+                if display_mode == "mask"
+                else data_directories
             )
-
-        if display_mode == "mask":
-            annotation_df_data = {
-                "MaskPath": mask_files,
-                "Class": [np.nan] * len(mask_files),
-            }
-        else:
-            status.emit("Scanning image files...")
-            data_files = natsorted(
-                [
-                    os.path.join(d, f)
-                    for d in data_directories
-                    for f in os.listdir(d)
-                    if os.path.isfile(os.path.join(d, f))
-                ]
+            stream_classification_csv(
+                annotation_df_path,
+                single_column[display_mode],
+                directories,
+                extensions=extensions,
+                progress=status_progress(status, display_mode + " files"),
             )
-            if display_mode == "both" and len(data_files) != len(mask_files):
-                raise ValueError(
-                    f"File count mismatch: {len(data_files)} image files vs "
-                    f"{len(mask_files)} mask files."
+        else:
+            mask_files = []
+            if display_mode in ("mask", "both") and mask_directories:
+                mask_files = scan_files(
+                    mask_directories,
+                    extensions=extensions,
+                    progress=status_progress(status, "mask files"),
                 )
-            annotation_df_data = {
-                "ImagePath": data_files,
-                "Class": [np.nan] * len(data_files),
-            }
-            if mask_files:
-                annotation_df_data["MaskPath"] = mask_files
 
-        status.emit("Writing annotation file...")
-        annotation_df = pd.DataFrame(annotation_df_data)
-        annotation_df_path = os.path.join(
-            annotations_save_dir, "annotations.csv"
-        )
-        annotation_df.to_csv(annotation_df_path, index=False)
+            if display_mode == "mask":
+                annotation_df_data = {
+                    "MaskPath": mask_files,
+                    "Class": [np.nan] * len(mask_files),
+                }
+            else:
+                data_files = scan_files(
+                    data_directories,
+                    extensions=extensions,
+                    progress=status_progress(status, "image files"),
+                )
+                if display_mode == "both":
+                    data_files, mask_files = pair_or_raise(
+                        data_files,
+                        mask_files,
+                        labels=("image", "mask"),
+                        report=status.emit,
+                        directories=(data_directories, mask_directories),
+                        **(pairing or {}),
+                    )
+                annotation_df_data = {
+                    "ImagePath": data_files,
+                    "Class": [np.nan] * len(data_files),
+                }
+                if mask_files:
+                    annotation_df_data["MaskPath"] = mask_files
+
+            status.emit("Writing annotation file...")
+            write_table(pd.DataFrame(annotation_df_data), annotation_df_path)
+
+        if pyramids:
+            self._build_pyramids_static(
+                annotation_df_path,
+                project_dir,
+                {"ImagePath": False, "MaskPath": True},
+                status,
+            )
 
         project = ClassificationProject(
             name=project_name,
@@ -689,6 +905,10 @@ class ProjectCreatorWidget(QWidget):
             display_mode=display_mode,
             classes=classes,
             project_dir=project_dir,
+            pyramids=pyramids,
+            storage_format=storage_format,
+            file_extensions=_stored_extensions(extensions),
+            pairing_pattern=(pairing or {}).get("pattern"),
         )
         project.save()
         return project_dir
@@ -703,6 +923,11 @@ class ProjectCreatorWidget(QWidget):
         classes,
         copy_data,
         status,
+        storage_format="csv",
+        extensions=None,
+        copy_options=None,
+        pairing=None,
+        pyramids=False,
     ):
         os.makedirs(project_dir, exist_ok=True)
         annotations_save_dir = os.path.join(project_dir, "annotations")
@@ -713,19 +938,23 @@ class ProjectCreatorWidget(QWidget):
             os.makedirs(local_data_dir, exist_ok=True)
             status.emit("Copying reference data...")
             data_directories = self._copy_data_directories_static(
-                data_directories, local_data_dir, status
+                data_directories, local_data_dir, status, copy_options
             )
 
             local_seg_dir = os.path.join(project_dir, "segmentations")
             os.makedirs(local_seg_dir, exist_ok=True)
             status.emit("Copying segmentation data...")
             mask_directories = self._copy_data_directories_static(
-                mask_directories, local_seg_dir, status
+                mask_directories, local_seg_dir, status, copy_options
             )
 
-        status.emit("Scanning files...")
         reference_files, segmentation_files = scan_panoptic_files(
-            data_directories, mask_directories
+            data_directories,
+            mask_directories,
+            extensions=extensions,
+            progress=status_progress(status),
+            report=status.emit,
+            **(pairing or {}),
         )
 
         status.emit("Writing annotation file...")
@@ -737,9 +966,16 @@ class ProjectCreatorWidget(QWidget):
             }
         )
         annotation_df_path = os.path.join(
-            annotations_save_dir, "annotations.csv"
+            annotations_save_dir, table_filename(storage_format)
         )
-        annotation_df.to_csv(annotation_df_path, index=False)
+        write_table(annotation_df, annotation_df_path)
+        if pyramids:
+            self._build_pyramids_static(
+                annotation_df_path,
+                project_dir,
+                {"Reference": False, "Segmentation": True},
+                status,
+            )
 
         project = PanopticProject(
             name=project_name,
@@ -752,6 +988,10 @@ class ProjectCreatorWidget(QWidget):
             mask_directories=mask_directories,
             classes=classes,
             project_dir=project_dir,
+            pyramids=pyramids,
+            storage_format=storage_format,
+            file_extensions=_stored_extensions(extensions),
+            pairing_pattern=(pairing or {}).get("pattern"),
         )
         project.save()
         return project_dir
@@ -765,6 +1005,7 @@ class ProjectCreatorWidget(QWidget):
         data_directories,
         copy_data,
         status,
+        copy_options=None,
     ):
         os.makedirs(project_dir, exist_ok=True)
         annotations_save_dir = os.path.join(project_dir, "annotations")
@@ -788,7 +1029,7 @@ class ProjectCreatorWidget(QWidget):
             os.makedirs(local_data_dir, exist_ok=True)
             status.emit("Copying data...")
             data_directories = self._copy_data_directories_static(
-                data_directories, local_data_dir, status
+                data_directories, local_data_dir, status, copy_options
             )
 
         project = Project(
@@ -802,18 +1043,56 @@ class ProjectCreatorWidget(QWidget):
         project.save()
         return project_dir
 
+    @staticmethod
+    def _build_pyramids_static(
+        annotation_df_path, project_dir, columns, status
+    ):
+        """Build the pyramids of the files listed in the annotation table.
+
+        ``columns`` maps each path column to whether it holds label images.
+        """
+        table = read_table(annotation_df_path)
+        pyramid_dir = os.path.join(project_dir, PYRAMID_DIR)
+        for column, labels in columns.items():
+            if column not in table.columns:
+                continue
+            paths = table[column].dropna().astype(str)
+            built = build_pyramids(
+                paths,
+                pyramid_dir,
+                labels=labels,
+                progress=status_progress(status, column, PYRAMID_MESSAGE),
+            )
+            status.emit(f"Built {built} pyramids of {column} files.")
+
     @staticmethod
     def _copy_data_directories_static(
-        data_directories, local_data_dir, status
+        data_directories, local_data_dir, status, copy_options=None
     ):
-        for data_dir in data_directories:
-            if os.path.isdir(data_dir):
-                dest_dir = os.path.join(
+        pairs = [
+            (
+                data_dir,
+                os.path.join(
                     local_data_dir, convert_path_to_dir_name(data_dir)
-                )
-                if not os.path.exists(dest_dir):
-                    status.emit(f"Copying {os.path.basename(data_dir)}...")
-                    shutil.copytree(data_dir, dest_dir)
+                ),
+            )
+            for data_dir in data_directories
+            if os.path.isdir(data_dir)
+        ]
+        # Files already copied by an earlier, possibly interrupted, run are
+        # kept; everything else is (re)copied.
+        result = copy_trees(
+            pairs,
+            progress=status_progress(
+                status, message=copy_message, interval=0.25
+            ),
+            **(copy_options or {}),
+        )
+        status.emit(
+            f"Copied {result['copied']} files "
+            f"({format_bytes(result['bytes'])}), "
+            f"{result['skipped']} already present."
+        )
 
         return [
             os.path.join(local_data_dir, d)
@@ -0,0 +1,169 @@
+import json
+import os
+
+import numpy as np
+import tifffile
+
+from .image_io import is_rgb, read_image
+from .storage import atomic_path, sidecar_name, source_signature
+
+# Directory of the project holding the pyramids.
+PYRAMID_DIR = "pyramids"
+# Images whose larger side exceeds this get a pyramid.
+PYRAMID_MIN_SIZE = 4096
+# Levels are halved until the larger side is at most this.
+PYRAMID_TOP_SIZE = 1024
+# Status message of a pyramid build, see :func:`scanning.status_progress`.
+PYRAMID_MESSAGE = "Building pyramids of {label}: {0}/{1}..."
+# Rows of the output level downsampled at a time, bounding memory use.
+_BLOCK_ROWS = 1024
+
+# Bump when the stored levels or their meaning change.
+_PYRAMID_VERSION = 1
+
+
+def is_pyramid_candidate(shape, min_size=PYRAMID_MIN_SIZE):
+    """Whether an image of ``shape`` is 2D (or RGB) and large enough."""
+    if len(shape) != 2 and not is_rgb(shape):
+        return False
+    return max(shape[:2]) > min_size
+
+
+def downsample(image, labels=False):
+    """Halve the first two axes of ``image``.
+
+    Intensity images are averaged over 2x2 blocks. Label images take the
+    top-left pixel of each block (nearest neighbour), so every value in the
+    result is a label ID of the input. Odd trailing rows and columns are
+    dropped. Works through ``image`` in row blocks, so a memory-mapped
+    input is never fully loaded.
+    """
+    height, width = image.shape[0] // 2, image.shape[1] // 2
+    rest = image.shape[2:]
+    out = np.empty((height, width, *rest), dtype=image.dtype)
+    for start in range(0, height, _BLOCK_ROWS):
+        stop = min(start + _BLOCK_ROWS, height)
+        block = np.asarray(image[2 * start : 2 * stop, : 2 * width])
+        if labels:
+            out[start:stop] = block[::2, ::2]
+            continue
+        mean = block.reshape(stop - start, 2, width, 2, *rest).mean(
+            axis=(1, 3), dtype=np.float64
+        )
+        if np.issubdtype(image.dtype, np.integer):
+            mean = np.rint(mean)
+        out[start:stop] = mean.astype(image.dtype)
+    return out
+
+
+def pyramid_path(image_path, pyramid_dir):
+    """Path of the pyramid of ``image_path`` in ``pyramid_dir``."""
+    return os.path.join(pyramid_dir, f"{sidecar_name(image_path)}.pyramid.tif")
+
+
+def _signature(image_path, labels):
+    return {
+        "version": _PYRAMID_VERSION,
+        "source": list(source_signature(image_path)),
+        "labels": bool(labels),
+    }
+
+
+def _open_source(image_path):
+    """Memory-map ``image_path`` when possible, otherwise decode it."""
+    try:
+        return tifffile.memmap(image_path, mode="r")
+    except Exception:  # noqa: BLE001
+        return read_image(image_path)
+
+
+def _source_shape(image_path):
+    """Shape of an image read from its TIFF header, or ``None``."""
+    try:
+        with tifffile.TiffFile(image_path) as tif:
+            return tuple(tif.series[0].shape)
+    except Exception:  # noqa: BLE001
+        return None
+
+
+def write_pyramid(
+    image_path,
+    pyramid_dir,
+    labels=False,
+    min_size=PYRAMID_MIN_SIZE,
+    top_size=PYRAMID_TOP_SIZE,
+):
+    """Build the pyramid of one image, unless it is current or not needed.
+
+    Levels are stored full size first as the pages of an uncompressed
+    multi-page TIFF, so each one can be memory-mapped. Returns the pyramid
+    path, or ``None`` for images that are too small or not 2D. TIFFs are
+    only decoded when their header shows they qualify.
+    """
+    shape = _source_shape(image_path)
+    if shape is not None and not is_pyramid_candidate(shape, min_size):
+        return None
+    path = pyramid_path(image_path, pyramid_dir)
+    if read_pyramid(image_path, pyramid_dir, labels) is not None:
+        return path
+    level = _open_source(image_path)
+    if not is_pyramid_candidate(level.shape, min_size):
+        return None
+
+    os.makedirs(pyramid_dir, exist_ok=True)
+    photometric = "rgb" if is_rgb(level.shape) else "minisblack"
+    with (
+        atomic_path(path) as tmp_path,
+        tifffile.TiffWriter(tmp_path, bigtiff=True) as tif,
+    ):
+        tif.write(
+            level,
+            photometric=photometric,
+            metadata=None,
+            description=json.dumps(_signature(image_path, labels)),
+        )
+        while max(level.shape[:2]) > top_size:
+            level = downsample(level, labels)
+            tif.write(level, photometric=photometric, metadata=None)
+    return path
+
+
+def read_pyramid(image_path, pyramid_dir, labels=False):
+    """Return the memory-mapped levels of an image's pyramid.
+
+    Returns ``None`` when there is no pyramid or it was built from an older
+    version of the image.
+    """
+    path = pyramid_path(image_path, pyramid_dir)
+    try:
+        with tifffile.TiffFile(path) as tif:
+            description = tif.pages[0].description
+            n_levels = len(tif.pages)
+        if json.loads(description) != _signature(image_path, labels):
+            return None
+        return [
+            tifffile.memmap(path, page=page, mode="r")
+            for page in range(n_levels)
+        ]
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def build_pyramids(paths, pyramid_dir, labels=False, progress=None):
+    """Build the pyramids of ``paths``; returns the number of pyramids.
+
+    ``progress(done, total)`` is called after each image.
+    """
+    built = 0
+    paths = list(paths)
+    for done, image_path in enumerate(paths, start=1):
+        if write_pyramid(image_path, pyramid_dir, labels) is not None:
+            built += 1
+        if progress is not None:
+            progress(done, len(paths))
+    return built
+
+
+def base_level(data):
+    """Full-resolution array of ``data``, multiscale or not."""
+    return data[0] if isinstance(data, list) else data
@@ -0,0 +1,99 @@
+import hashlib
+import os
+
+import pandas as pd
+
+from .pairing import pair_files
+from .scanning import iter_scan
+
+
+def listing_digest(files):
+    """Hash of the file names of one directory listing."""
+    digest = hashlib.sha1()
+    for path in files:
+        digest.update(
+            os.path.basename(path).encode("utf-8", "surrogateescape")
+        )
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _directory_mtimes(directories):
+    mtimes = {}
+    for directory in directories:
+        try:
+            mtimes[directory] = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            continue
+    return mtimes
+
+
+def find_new_rows(
+    annotation_df,
+    sides,
+    snapshot,
+    extensions=None,
+    pattern=None,
+    exclude=(),
+):
+    """Find files added to a project's directories since ``snapshot``.
+
+    ``sides`` lists ``(column, directories)``: one entry for single-column
+    tables, or two (e.g. references and segmentations) whose new files are
+    paired with :func:`pairing.pair_files`. ``snapshot`` maps each
+    directory to the ``mtime_ns`` and listing digest of its last scan.
+    Directories whose modification time is unchanged are not listed at all;
+    files already in ``annotation_df`` or in ``exclude`` are skipped.
+
+    Returns ``(new_rows, new_snapshot)``. Paired sides are rescanned as a
+    whole when any of their directories changed, so a file whose
+    counterpart appears later is still picked up.
+    """
+    snapshot = snapshot or {}
+    columns = [column for column, _ in sides]
+    directories = [d for _, dirs in sides for d in dirs]
+    mtimes = _directory_mtimes(directories)
+    changed = {
+        d
+        for d, mtime in mtimes.items()
+        if snapshot.get(d, {}).get("mtime_ns") != mtime
+    }
+    new_snapshot = {d: snapshot[d] for d in mtimes if d in snapshot}
+    if not changed:
+        return pd.DataFrame(columns=columns), new_snapshot
+
+    paired = len(sides) > 1
+    candidates = []
+    for column, side_directories in sides:
+        to_scan = [
+            d
+            for d in side_directories
+            if d in mtimes and (paired or d in changed)
+        ]
+        known = set(exclude)
+        if column in annotation_df.columns:
+            known.update(annotation_df[column])
+        files = []
+        for directory, listed in iter_scan(to_scan, extensions=extensions):
+            digest = listing_digest(listed)
+            unchanged = snapshot.get(directory, {}).get("digest") == digest
+            new_snapshot[directory] = {
+                "mtime_ns": mtimes[directory],
+                "files": len(listed),
+                "digest": digest,
+            }
+            if unchanged and not paired:
+                continue
+            files.extend(path for path in listed if path not in known)
+        candidates.append(files)
+
+    if paired:
+        first, second, _, _ = pair_files(
+            *candidates,
+            pattern=pattern,
+            directories=[dirs for _, dirs in sides],
+        )
+        new_rows = pd.DataFrame({columns[0]: first, columns[1]: second})
+    else:
+        new_rows = pd.DataFrame({columns[0]: candidates[0]})
+    return new_rows, new_snapshot
@@ -0,0 +1,123 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from natsort import natsorted
+
+# Upper bound on concurrent directory listings.
+MAX_SCAN_WORKERS = 32
+# Status message of a scan, see :func:`status_progress`.
+SCAN_MESSAGE = "Scanning {label}: {0}/{1} directories, {2} files found..."
+
+
+def normalize_extensions(extensions):
+    """Turn ``"tif, .PNG"`` or ``["tif", ".png"]`` into ``{".tif", ".png"}``.
+
+    Returns ``None`` (no filtering) for empty input.
+    """
+    if not extensions:
+        return None
+    if isinstance(extensions, str):
+        extensions = extensions.replace(";", ",").split(",")
+    normalized = set()
+    for extension in extensions:
+        extension = extension.strip().lower()
+        if not extension:
+            continue
+        normalized.add(
+            extension if extension.startswith(".") else f".{extension}"
+        )
+    return normalized or None
+
+
+def scan_directory(directory, extensions=None):
+    """Return the natsorted file paths directly inside ``directory``.
+
+    Uses ``os.scandir`` so file types come from the directory listing
+    instead of one ``stat`` call per entry. ``extensions`` is a set of
+    lower-case suffixes such as ``{".tif"}``; ``None`` keeps every file.
+    """
+    names = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if extensions is not None and (
+                os.path.splitext(entry.name)[1].lower() not in extensions
+            ):
+                continue
+            if entry.is_file():
+                names.append(entry.name)
+    return [os.path.join(directory, name) for name in natsorted(names)]
+
+
+def iter_scan(directories, extensions=None, workers=None, progress=None):
+    """Scan ``directories`` in parallel, yielding ``(directory, files)``.
+
+    Directories are listed concurrently (one worker per directory, up to
+    ``MAX_SCAN_WORKERS``) and yielded in natural order as soon as each one
+    and all before it are done, so callers can stream rows out while later
+    directories are still being listed. ``progress(done, total, n_files)``
+    is called after each directory.
+    """
+    # Sort on the directory with a trailing separator so the concatenated
+    # output matches a natsort of the full file paths.
+    directories = natsorted(directories, key=lambda d: os.path.join(d, ""))
+    extensions = normalize_extensions(extensions)
+    if not directories:
+        return
+    if workers is None:
+        workers = min(len(directories), MAX_SCAN_WORKERS)
+    n_files = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(scan_directory, directory, extensions)
+            for directory in directories
+        ]
+        for done, (directory, future) in enumerate(
+            zip(directories, futures, strict=True), start=1
+        ):
+            files = future.result()
+            n_files += len(files)
+            if progress is not None:
+                progress(done, len(directories), n_files)
+            yield directory, files
+
+
+def scan_files(directories, extensions=None, workers=None, progress=None):
+    """Return the files of every directory, directory by directory."""
+    return [
+        path
+        for _, files in iter_scan(directories, extensions, workers, progress)
+        for path in files
+    ]
+
+
+def status_progress(
+    status, label="files", message=SCAN_MESSAGE, interval=None
+):
+    """Adapt a Qt ``status`` signal to a ``progress`` callback.
+
+    The callback's arguments, the first two of which are always ``(done,
+    total)``, are formatted into ``message`` along with ``label``;
+    ``message`` may also be a function of those arguments. With
+    ``interval``, messages are emitted at most every ``interval`` seconds,
+    plus once when ``done`` reaches ``total``.
+    """
+    last = [-math.inf]
+    lock = threading.Lock()
+
+    def progress(done, total, *detail):
+        if interval is not None:
+            now = time.monotonic()
+            with lock:
+                if done < total and now - last[0] < interval:
+                    return
+                last[0] = now
+        if callable(message):
+            text = message(done, total, *detail)
+        else:
+            text = message.format(done, total, *detail, label=label)
+        status.emit(text)
+
+    return progress
@@ -0,0 +1,258 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+# Per-row annotation states.
+UNANNOTATED = 0
+ANNOTATED = 1
+IGNORED = 2
+
+_EMPTY_VALUES = ("", "nan", "None")
+
+
+def is_empty(values):
+    """Vectorised check for unset annotation cells (NaN, "", "nan")."""
+    values = pd.Series(values, dtype=object)
+    return values.isna().to_numpy() | (
+        values.astype(str).str.strip().isin(_EMPTY_VALUES).to_numpy()
+    )
+
+
+class RowIndex:
+    """Sorted row ids per key, for jumping to the next matching row.
+
+    Adding or removing a row is a bisect into the list of its key, so the
+    index follows every edit without rescanning the table.
+    """
+
+    def __init__(self, rows=None):
+        self._rows = rows or {}
+
+    @classmethod
+    def from_keys(cls, keys, skip=()):
+        """Index an array holding one key per row, leaving out ``skip``."""
+        keys = np.asarray(keys)
+        return cls(
+            {
+                key.item(): np.flatnonzero(keys == key).tolist()
+                for key in np.unique(keys)
+                if key.item() not in skip
+            }
+        )
+
+    def rows(self, key):
+        return self._rows.get(key, [])
+
+    def add(self, key, row):
+        rows = self._rows.setdefault(key, [])
+        i = bisect.bisect_left(rows, row)
+        if i == len(rows) or rows[i] != row:
+            rows.insert(i, row)
+
+    def discard(self, key, row):
+        rows = self._rows.get(key, [])
+        i = bisect.bisect_left(rows, row)
+        if i < len(rows) and rows[i] == row:
+            del rows[i]
+
+    def extend(self, key, rows):
+        """Add ``rows``, all past the last row indexed so far."""
+        self._rows.setdefault(key, []).extend(rows)
+
+    def next_after(self, key, row):
+        """First row of ``key`` after ``row``, wrapping around."""
+        rows = self.rows(key)
+        if not rows:
+            return None
+        i = bisect.bisect_right(rows, row)
+        return rows[i] if i < len(rows) else rows[0]
+
+
+class AnnotationStatus:
+    """State and class of every row of an annotation table.
+
+    ``state`` holds one of ``UNANNOTATED``, ``ANNOTATED`` or ``IGNORED``
+    per row and ``class_ids`` the index of the assigned class (``-1`` for
+    none), both as small integers, and ``flagged`` marks rows set aside
+    for review. All are built once, vectorised, from the table; :meth:`set`
+    and :meth:`set_flag` then update a row, the running counts and the
+    :class:`RowIndex` used for navigation in (at worst) a bisect.
+    """
+
+    def __init__(self, state, class_ids=None, n_classes=0, flagged=None):
+        self.state = np.asarray(state, dtype=np.int8).copy()
+        if class_ids is None:
+            class_ids = np.full(len(self.state), -1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int16).copy()
+        if flagged is None:
+            flagged = np.zeros(len(self.state), dtype=bool)
+        self.flagged = np.asarray(flagged, dtype=bool).copy()
+        self.n_classes = n_classes
+        self._recount()
+
+    @classmethod
+    def from_values(cls, values, classes=(), ignored=None, flagged=None):
+        """Build the status of a column of annotation values.
+
+        Values found in ``classes`` get their class index; any other
+        non-empty value counts as annotated without a class.
+        """
+        values = pd.Series(values, dtype=object)
+        class_ids = pd.Index(list(classes), dtype=object).get_indexer(
+            values.astype(str).str.strip()
+        )
+        state = np.where(is_empty(values), UNANNOTATED, ANNOTATED)
+        if ignored is not None:
+            state[np.asarray(ignored, dtype=bool)] = IGNORED
+        return cls(state, class_ids, n_classes=len(classes), flagged=flagged)
+
+    def _recount(self):
+        self.state_counts = np.bincount(self.state, minlength=3)
+        annotated = self.class_ids[
+            (self.state == ANNOTATED) & (self.class_ids >= 0)
+        ]
+        self.class_counts = np.bincount(annotated, minlength=self.n_classes)
+        self._state_rows = RowIndex.from_keys(self.state)
+        self._class_rows = RowIndex.from_keys(
+            np.where(self.state == ANNOTATED, self.class_ids, -1), skip=(-1,)
+        )
+        self._flag_rows = RowIndex.from_keys(self.flagged, skip=(False,))
+
+    def __len__(self):
+        return len(self.state)
+
+    def set(self, row, state=None, class_id=None):
+        """Update one row, keeping the counts in step."""
+        old_state, old_class = self.state[row], self.class_ids[row]
+        new_state = old_state if state is None else state
+        new_class = old_class if class_id is None else class_id
+        self.state_counts[old_state] -= 1
+        self.state_counts[new_state] += 1
+        self._state_rows.discard(int(old_state), row)
+        self._state_rows.add(int(new_state), row)
+        if old_state == ANNOTATED and old_class >= 0:
+            self.class_counts[old_class] -= 1
+            self._class_rows.discard(int(old_class), row)
+        if new_state == ANNOTATED and new_class >= 0:
+            self.class_counts[new_class] += 1
+            self._class_rows.add(int(new_class), row)
+        self.state[row] = new_state
+        self.class_ids[row] = new_class
+
+    def set_many(self, rows, state, class_id=-1):
+        """Give every row in ``rows`` the same state and class.
+
+        Counts are updated with one vectorised pass; the navigation index
+        still takes a bisect per row.
+        """
+        rows = np.unique(np.asarray(rows, dtype=np.intp))
+        old_states = self.state[rows]
+        old_classes = self.class_ids[rows]
+        self.state_counts -= np.bincount(old_states, minlength=3)
+        self.state_counts[state] += len(rows)
+        had_class = (old_states == ANNOTATED) & (old_classes >= 0)
+        self.class_counts -= np.bincount(
+            old_classes[had_class], minlength=self.n_classes
+        )
+        gets_class = state == ANNOTATED and class_id >= 0
+        if gets_class:
+            self.class_counts[class_id] += len(rows)
+        for row, old_state, old_class in zip(
+            rows.tolist(),
+            old_states.tolist(),
+            old_classes.tolist(),
+            strict=True,
+        ):
+            self._state_rows.discard(old_state, row)
+            self._state_rows.add(state, row)
+            if old_state == ANNOTATED and old_class >= 0:
+                self._class_rows.discard(old_class, row)
+            if gets_class:
+                self._class_rows.add(class_id, row)
+        self.state[rows] = state
+        self.class_ids[rows] = class_id
+
+    def set_flag(self, row, flagged):
+        self.flagged[row] = flagged
+        if flagged:
+            self._flag_rows.add(True, row)
+        else:
+            self._flag_rows.discard(True, row)
+
+    def is_ignored(self, row):
+        return self.state[row] == IGNORED
+
+    def append(self, n):
+        """Add ``n`` unannotated rows at the end."""
+        start = len(self.state)
+        self.state = np.concatenate([self.state, np.zeros(n, np.int8)])
+        self.class_ids = np.concatenate(
+            [self.class_ids, np.full(n, -1, np.int16)]
+        )
+        self.flagged = np.concatenate([self.flagged, np.zeros(n, bool)])
+        self.state_counts[UNANNOTATED] += n
+        self._state_rows.extend(UNANNOTATED, range(start, start + n))
+
+    def compact(self, keep):
+        """Keep only the rows selected by the boolean mask ``keep``."""
+        self.state = self.state[keep]
+        self.class_ids = self.class_ids[keep]
+        self.flagged = self.flagged[keep]
+        self._recount()
+
+    @property
+    def n_annotated(self):
+        return int(self.state_counts[ANNOTATED])
+
+    @property
+    def n_ignored(self):
+        return int(self.state_counts[IGNORED])
+
+    @property
+    def n_active(self):
+        """Rows that are not ignored."""
+        return len(self.state) - self.n_ignored
+
+    @property
+    def n_flagged(self):
+        return len(self._flag_rows.rows(True))
+
+    def first(self, state):
+        """First row in ``state``, or ``None``."""
+        rows = self._state_rows.rows(state)
+        return rows[0] if rows else None
+
+    def last(self, state):
+        """Last row in ``state``, or ``None``."""
+        rows = self._state_rows.rows(state)
+        return rows[-1] if rows else None
+
+    def next_row(self, row, state):
+        """First row in ``state`` after ``row``, wrapping around."""
+        return self._state_rows.next_after(state, row)
+
+    def next_of_class(self, row, class_id):
+        """First row annotated as ``class_id`` after ``row``, wrapping."""
+        return self._class_rows.next_after(class_id, row)
+
+    def next_flagged(self, row):
+        """First flagged row after ``row``, wrapping around."""
+        return self._flag_rows.next_after(True, row)
+
+    def summary(self, classes=()):
+        """Progress text such as ``"12/40 annotated (a: 7, b: 5)"``."""
+        text = f"{self.n_annotated}/{self.n_active} annotated"
+        if classes:
+            per_class = ", ".join(
+                f"{name}: {count}"
+                for name, count in zip(
+                    classes, self.class_counts, strict=False
+                )
+            )
+            text += f" ({per_class})"
+        if self.n_ignored:
+            text += f", {self.n_ignored} ignored"
+        if self.n_flagged:
+            text += f", {self.n_flagged} flagged"
+        return text
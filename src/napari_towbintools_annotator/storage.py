@@ -0,0 +1,407 @@
+import contextlib
+import glob
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Annotation table formats and the file extension each is stored under.
+STORAGE_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".arrow"}
+
+# Columns holding file paths. Columnar formats store them as a
+# dictionary-encoded directory plus a plain file name.
+PATH_COLUMNS = (
+    "ImagePath",
+    "MaskPath",
+    "Reference",
+    "Segmentation",
+    "Annotation",
+)
+_DIR_SUFFIX = "__dir"
+_NAME_SUFFIX = "__name"
+
+
+def check_storage_format(storage_format):
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(
+            f"storage_format must be one of {tuple(STORAGE_FORMATS)}, "
+            f"got '{storage_format}'."
+        )
+
+
+def table_filename(storage_format):
+    """File name of the master annotation table for ``storage_format``."""
+    check_storage_format(storage_format)
+    return f"annotations{STORAGE_FORMATS[storage_format]}"
+
+
+def table_format(path):
+    """Storage format of an annotation table, from its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    for storage_format, format_extension in STORAGE_FORMATS.items():
+        if extension == format_extension:
+            return storage_format
+    if extension == ".feather":
+        return "feather"
+    return "csv"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as error:
+        raise ImportError(
+            "Parquet and Arrow annotation tables require pyarrow; install "
+            "it with `pip install napari-towbintools-annotator[columnar]`."
+        ) from error
+
+
+def _split_path_columns(df):
+    df = df.copy()
+    for column in PATH_COLUMNS:
+        if column not in df.columns:
+            continue
+        position = df.columns.get_loc(column)
+        parts = (
+            df.pop(column)
+            .fillna("")
+            .astype(str)
+            .str.extract(r"^(?P<dir>.*[/\\])?(?P<name>[^/\\]*)$")
+        )
+        df.insert(
+            position,
+            column + _DIR_SUFFIX,
+            parts["dir"].fillna("").astype("category"),
+        )
+        df.insert(position + 1, column + _NAME_SUFFIX, parts["name"])
+    return df
+
+
+def _join_path_columns(df):
+    for column in PATH_COLUMNS:
+        dir_column = column + _DIR_SUFFIX
+        if dir_column not in df.columns:
+            continue
+        position = df.columns.get_loc(dir_column)
+        directories = df.pop(dir_column).astype("category")
+        names = df.pop(column + _NAME_SUFFIX).fillna("").astype(str)
+        # Join per directory once, then expand through the category codes.
+        prefixes = np.asarray(directories.cat.categories, dtype=object)
+        codes = directories.cat.codes.to_numpy()
+        joined = np.where(
+            codes < 0, "", prefixes[np.maximum(codes, 0)]
+        ) + names.to_numpy(dtype=object)
+        df.insert(position, column, pd.Series(joined, index=df.index))
+    return df
+
+
+def read_table(path):
+    """Read an annotation table in any supported format."""
+    storage_format = table_format(path)
+    if storage_format == "csv":
+        return pd.read_csv(path)
+    _require_pyarrow()
+    if storage_format == "parquet":
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_feather(path)
+    return _join_path_columns(df)
+
+
+def write_table(df, path):
+    """Write an annotation table in the format implied by ``path``."""
+    storage_format = table_format(path)
+    if storage_format == "csv":
+        df.to_csv(path, index=False)
+        return
+    _require_pyarrow()
+    columnar = _split_path_columns(df).reset_index(drop=True)
+    if storage_format == "parquet":
+        columnar.to_parquet(path, index=False)
+    else:
+        columnar.to_feather(path)
+
+
+def convert_table(src_path, dst_path):
+    """Convert an annotation table between formats, e.g. to import a CSV."""
+    write_table_atomic(read_table(src_path), dst_path)
+
+
+def _read_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once at import: os.umask can only be read by setting it, which
+# would race with files created by other threads.
+_UMASK = _read_umask()
+
+
+def _file_mode(path):
+    """Permission bits for a file written over ``path``.
+
+    Those of the file it replaces, or the ``0o666 & ~umask`` a plain
+    ``open`` gives a new file, rather than the ``0o600`` of ``mkstemp``.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """Context manager yielding a temporary path to write ``path`` through.
+
+    The temporary file sits next to ``path`` with the same extension, and
+    is moved over ``path`` when the block exits without error. On error it
+    is removed, so readers (and a crash mid-write) never see a partially
+    written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    extension = os.path.splitext(path)[1]
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory,
+        prefix=f".{os.path.basename(path)}.",
+        suffix=f".tmp{extension}",
+    )
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def sidecar_name(path):
+    """Stem of ``path`` followed by a checksum of its absolute path.
+
+    Files derived from data files (label indexes, statistics, pyramids,
+    exports) are named with it, so data files with the same basename in
+    different directories do not collide.
+    """
+    path = os.path.abspath(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return f"{name}.{zlib.crc32(path.encode('utf-8')):08x}"
+
+
+def source_signature(path):
+    """``(mtime_ns, size)`` of ``path``, stored to detect stale sidecars."""
+    stat_result = os.stat(path)
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def write_table_atomic(df, path):
+    """Write ``df`` to ``path`` through a temporary file and a rename.
+
+    Readers (and a crash mid-write) never see a partially written table.
+    """
+    with atomic_path(path) as tmp_path:
+        write_table(df, tmp_path)
+
+
+class SnapshotWriter:
+    """Single background thread writing snapshots of one annotation table.
+
+    Snapshots submitted while a write is in progress are coalesced: only the
+    most recent one is written, and the callbacks of the snapshots it
+    supersedes run after it. Each snapshot is written atomically with
+    :func:`write_table_atomic`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._cond = threading.Condition()
+        self._snapshot = None
+        self._callbacks = []
+        self._writing = False
+        self._closed = False
+        self._error = None
+        self.writes = 0
+        self._thread = threading.Thread(
+            target=self._run, name="towbintools-writer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def pending(self):
+        with self._cond:
+            return self._snapshot is not None or self._writing
+
+    def submit(self, snapshot, on_written=None):
+        """Queue ``snapshot`` for writing, replacing any queued snapshot.
+
+        ``snapshot`` must not be modified until it has been written; pass a
+        copy unless the caller waits with :meth:`flush`.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SnapshotWriter is closed.")
+            self._snapshot = snapshot
+            if on_written is not None:
+                self._callbacks.append(on_written)
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every submitted snapshot is on disk.
+
+        Re-raises the error of a failed write. Returns ``False`` on timeout.
+        """
+        with self._cond:
+            done = self._cond.wait_for(
+                lambda: self._snapshot is None and not self._writing,
+                timeout=timeout,
+            )
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+        return done
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._snapshot is not None or self._closed
+                )
+                if self._snapshot is None:
+                    return
+                snapshot, self._snapshot = self._snapshot, None
+                callbacks, self._callbacks = self._callbacks, []
+                self._writing = True
+            try:
+                write_table_atomic(snapshot, self.path)
+                for callback in callbacks:
+                    callback()
+            except Exception as error:  # noqa: BLE001
+                with self._cond:
+                    self._error = error
+            finally:
+                with self._cond:
+                    self.writes += 1
+                    self._writing = False
+                    self._cond.notify_all()
+
+
+class AnnotationJournal:
+    """Append-only log of cell edits made to an annotation table.
+
+    Every edit is written as one JSON line ``{"row", "field", "value",
+    "time"}`` to a journal segment next to the table, so recording a click
+    costs a single small append instead of rewriting the table. The table is
+    compacted by writing a snapshot and then discarding the segments that the
+    snapshot already contains (see :meth:`rotate` and :meth:`discard`).
+    Segments left behind by a crash are replayed on load.
+    """
+
+    def __init__(self, table_path):
+        self.table_path = table_path
+        self._lock = threading.Lock()
+        self._file = None
+        self.pending = 0
+        segments = self.segments()
+        self._seq = self._segment_seq(segments[-1]) + 1 if segments else 0
+
+    def _segment_path(self, seq):
+        return f"{self.table_path}.journal.{seq:06d}"
+
+    @staticmethod
+    def _segment_seq(path):
+        return int(path.rsplit(".", 1)[1])
+
+    def segments(self):
+        """Existing journal segments, oldest first."""
+        paths = glob.glob(glob.escape(self.table_path) + ".journal.*")
+        paths = [p for p in paths if p.rsplit(".", 1)[1].isdigit()]
+        return sorted(paths, key=self._segment_seq)
+
+    def append(self, row, field, value):
+        event = {
+            "row": int(row),
+            "field": field,
+            "value": value,
+            "time": time.time(),
+        }
+        line = json.dumps(event) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(  # noqa: SIM115
+                    self._segment_path(self._seq), "a", encoding="utf-8"
+                )
+            self._file.write(line)
+            self._file.flush()
+            self.pending += 1
+
+    def rotate(self):
+        """Close the current segment and return every segment written so far.
+
+        Call this at the moment a snapshot of the table is taken: the
+        returned segments are fully contained in that snapshot and can be
+        passed to :meth:`discard` once it is on disk. Later edits go to a
+        new segment.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._seq += 1
+            self.pending = 0
+            return [
+                p for p in self.segments() if self._segment_seq(p) < self._seq
+            ]
+
+    @staticmethod
+    def discard(segments):
+        for path in segments:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def events(self):
+        """Yield the recorded events of every segment, oldest first.
+
+        A truncated last line (e.g. from a crash mid-write) is skipped.
+        """
+        for path in self.segments():
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+    def replay(self, df):
+        """Apply the recorded events to ``df`` in place.
+
+        Returns the number of events applied. Events for rows that no
+        longer exist are ignored.
+        """
+        applied = 0
+        n_rows = len(df)
+        for event in self.events():
+            row = event["row"]
+            if 0 <= row < n_rows:
+                df.at[row, event["field"]] = event["value"]
+                applied += 1
+        return applied
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,437 @@
+import collections
+import contextlib
+import hashlib
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    BrokenExecutor,
+    ProcessPoolExecutor,
+    wait,
+)
+
+import numpy as np
+
+from .image_io import is_rgb, open_lazy, read_image
+from .storage import atomic_path, source_signature
+
+# Directory of the annotation folder holding the thumbnail atlas.
+ATLAS_DIR = "thumbnails"
+# Longest side of a thumbnail, in pixels.
+THUMBNAIL_SIZE = 128
+# Slots added at a time when the atlas grows, and copied at a time when it
+# is compacted.
+_GROW_SLOTS = 1024
+
+# Bump when the stored thumbnails or their meaning change.
+_ATLAS_VERSION = 2
+
+
+def representative_plane(data):
+    """The 2D (or RGB) plane at the middle of every leading axis."""
+    while data.ndim > 2 and not is_rgb(data.shape):
+        data = data[data.shape[0] // 2]
+    return data
+
+
+def make_thumbnail(data, size=THUMBNAIL_SIZE):
+    """An 8-bit thumbnail of ``data`` whose longest side is at most ``size``.
+
+    The plane is strided down, so memory-mapped and lazily opened images
+    only read the pixels kept, and stretched between its 0.5 and 99.5
+    percentiles. 8-bit RGB planes are kept as they are.
+    """
+    plane = representative_plane(data)
+    step = max(1, math.ceil(max(plane.shape[:2]) / size))
+    plane = np.asarray(plane[::step, ::step])
+    if is_rgb(plane.shape) and plane.dtype == np.uint8:
+        return np.ascontiguousarray(plane)
+    plane = plane.astype(np.float32)
+    finite = plane[np.isfinite(plane)]
+    if finite.size == 0:
+        return np.zeros(plane.shape, dtype=np.uint8)
+    low, high = np.percentile(finite, (0.5, 99.5))
+    scale = 255.0 / (high - low) if high > low else 0.0
+    plane = np.nan_to_num((plane - low) * scale, nan=0.0)
+    return np.clip(plane, 0, 255).astype(np.uint8)
+
+
+def grey_thumbnail(thumbnail):
+    """Collapse an RGB(A) thumbnail to grey; grey ones are returned as is."""
+    if thumbnail.ndim == 2:
+        return thumbnail
+    return thumbnail[..., :3].mean(axis=-1).round().astype(np.uint8)
+
+
+def path_key(path):
+    """64-bit key of the absolute path of ``path``."""
+    digest = hashlib.blake2b(
+        os.path.abspath(path).encode("utf-8"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+_INDEX_DTYPE = np.dtype(
+    [
+        ("key", "<i8"),
+        ("mtime", "<i8"),
+        ("bytes", "<i8"),
+        ("height", "<i2"),
+        ("width", "<i2"),
+    ]
+)
+
+
+class ThumbnailAtlas:
+    """Grey thumbnails of a project's images in memory-mapped files.
+
+    Thumbnails are kept in slots, one per image: the index file holds each
+    slot's path key, the image's mtime and size when the thumbnail was made
+    and the thumbnail's shape (height 0 while missing), and the tile file
+    the thumbnail itself in the top-left corner of a ``size`` x ``size``
+    tile. Slots are appended as images get a thumbnail, growing both files
+    in place. Rows of ``paths`` are mapped to slots in memory only, so
+    :meth:`remap` never touches the files; the slots of dropped rows are
+    reclaimed by :meth:`compact`.
+    """
+
+    def __init__(self, directory, paths, size=THUMBNAIL_SIZE):
+        self.directory = directory
+        self.size = size
+        stem = os.path.join(directory, f"atlas.v{_ATLAS_VERSION}.{size}")
+        self.index_path = f"{stem}.index"
+        self.tiles_path = f"{stem}.tiles"
+        self._tile_bytes = size * size
+        self._lock = threading.Lock()
+        # Path keys by path, so remapping only hashes new paths.
+        self._key_of = {}
+        self._keys = np.zeros(0, dtype=np.int64)
+        with self._lock:
+            self._open()
+        self.remap(paths)
+
+    def __len__(self):
+        return len(self._keys)
+
+    # ----- files -----
+    def _open(self):
+        """Map the atlas files, or start empty ones if they do not match."""
+        try:
+            n_index = os.path.getsize(self.index_path) // _INDEX_DTYPE.itemsize
+            n_tiles = os.path.getsize(self.tiles_path) // self._tile_bytes
+        except OSError:
+            n_index = n_tiles = 0
+        if n_index == 0 or n_tiles < n_index:
+            # Missing, or torn by a crash while compacting.
+            os.makedirs(self.directory, exist_ok=True)
+            for path in (self.index_path, self.tiles_path):
+                with open(path, "wb"):
+                    pass
+            n_index = 0
+        self._map_files(n_index)
+        self._checked = np.zeros(n_index, dtype=bool)
+        used = np.flatnonzero(self._index["key"])
+        self._used = int(used[-1]) + 1 if len(used) else 0
+        keys = self._index["key"][: self._used].tolist()
+        self._slot_of = {key: slot for slot, key in enumerate(keys) if key}
+        self._slots = self._lookup_slots(self._keys)
+
+    def _map_files(self, capacity):
+        self._capacity = capacity
+        if capacity == 0:
+            # numpy cannot memory-map an empty file.
+            self._index = np.zeros(0, dtype=_INDEX_DTYPE)
+            self._tiles = np.zeros((0, self.size, self.size), dtype=np.uint8)
+            return
+        self._index = np.memmap(
+            self.index_path, dtype=_INDEX_DTYPE, mode="r+", shape=capacity
+        )
+        self._tiles = np.memmap(
+            self.tiles_path,
+            dtype=np.uint8,
+            mode="r+",
+            shape=(capacity, self.size, self.size),
+        )
+
+    def _grow(self):
+        """Add ``_GROW_SLOTS`` empty slots at the end of both files."""
+        capacity = self._capacity + _GROW_SLOTS
+        self.flush()
+        self._index = self._tiles = None
+        # Tiles first: a torn growth leaves more tiles than index records,
+        # which :meth:`_open` accepts.
+        os.truncate(self.tiles_path, capacity * self._tile_bytes)
+        os.truncate(self.index_path, capacity * _INDEX_DTYPE.itemsize)
+        self._map_files(capacity)
+        self._checked = np.concatenate(
+            [self._checked, np.zeros(_GROW_SLOTS, dtype=bool)]
+        )
+
+    # ----- rows -----
+    def _lookup_slots(self, keys):
+        slot_of = self._slot_of
+        return np.fromiter(
+            (slot_of.get(key, -1) for key in keys.tolist()),
+            dtype=np.int64,
+            count=len(keys),
+        )
+
+    def remap(self, paths):
+        """Re-key the atlas to a new path list, keeping known thumbnails.
+
+        Only the in-memory row mapping changes: paths not seen before are
+        hashed, and nothing is read from or written to the files.
+        """
+        keys = np.empty(len(paths), dtype=np.int64)
+        key_of = self._key_of
+        for row, path in enumerate(paths):
+            key = key_of.get(path)
+            if key is None:
+                key = key_of[path] = path_key(path)
+            keys[row] = key
+        with self._lock:
+            self._keys = keys
+            self._slots = self._lookup_slots(keys)
+            self._remapped = True
+
+    def get(self, row):
+        """The thumbnail of ``row``, or ``None`` if it was not made yet.
+
+        The thumbnail is not checked against the image here; the loader
+        does so in the background and replaces it when stale.
+        """
+        with self._lock:
+            if not 0 <= row < len(self._keys) or self._slots[row] < 0:
+                return None
+            slot = self._slots[row]
+            record = self._index[slot]
+            height, width = int(record["height"]), int(record["width"])
+            if height == 0:
+                return None
+            return np.array(self._tiles[slot, :height, :width])
+
+    def is_current(self, row, path):
+        """Whether ``row`` holds a thumbnail of the current ``path``."""
+        with self._lock:
+            slot = self._slots[row]
+            if self._keys[row] != path_key(path) or slot < 0:
+                return False
+            if self._checked[slot]:
+                return True
+            record = self._index[slot]
+            made = record["height"] > 0
+            signature = (int(record["mtime"]), int(record["bytes"]))
+        current = made and signature == source_signature(path)
+        with self._lock:
+            if self._slots[row] == slot:
+                self._checked[slot] = current
+        return current
+
+    def put(self, row, path, thumbnail, signature):
+        """Store the thumbnail of ``path`` made from an image ``signature``.
+
+        Returns ``False`` if ``row`` no longer belongs to ``path``.
+        """
+        key = path_key(path)
+        with self._lock:
+            if not 0 <= row < len(self._keys) or self._keys[row] != key:
+                return False
+            slot = self._slot_of.get(key)
+            if slot is None:
+                if self._used == self._capacity:
+                    self._grow()
+                slot = self._used
+                self._used += 1
+                self._slot_of[key] = slot
+                self._slots[self._keys == key] = slot
+                self._index[slot]["key"] = key
+            record = self._index[slot]
+            # Marked missing while rewritten, so a reader never sees a
+            # half-written thumbnail as made.
+            record["height"] = 0
+            height, width = thumbnail.shape
+            self._tiles[slot, :height, :width] = thumbnail
+            record["mtime"], record["bytes"] = signature
+            record["width"] = width
+            record["height"] = height
+            self._checked[slot] = True
+            return True
+
+    def compact(self, min_unused=0.5):
+        """Drop the slots of images no longer in the rows, if worth it.
+
+        Runs when more than ``min_unused`` of the slots, and at least
+        ``_GROW_SLOTS``, belong to no row. The used slots are copied to new
+        files without holding the lock, so :meth:`get` is not held up; only
+        the swap to the new files is. Meant for the loader's thread, the
+        only one adding slots. Returns whether the atlas was compacted.
+        """
+        with self._lock:
+            if not self._remapped or self._used < _GROW_SLOTS:
+                return False
+            self._remapped = False
+            slots = self._slots.copy()
+            used = self._used
+        live = np.unique(slots[slots >= 0])
+        if used - len(live) < max(_GROW_SLOTS, min_unused * used):
+            return False
+        with self._lock:
+            index, tiles = self._index, self._tiles
+        locked = False
+        try:
+            # The inner block exits first: the tiles are replaced before
+            # the index, so a crash in between leaves too few tiles and
+            # the atlas starts over.
+            with (
+                atomic_path(self.index_path) as index_tmp,
+                atomic_path(self.tiles_path) as tiles_tmp,
+            ):
+                self._copy_slots(live, index, tiles, index_tmp, tiles_tmp)
+                del index, tiles
+                self._lock.acquire()
+                locked = True
+                # Unmap the old files; Windows cannot replace a mapped file.
+                self.flush()
+                self._index = self._tiles = None
+        finally:
+            if locked:
+                try:
+                    self._open()
+                finally:
+                    self._lock.release()
+        return True
+
+    def _copy_slots(self, live, index, tiles, index_path, tiles_path):
+        if len(live) == 0:
+            # Left empty; numpy cannot memory-map an empty file.
+            return
+        new_index = np.memmap(
+            index_path, dtype=_INDEX_DTYPE, mode="w+", shape=len(live)
+        )
+        new_tiles = np.memmap(
+            tiles_path,
+            dtype=np.uint8,
+            mode="w+",
+            shape=(len(live), self.size, self.size),
+        )
+        for start in range(0, len(live), _GROW_SLOTS):
+            chunk = live[start : start + _GROW_SLOTS]
+            new_index[start : start + len(chunk)] = index[chunk]
+            new_tiles[start : start + len(chunk)] = tiles[chunk]
+        new_index.flush()
+        new_tiles.flush()
+
+    def flush(self):
+        for records in (self._index, self._tiles):
+            if isinstance(records, np.memmap):
+                records.flush()
+
+
+def _make_thumbnail(path, size):
+    """Worker: the grey thumbnail of one image file and its signature."""
+    signature = source_signature(path)
+    data = open_lazy(path)
+    if data is None:
+        data = read_image(path)
+    return signature, grey_thumbnail(make_thumbnail(data, size))
+
+
+class ThumbnailLoader:
+    """Fill a :class:`ThumbnailAtlas` on a process pool.
+
+    A driver thread hands the wanted rows to the pool, at most two per
+    worker at a time, so memory stays bounded however many rows are
+    requested; :meth:`request` replaces the rows still waiting.
+    ``on_ready(row)`` is called on the driver thread once a new thumbnail
+    is in the atlas; rows whose thumbnail is current are skipped, as are
+    unreadable images. When idle, the thread compacts the atlas.
+    """
+
+    def __init__(self, atlas, on_ready, workers=None):
+        if workers is None:
+            workers = min(4, os.cpu_count() or 1)
+        workers = max(1, int(workers))
+        self._atlas = atlas
+        self._on_ready = on_ready
+        # Spawned, not forked: the GUI process runs threads.
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._max_pending = 2 * workers
+        self._wanted = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="towbintools-thumbnails", daemon=True
+        )
+        self._thread.start()
+
+    def request(self, items):
+        """Make ``items``, ``(row, path)`` pairs, the rows to fill."""
+        with self._condition:
+            self._wanted = collections.deque(dict.fromkeys(items))
+            self._condition.notify()
+
+    def _next_batch(self, n_pending):
+        with self._condition:
+            while not (self._closed or self._wanted or n_pending):
+                self._condition.wait()
+            batch = []
+            while self._wanted and n_pending + len(batch) < self._max_pending:
+                batch.append(self._wanted.popleft())
+            return batch
+
+    def _run(self):
+        pending = {}
+        while True:
+            batch = self._next_batch(len(pending))
+            if self._closed:
+                return
+            in_flight = set(pending.values())
+            for item in batch:
+                row, path = item
+                if item in in_flight:
+                    continue
+                try:
+                    if self._atlas.is_current(row, path):
+                        continue
+                except (OSError, IndexError):
+                    continue
+                try:
+                    future = self._executor.submit(
+                        _make_thumbnail, path, self._atlas.size
+                    )
+                except BrokenExecutor:
+                    # A worker died; no more thumbnails this session.
+                    return
+                pending[future] = item
+            if not pending:
+                if not self._wanted:
+                    self._compact()
+                continue
+            # Wake up now and then to take new requests.
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                row, path = pending.pop(future)
+                try:
+                    signature, thumbnail = future.result()
+                except Exception:  # noqa: BLE001
+                    continue
+                if self._atlas.put(row, path, thumbnail, signature):
+                    self._on_ready(row)
+
+    def _compact(self):
+        # Idle: a good time to reclaim the slots of dropped rows.
+        with contextlib.suppress(OSError):
+            self._atlas.compact()
+
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            self._wanted.clear()
+            self._condition.notify()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._atlas.flush()